@@ -1,83 +1,478 @@
 import os
 import json
+import argparse
+import asyncio
+import random
 from agents import Agent, Runner # Asume que 'agents' está disponible en tu entorno
 from dotenv import load_dotenv
+from openai import APIConnectionError, RateLimitError
+from results_io import iter_analysis_results, NDJSON_FILE_NAME, JSON_FILE_NAME
+from prompt_compactor import compact_for_prompt, count_tokens, DEFAULT_TOKEN_BUDGET
+from llm_cache import get_default_llm_cache, run_agent_sync, agent_cache_key, model_name
+from issue_aggregator import aggregate_issues, save_issue_table, format_issue_table
 
 # --- Constantes ---
-RESULTS_DIR = "resultados"
-JSON_FILE_NAME = "all_analysis_results.json"
-load_dotenv(dotenv_path="../.env") # Asegúrate de que la ruta a tu .env sea correcta
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados")
+ROBOTS_CACHE_FILE_NAME = "robots_cache.json"
+RECRAWL_SUMMARY_FILE_NAME = "recrawl_summary.json"
+ANALYZER_MODEL = "gpt-4o-mini"
+DEFAULT_BATCH_SIZE = 25        # Páginas por lote en modo map-reduce
+DEFAULT_MAX_CONCURRENCY = 4    # Llamadas simultáneas al modelo en modo map-reduce
+DEFAULT_MAX_RETRIES = 3
+RETRY_BASE_DELAY = 2.0         # Segundos antes del primer reintento (se dobla en cada uno)
+# Errores temporales que merece la pena reintentar: límite de peticiones, timeouts y fallos de conexión
+# (APIConnectionError incluye APITimeoutError). El resto (peticiones inválidas, autenticación, errores
+# del propio código...) fallaría igual en cada intento.
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, TimeoutError, ConnectionError)
 
-# Función para cargar el archivo JSON
-def load_analysis_results():
+ANALYZER_INSTRUCTIONS = (
+    "You are a professional technical SEO agent. "
+    "Your task is to identify technical SEO issues in website analysis data and produce concise, expert-level audit reports per URL. "
+    "Only return bullet point lists of the issues, without any explanation or extra context."
+)
+
+# Estructura del informe, compartida por el modo de una sola llamada y por la combinación final del map-reduce
+REPORT_REQUIREMENTS = """    1. Una visión general del estado SEO técnico del sitio web.
+    2. Análisis de problemas recurrentes o globales que afectan a varias páginas (por ejemplo, enlazado interno, estructura de URLs, canonicales, velocidad, etc.).
+    3. Identificación de errores técnicos detectados en las páginas (por URL), como falta de etiquetas importantes, problemas de imágenes, scripts, etc.
+    4. Explicaciones claras y sencillas que ayuden a un usuario no experto a entender los problemas y por qué afectan al SEO.
+    5. Recomendaciones prácticas para solucionar cada problema, priorizando los que más impactan.
+    6. Resumen final con puntos clave para mejorar el SEO técnico globalmente.
+
+    Para cada página, también incluye un listado breve con los errores técnicos más importantes detectados, en formato de puntos (bullet points).
+
+    Evita dar explicaciones técnicas muy complejas, sé claro y conciso y hazlo en español de españa."""
+
+FULL_DATA_DESCRIPTION = "un JSON con datos de análisis automático de varias páginas web de un mismo sitio"
+COMPACT_DATA_DESCRIPTION = (
+    "un JSON compacto con datos de análisis automático de las páginas de un mismo sitio. "
+    '"site" contiene los valores comunes a todas las páginas (se indican una sola vez), '
+    '"robots_txt" el robots.txt de cada origen y "groups" agrupa las páginas que comparten '
+    'los mismos problemas detectados ("issues"); los textos y listas largos están recortados'
+)
+ISSUE_TABLE_INTRO = (
+    "Esta es la tabla exacta de problemas de todo el sitio, calculada automáticamente sobre todas las páginas "
+    "rastreadas (problema, gravedad, páginas afectadas y URLs de ejemplo). Úsala como fuente de verdad para "
+    "los problemas recurrentes y los duplicados, sin volver a contarlos a partir de los datos:"
+)
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".env")) # Backend/.env
+
+# Función para recorrer los resultados sin cargarlos todos en memoria
+def iter_loaded_analysis_results(results_dir=RESULTS_DIR):
     """
-    Carga los resultados del análisis SEO desde un archivo JSON.
+    Itera los resultados del análisis SEO página a página.
+    Usa el NDJSON que escribe el crawler y, si no existe, el archivo JSON clásico.
 
-    Returns:
-        dict: Un diccionario con los datos del análisis.
+    Yields:
+        dict: Los datos del análisis de cada página.
     Raises:
-        FileNotFoundError: Si no se encuentra el archivo JSON.
+        FileNotFoundError: Si no se encuentra ningún archivo de resultados.
     """
-    json_filepath = os.path.join(RESULTS_DIR, JSON_FILE_NAME)
+    ndjson_filepath = os.path.join(results_dir, NDJSON_FILE_NAME)
+    if os.path.exists(ndjson_filepath):
+        yield from iter_analysis_results(ndjson_filepath)
+        return
+
+    json_filepath = os.path.join(results_dir, JSON_FILE_NAME)
     if not os.path.exists(json_filepath):
         raise FileNotFoundError(f"No se encontró el archivo '{json_filepath}'")
 
     with open(json_filepath, 'r', encoding='utf-8') as f:
-        return json.load(f)
+        yield from json.load(f)
 
-# Función principal para orquestar la generación del informe SEO
-def generate_technical_seo_report():
+# Función para cargar el archivo de resultados
+def load_analysis_results(results_dir=RESULTS_DIR):
     """
-    Orquesta la ejecución del agente analizador para generar un informe SEO técnico.
+    Carga los resultados del análisis SEO (NDJSON o JSON clásico).
 
     Returns:
-        str: El contenido del informe SEO técnico generado.
+        list: Los datos del análisis de cada página.
+    Raises:
+        FileNotFoundError: Si no se encuentra el archivo de resultados.
     """
-    print("✅ Iniciando el proceso de auditoría y estrategia SEO...")
+    return list(iter_loaded_analysis_results(results_dir))
 
-    # --- AGENTE ANALIZADOR (Technical SEO Expert Agent) ---
-    print("\n--- Paso 1: Ejecutando Agente Analizador (Technical SEO Expert Agent) ---")
+def load_robots_entries(results_dir=RESULTS_DIR):
+    """
+    Carga el robots.txt compartido de cada origen rastreado.
+    Las páginas solo guardan una referencia (`robots_txt_ref`) a estas entradas.
 
-    instructions_analyzer = (
-        "You are a professional technical SEO agent. "
-        "Your task is to identify technical SEO issues in website analysis data and produce concise, expert-level audit reports per URL. "
-        "Only return bullet point lists of the issues, without any explanation or extra context."
-    )
-    
-    seo_analyzer_agent = Agent(
+    Returns:
+        dict: origen -> {"status": ..., "content": ...}. Vacío si no existe la caché.
+    """
+    robots_filepath = os.path.join(results_dir, ROBOTS_CACHE_FILE_NAME)
+    if not os.path.exists(robots_filepath):
+        return {}
+
+    with open(robots_filepath, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    return {origin: {"status": entry.get("status"), "content": entry.get("content")}
+            for origin, entry in entries.items()}
+
+def load_reused_urls(results_dir=RESULTS_DIR):
+    """
+    URLs que el último rastreo incremental reutilizó sin cambios del rastreo anterior.
+
+    Returns:
+        set: Las URLs sin cambios. Vacío si el último rastreo no fue incremental.
+    """
+    summary_filepath = os.path.join(results_dir, RECRAWL_SUMMARY_FILE_NAME)
+    if not os.path.exists(summary_filepath):
+        return set()
+
+    with open(summary_filepath, 'r', encoding='utf-8') as f:
+        return set(json.load(f).get("reused_urls", []))
+
+def build_analyzer_agent(model=ANALYZER_MODEL):
+    """
+    Crea el agente analizador.
+
+    Args:
+        model (str or agents.Model): Nombre del modelo o una instancia de `Model`
+            (p. ej. un modelo local de pruebas).
+    """
+    return Agent(
         name="Technical SEO Expert Agent",
-        instructions=instructions_analyzer,
-        model="gpt-4o-mini"
+        instructions=ANALYZER_INSTRUCTIONS,
+        model=model
     )
 
-    loaded_results = load_analysis_results()
+def load_report_data(only_changed=False, results_dir=RESULTS_DIR, analysis_results=None, robots_entries=None,
+                     reused_urls=None):
+    """
+    Carga las páginas a analizar y el robots.txt de los orígenes que referencian.
 
-    prompt_analyzer = f"""
-    Eres un experto en SEO técnico con mucha experiencia en auditorías completas de sitios web.
+    Los datos que se pasen ya en memoria (`analysis_results`, `robots_entries`, `reused_urls`)
+    no se leen de los archivos de `results_dir`.
 
-    Has recibido un JSON con datos de análisis automático de varias páginas web de un mismo sitio. Tu tarea es realizar un informe técnico global que incluya:
+    La tabla de problemas se calcula sobre todas las páginas, también las omitidas con
+    `only_changed`, para que los duplicados entre páginas sean exactos.
 
-    1. Una visión general del estado SEO técnico del sitio web.
-    2. Análisis de problemas recurrentes o globales que afectan a varias páginas (por ejemplo, enlazado interno, estructura de URLs, canonicales, velocidad, etc.).
-    3. Identificación de errores técnicos detectados en las páginas (por URL), como falta de etiquetas importantes, problemas de imágenes, scripts, etc.
-    4. Explicaciones claras y sencillas que ayuden a un usuario no experto a entender los problemas y por qué afectan al SEO.
-    5. Recomendaciones prácticas para solucionar cada problema, priorizando los que más impactan.
-    6. Resumen final con puntos clave para mejorar el SEO técnico globalmente.
+    Returns:
+        tuple: (list de resultados, dict de robots.txt por origen, list de URLs sin cambios omitidas,
+            dict con la tabla de problemas del sitio)
+    """
+    loaded_results = list(analysis_results) if analysis_results is not None else load_analysis_results(results_dir)
+    if robots_entries is None:
+        robots_entries = load_robots_entries(results_dir)
+    issue_table = aggregate_issues(loaded_results)
+    unchanged_urls = []
+    if only_changed:
+        reused_urls = set(reused_urls) if reused_urls is not None else load_reused_urls(results_dir)
+        unchanged_urls = [page.get("url") for page in loaded_results if page.get("url") in reused_urls]
+        loaded_results = [page for page in loaded_results if page.get("url") not in reused_urls]
+        print(f"Se analizan {len(loaded_results)} páginas con cambios; {len(unchanged_urls)} sin cambios se omiten.")
+    referenced_origins = {page.get("robots_txt_ref") for page in loaded_results}
+    robots_entries = {origin: entry for origin, entry in robots_entries.items() if origin in referenced_origins}
+    return loaded_results, robots_entries, unchanged_urls, issue_table
 
-    Para cada página, también incluye un listado breve con los errores técnicos más importantes detectados, en formato de puntos (bullet points).
+def build_data_section(loaded_results, robots_entries, token_budget):
+    """
+    Prepara los datos de las páginas para un prompt, compactados o en JSON completo.
 
-    Evita dar explicaciones técnicas muy complejas, sé claro y conciso y hazlo en español de españa.
+    Returns:
+        tuple: (descripción de los datos, sección de robots.txt, texto de los datos)
+    """
+    if token_budget is None:
+        robots_section = (
+            'El robots.txt de cada origen aparece una sola vez; cada página lo referencia mediante "robots_txt_ref":\n\n    '
+            + json.dumps(robots_entries, indent=2, ensure_ascii=False) + "\n\n    "
+        )
+        payload_text = json.dumps(loaded_results, indent=2, ensure_ascii=False)
+        print(f"Datos del prompt: {count_tokens(robots_section + payload_text)} tokens (sin compactar).")
+        return FULL_DATA_DESCRIPTION, robots_section, payload_text
+
+    payload_text, stats = compact_for_prompt(loaded_results, robots_entries, token_budget)
+    print(f"Datos del prompt compactados: {stats['tokens_before']} -> {stats['tokens_after']} tokens "
+          f"(nivel {stats['level']}, presupuesto {token_budget}).")
+    if not stats["within_budget"]:
+        print("Aviso: ni con la compactación máxima los datos caben en el presupuesto de tokens.")
+    return COMPACT_DATA_DESCRIPTION, "", payload_text
+
+def unchanged_pages_note(unchanged_urls):
+    if not unchanged_urls:
+        return ""
+    return "Estas páginas no han cambiado desde la auditoría anterior y no se incluyen en los datos: " + ", ".join(unchanged_urls)
+
+def issue_table_section(issue_table):
+    if issue_table is None:
+        return ""
+    return f"{ISSUE_TABLE_INTRO}\n\n{format_issue_table(issue_table)}\n\n    "
+
+def build_report_prompt(data_description, robots_section, payload_text, unchanged_urls=(), issue_table=None):
+    """Prompt del informe en una sola llamada al agente analizador."""
+    return f"""
+    Eres un experto en SEO técnico con mucha experiencia en auditorías completas de sitios web.
+
+    Has recibido {data_description}. Tu tarea es realizar un informe técnico global que incluya:
+
+{REPORT_REQUIREMENTS}
+
+    {issue_table_section(issue_table)}{robots_section}{unchanged_pages_note(unchanged_urls)}
 
     Estos son los datos a analizar en JSON:
 
-    {json.dumps(loaded_results, indent=2, ensure_ascii=False)}
+    {payload_text}
     """
 
-    print("🚀 Ejecutando Agente Analizador para generar el informe...")
-    analyzer_result = Runner.run_sync(seo_analyzer_agent, prompt_analyzer)
-    
-    analysis_report_content = analyzer_result.final_output
+# --- Modo map-reduce: lotes de páginas analizados en paralelo y combinados en un informe ---
+
+def build_batch_prompt(data_description, robots_section, payload_text, batch_number, batch_count):
+    """Prompt de la fase map: hallazgos de un lote de páginas, sin redactar aún el informe."""
+    return f"""
+    Eres un experto en SEO técnico. Estás analizando el lote {batch_number} de {batch_count} de las páginas de un mismo sitio web; después se combinarán los hallazgos de todos los lotes en un único informe.
+
+    Has recibido {data_description}.
+
+    Devuelve únicamente, en español de España y en formato de puntos (bullet points):
+
+    1. Los problemas que se repiten en varias páginas del lote, indicando a cuántas páginas afecta cada uno.
+    2. Para cada URL, los errores técnicos más importantes detectados.
+
+    No escribas introducción, explicaciones, recomendaciones ni resumen.
+
+    {robots_section}Estos son los datos del lote en JSON:
+
+    {payload_text}
+    """
+
+def build_combine_prompt(partial_findings):
+    """Prompt de una reducción intermedia: une varios hallazgos parciales conservando su formato."""
+    return f"""
+    Eres un experto en SEO técnico. Une en una sola lista los siguientes hallazgos parciales de varios lotes de páginas de un mismo sitio web.
+
+    Conserva el mismo formato en puntos: primero los problemas que se repiten (sumando las páginas afectadas de cada lote) y después los errores de cada URL. No añadas problemas nuevos ni explicaciones. Responde en español de España.
+
+    {partial_findings}
+    """
+
+def build_reduce_prompt(partial_findings, total_pages, unchanged_note, failed_note, issue_table=None):
+    """Prompt de la fase reduce: el informe final con el formato habitual a partir de los hallazgos por lote."""
+    return f"""
+    Eres un experto en SEO técnico con mucha experiencia en auditorías completas de sitios web.
+
+    Has recibido los hallazgos del análisis automático de {total_pages} páginas de un mismo sitio web, obtenidos por lotes. Tu tarea es combinarlos en un informe técnico global que incluya:
+
+{REPORT_REQUIREMENTS}
+
+    Agrupa los problemas que aparecen en varios lotes sumando las páginas afectadas y no inventes problemas que no aparezcan en los hallazgos.
+
+    {issue_table_section(issue_table)}{unchanged_note}
+    {failed_note}
+
+    Estos son los hallazgos por lote:
+
+    {partial_findings}
+    """
+
+async def run_agent_with_retry(agent, prompt, semaphore, label, max_retries=DEFAULT_MAX_RETRIES, retry_delay=RETRY_BASE_DELAY,
+                               cache=None):
+    """
+    Ejecuta el agente con `Runner.run`, limitado por un semáforo y con reintentos.
+
+    Solo se reintentan los errores temporales (`RETRYABLE_ERRORS`); el resto se relanza en el
+    acto. Entre reintentos se espera con backoff exponencial y algo de aleatoriedad
+    (retry_delay, 2*retry_delay, 4*retry_delay...), fuera del semáforo para no bloquear otras llamadas.
+    Con una `cache` (ver `llm_cache.LLMCache`), las respuestas ya conocidas no llaman al modelo.
+
+    Returns:
+        str: La respuesta final del agente.
+    Raises:
+        Exception: El último error si fallan todos los intentos.
+    """
+    cache_key = agent_cache_key(agent, prompt) if cache is not None else None
+    if cache_key is not None:
+        cached_output = cache.get(cache_key)
+        if cached_output is not None:
+            return cached_output
+
+    for attempt in range(max_retries + 1):
+        try:
+            async with semaphore:
+                result = await Runner.run(agent, prompt)
+            if cache_key is not None:
+                cache.set(cache_key, result.final_output, model_name(agent.model))
+            return result.final_output
+        except RETRYABLE_ERRORS as e:
+            if attempt == max_retries:
+                raise
+            delay = retry_delay * (2 ** attempt) + random.uniform(0, retry_delay)
+            print(f"⚠️ Error en {label} (intento {attempt + 1} de {max_retries + 1}): {e}. Reintentando en {delay:.1f}s...")
+            await asyncio.sleep(delay)
+
+def check_batch_size(batch_size):
+    """
+    Comprueba el tamaño de lote del modo map-reduce.
+
+    Raises:
+        ValueError: Si no es un entero mayor que 0.
+    """
+    if isinstance(batch_size, bool) or not isinstance(batch_size, int) or batch_size < 1:
+        raise ValueError(f"El tamaño de lote (batch_size) debe ser un entero mayor que 0; se ha indicado {batch_size!r}")
+
+def _pack_partials(partials, token_budget):
+    """Agrupa hallazgos parciales consecutivos en bloques que caben en el presupuesto de tokens."""
+    chunks, current, current_tokens = [], [], 0
+    for partial in partials:
+        tokens = count_tokens(partial)
+        if current and current_tokens + tokens > token_budget:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(partial)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+async def generate_report_map_reduce(loaded_results, robots_entries, unchanged_urls=(), token_budget=DEFAULT_TOKEN_BUDGET,
+                                     batch_size=DEFAULT_BATCH_SIZE, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                                     model=ANALYZER_MODEL, max_retries=DEFAULT_MAX_RETRIES, retry_delay=RETRY_BASE_DELAY,
+                                     cache=None, issue_table=None):
+    """
+    Genera el informe SEO técnico en modo map-reduce.
+
+    Las páginas se reparten en lotes de `batch_size` que se analizan en paralelo (como mucho
+    `max_concurrency` llamadas a la vez). Si los hallazgos de todos los lotes no caben en
+    `token_budget`, se unen por bloques en reducciones intermedias; una última llamada los
+    combina en el informe con el formato habitual. Con una `cache`, los lotes cuyos datos no
+    han cambiado reutilizan su respuesta anterior. La `issue_table` del sitio (ver
+    `issue_aggregator`) se incluye en la combinación final.
+
+    Returns:
+        str: El contenido del informe SEO técnico generado.
+    Raises:
+        ValueError: Si `batch_size` no es un entero positivo.
+        RuntimeError: Si no se ha podido analizar ningún lote.
+    """
+    check_batch_size(batch_size)
+    agent = build_analyzer_agent(model)
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    batches = [loaded_results[start:start + batch_size] for start in range(0, len(loaded_results), batch_size)]
+    reduce_budget = token_budget or DEFAULT_TOKEN_BUDGET
+
+    print(f"🚀 Analizando {len(loaded_results)} páginas en {len(batches)} lotes (hasta {max_concurrency} a la vez)...")
+    batch_prompts = []
+    for batch_number, batch in enumerate(batches, start=1):
+        batch_origins = {page.get("robots_txt_ref") for page in batch}
+        batch_robots = {origin: entry for origin, entry in robots_entries.items() if origin in batch_origins}
+        data_description, robots_section, payload_text = build_data_section(batch, batch_robots, token_budget)
+        batch_prompts.append(build_batch_prompt(data_description, robots_section, payload_text, batch_number, len(batches)))
+
+    batch_outputs = await asyncio.gather(
+        *(run_agent_with_retry(agent, prompt, semaphore, f"el lote {batch_number}", max_retries, retry_delay, cache)
+          for batch_number, prompt in enumerate(batch_prompts, start=1)),
+        return_exceptions=True,
+    )
+
+    partials, failed_batches = [], []
+    for batch_number, output in enumerate(batch_outputs, start=1):
+        if isinstance(output, Exception):
+            print(f"❌ No se pudo analizar el lote {batch_number}: {output}")
+            failed_batches.append(batch_number)
+        else:
+            partials.append(f"### Lote {batch_number}\n{output}")
+    if not partials:
+        raise RuntimeError("No se ha podido analizar ningún lote de páginas.")
+
+    # Reducciones intermedias hasta que todos los hallazgos quepan en una sola llamada
+    while len(partials) > 1 and count_tokens("\n\n".join(partials)) > reduce_budget:
+        chunks = _pack_partials(partials, reduce_budget)
+        if all(len(chunk) == 1 for chunk in chunks):
+            print("Aviso: los hallazgos parciales no caben en el presupuesto de tokens ni uniéndolos por bloques.")
+            break
+        print(f"Uniendo {len(partials)} hallazgos parciales en {len(chunks)} bloques...")
+        merged = await asyncio.gather(*(
+            run_agent_with_retry(agent, build_combine_prompt("\n\n".join(chunk)), semaphore,
+                                 f"la unión del bloque {chunk_number}", max_retries, retry_delay, cache)
+            if len(chunk) > 1 else asyncio.sleep(0, result=chunk[0])
+            for chunk_number, chunk in enumerate(chunks, start=1)
+        ))
+        partials = [f"### Bloque {chunk_number}\n{output}" if len(chunk) > 1 else output
+                    for chunk_number, (chunk, output) in enumerate(zip(chunks, merged), start=1)]
+
+    failed_note = ""
+    if failed_batches:
+        failed_pages = sum(len(batches[batch_number - 1]) for batch_number in failed_batches)
+        failed_note = f"No se pudieron analizar {failed_pages} páginas (lotes {', '.join(map(str, failed_batches))}); indícalo en el informe."
+
+    print("🚀 Combinando los hallazgos de todos los lotes en el informe final...")
+    reduce_prompt = build_reduce_prompt("\n\n".join(partials), len(loaded_results), unchanged_pages_note(unchanged_urls), failed_note,
+                                        issue_table)
+    return await run_agent_with_retry(agent, reduce_prompt, semaphore, "la combinación final", max_retries, retry_delay, cache)
+
+# Función principal para orquestar la generación del informe SEO
+def generate_technical_seo_report(only_changed=False, token_budget=DEFAULT_TOKEN_BUDGET, map_reduce=False,
+                                  batch_size=DEFAULT_BATCH_SIZE, max_concurrency=DEFAULT_MAX_CONCURRENCY, model=ANALYZER_MODEL,
+                                  use_cache=True, results_dir=RESULTS_DIR, analysis_results=None, robots_entries=None,
+                                  reused_urls=None, on_event=None, stream_output=False):
+    """
+    Orquesta la ejecución del agente analizador para generar un informe SEO técnico.
+
+    Args:
+        only_changed (bool): Si es True, solo se envían al agente las páginas que han cambiado
+            desde el rastreo anterior; las que no han cambiado se mencionan solo por su URL.
+        token_budget (int or None): Tokens máximos de los datos del prompt. Los resultados se
+            compactan (datos comunes una vez, páginas agrupadas por problemas, textos recortados)
+            hasta caber. Con None se envía el JSON completo de todas las páginas.
+        map_reduce (bool): Analiza las páginas por lotes en paralelo y combina los hallazgos
+            (ver `generate_report_map_reduce`) en lugar de hacer una única llamada.
+        batch_size (int): Páginas por lote en modo map-reduce.
+        max_concurrency (int): Llamadas simultáneas al modelo en modo map-reduce.
+        model (str or agents.Model): Modelo del agente analizador.
+        use_cache (bool): Reutiliza las respuestas guardadas en la caché local del modelo si el
+            prompt es idéntico (ver `llm_cache`). Con False siempre se llama al modelo.
+        results_dir (str): Directorio de los resultados del crawler y de la caché del modelo.
+        analysis_results (list, optional): Resultados del rastreo ya en memoria; si no se
+            indican, se leen de `results_dir`.
+        robots_entries (dict, optional): robots.txt por origen ya en memoria.
+        reused_urls (iterable, optional): URLs sin cambios del último rastreo (para `only_changed`).
+        on_event (callable, optional): Recibe eventos de progreso ({"stage": "report", "type": ...}).
+        stream_output (bool): Pide el informe en streaming y emite cada fragmento en cuanto llega
+            ({"stage": "report", "type": "delta", "text": ...}). En modo map-reduce el informe
+            solo se conoce al terminar la combinación final y no se emiten fragmentos.
+    Returns:
+        str: El contenido del informe SEO técnico generado.
+    Raises:
+        ValueError: Si en modo map-reduce `batch_size` no es un entero mayor que 0.
+    """
+    if map_reduce:
+        check_batch_size(batch_size)
+    print("✅ Iniciando el proceso de auditoría y estrategia SEO...")
+
+    # --- AGENTE ANALIZADOR (Technical SEO Expert Agent) ---
+    print("\n--- Paso 1: Ejecutando Agente Analizador (Technical SEO Expert Agent) ---")
+
+    loaded_results, robots_entries, unchanged_urls, issue_table = load_report_data(only_changed, results_dir, analysis_results,
+                                                                                   robots_entries, reused_urls)
+    issues_filepath = save_issue_table(issue_table, results_dir)
+    print(f"Tabla de problemas del sitio ({len(issue_table['issues'])} problemas) guardada en '{issues_filepath}'.")
+    if on_event:
+        on_event({"stage": "report", "type": "started", "pages": len(loaded_results), "map_reduce": map_reduce,
+                  "issues": len(issue_table["issues"])})
+    llm_cache = get_default_llm_cache(results_dir) if use_cache else None
+    try:
+        if map_reduce:
+            analysis_report_content = asyncio.run(generate_report_map_reduce(
+                loaded_results, robots_entries, unchanged_urls, token_budget=token_budget,
+                batch_size=batch_size, max_concurrency=max_concurrency, model=model, cache=llm_cache,
+                issue_table=issue_table,
+            ))
+        else:
+            seo_analyzer_agent = build_analyzer_agent(model)
+            data_description, robots_section, payload_text = build_data_section(loaded_results, robots_entries, token_budget)
+            prompt_analyzer = build_report_prompt(data_description, robots_section, payload_text, unchanged_urls, issue_table)
+
+            print("🚀 Ejecutando Agente Analizador para generar el informe...")
+            on_text = None
+            if stream_output and on_event:
+                on_text = lambda text: on_event({"stage": "report", "type": "delta", "text": text})
+            analysis_report_content = run_agent_sync(seo_analyzer_agent, prompt_analyzer, llm_cache, on_text)
+    finally:
+        if llm_cache is not None:
+            llm_cache.close()
     
+    if on_event:
+        on_event({"stage": "report", "type": "finished", "length": len(analysis_report_content)})
     print("\n📋 Informe SEO técnico generado por el Analizador y almacenado en la variable 'analysis_report_content'.")
     print("--------------------------------------------------")
     
@@ -86,12 +481,33 @@ def generate_technical_seo_report():
 
 # Este bloque solo se ejecuta si el script se corre directamente, no cuando se importa
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera el informe SEO técnico a partir de los resultados del crawler.")
+    parser.add_argument("--only-changed", action="store_true",
+                        help="Analiza solo las páginas que han cambiado desde el rastreo anterior")
+    parser.add_argument("--token-budget", type=int, default=DEFAULT_TOKEN_BUDGET,
+                        help="Tokens máximos de los datos que se envían al agente")
+    parser.add_argument("--no-compact", action="store_true",
+                        help="Envía el JSON completo de todas las páginas, sin compactar")
+    parser.add_argument("--map-reduce", action="store_true",
+                        help="Analiza las páginas por lotes en paralelo y combina los hallazgos en el informe")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Páginas por lote en modo map-reduce")
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help="Llamadas simultáneas al modelo en modo map-reduce")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Llama siempre al modelo, sin reutilizar respuestas de la caché local")
+    args = parser.parse_args()
+    if args.batch_size < 1:
+        parser.error("--batch-size debe ser mayor que 0")
     try:
-        report_content = generate_technical_seo_report()
+        report_content = generate_technical_seo_report(only_changed=args.only_changed,
+                                                       token_budget=None if args.no_compact else args.token_budget,
+                                                       map_reduce=args.map_reduce, batch_size=args.batch_size,
+                                                       max_concurrency=args.max_concurrency,
+                                                       use_cache=not args.no_cache)
         print("\n--- Contenido del informe (primeras 500 caracteres) ---")
         print(report_content[:500] + "..." if len(report_content) > 500 else report_content)
         print("\n--- Fin del contenido del informe ---")
     except FileNotFoundError as e:
         print(f"Error: {e}")
     except Exception as e:
-        print(f"Ocurrió un error inesperado: {e}")
\ No newline at end of file
+        print(f"Ocurrió un error inesperado: {e}")
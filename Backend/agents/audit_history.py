@@ -0,0 +1,478 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+from issue_aggregator import IssueAggregator
+
+# --- Configuración del histórico de auditorías ---
+AUDIT_HISTORY_FILE_NAME = "audit_history.sqlite"
+HISTORY_COMMIT_EVERY = 500   # Páginas por transacción al guardar un rastreo
+
+# Campos que no se guardan en el JSON de cada página (se repiten en todas, ya están en el archivo de HTML o son listas largas de enlaces)
+EXCLUDED_PAGE_FIELDS = frozenset(["robots_txt_content", "html_saved_original", "html_saved_prettified", "outgoing_links"])
+
+# Campos que una página puede "perder" entre dos rastreos: nombre -> (columna, condición de presencia)
+LOSABLE_FIELDS = {
+    "canonical": ("canonical_url", "COALESCE({alias}.canonical_url, '') != ''"),
+    "title": ("title", "COALESCE({alias}.title, '') != ''"),
+    "meta_description": ("meta_description", "COALESCE({alias}.meta_description, '') != ''"),
+    "h1": ("h1_count", "{alias}.h1_count > 0"),
+    "viewport": ("viewport", "COALESCE({alias}.viewport, '') != ''"),
+}
+
+_SINCE_PATTERN = re.compile(r"^(\d+)\s*([mhdw])$")
+_SINCE_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+def site_key(url):
+    """Clave del sitio de una URL: el host en minúsculas, sin 'www.'."""
+    host = urlparse(url if "//" in url else "//" + url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def parse_since(value, now=None):
+    """
+    Convierte "7d", "12h", "30m", "2w" o una fecha ISO ("2024-05-01") en un timestamp.
+
+    Raises:
+        ValueError: Si el formato no es válido.
+    """
+    now = time.time() if now is None else now
+    match = _SINCE_PATTERN.match(value.strip().lower())
+    if match:
+        return now - int(match.group(1)) * _SINCE_UNITS[match.group(2)]
+    try:
+        return datetime.fromisoformat(value.strip()).timestamp()
+    except ValueError:
+        raise ValueError(f"Fecha no válida '{value}'. Usa p. ej. 7d, 12h, 2w o 2024-05-01.") from None
+
+
+def _format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M") if timestamp else "-"
+
+
+class AuditHistory:
+    """
+    Histórico de auditorías en un archivo SQLite local, con cada rastreo identificado por
+    sitio y fecha.
+
+    Cada ejecución del crawler se guarda como un "run" con sus páginas, encabezados, enlaces
+    internos y la tabla de problemas (ver `issue_aggregator`), así que se pueden comparar
+    rastreos y auditar varios dominios sin que se sobrescriban. Las consultas se resuelven
+    con los índices de SQLite sin volver a cargar ningún JSON.
+    """
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=30)
+        self._pending_pages = 0
+        self._connection.executescript(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "run_id INTEGER PRIMARY KEY AUTOINCREMENT, site TEXT NOT NULL, start_url TEXT, "
+            "started_at REAL NOT NULL, finished_at REAL, page_count INTEGER NOT NULL DEFAULT 0, status TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS runs_by_site ON runs (site, started_at);"
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "run_id INTEGER NOT NULL, url TEXT NOT NULL, http_status INTEGER, title TEXT, meta_description TEXT, "
+            "meta_robots TEXT, canonical_url TEXT, viewport TEXT, h1_count INTEGER, images_without_alt INTEGER, "
+            "internal_links_count INTEGER, external_links_count INTEGER, data TEXT, "
+            "PRIMARY KEY (run_id, url)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS pages_by_url ON pages (url, run_id);"
+            "CREATE TABLE IF NOT EXISTS headings ("
+            "run_id INTEGER NOT NULL, url TEXT NOT NULL, position INTEGER NOT NULL, level TEXT NOT NULL, text TEXT, "
+            "PRIMARY KEY (run_id, url, position)) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS links ("
+            "run_id INTEGER NOT NULL, source_url TEXT NOT NULL, target_url TEXT NOT NULL, "
+            "PRIMARY KEY (run_id, source_url, target_url)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS links_by_target ON links (run_id, target_url);"
+            "CREATE TABLE IF NOT EXISTS issues ("
+            "run_id INTEGER NOT NULL, issue TEXT NOT NULL, url TEXT NOT NULL, severity TEXT, "
+            "PRIMARY KEY (run_id, issue, url)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS issues_by_url ON issues (run_id, url);"
+        )
+
+    # --- Escritura ---
+
+    def start_run(self, start_url, started_at=None):
+        """
+        Registra un nuevo rastreo.
+
+        Returns:
+            int: El identificador del run.
+        """
+        with self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO runs (site, start_url, started_at, status) VALUES (?, ?, ?, 'running')",
+                (site_key(start_url), start_url, time.time() if started_at is None else started_at),
+            )
+        return cursor.lastrowid
+
+    def add_page(self, run_id, analysis_results):
+        """Guarda una página del rastreo con sus encabezados."""
+        url = analysis_results.get("url")
+        h1_tags = analysis_results.get("h1_tags") or []
+        data = {key: value for key, value in analysis_results.items() if key not in EXCLUDED_PAGE_FIELDS}
+        self._connection.execute(
+            "INSERT OR REPLACE INTO pages (run_id, url, http_status, title, meta_description, meta_robots, canonical_url, "
+            "viewport, h1_count, images_without_alt, internal_links_count, external_links_count, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (run_id, url, analysis_results.get("http_status"), analysis_results.get("title"),
+             analysis_results.get("meta_description"), analysis_results.get("meta_robots"),
+             analysis_results.get("canonical_url"), analysis_results.get("viewport"), len(h1_tags),
+             analysis_results.get("images_without_alt"), analysis_results.get("internal_links_count"),
+             analysis_results.get("external_links_count"), json.dumps(data, ensure_ascii=False, separators=(",", ":"))),
+        )
+        headings = [("h1", text) for text in h1_tags] + [("h2", text) for text in analysis_results.get("h2_tags") or []]
+        for heading in analysis_results.get("h3_h6_tags") or []:
+            headings.extend(heading.items())
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO headings (run_id, url, position, level, text) VALUES (?, ?, ?, ?, ?)",
+            ((run_id, url, position, level, text) for position, (level, text) in enumerate(headings)),
+        )
+        self._count_pending()
+
+    def add_links(self, run_id, source_url, target_urls):
+        """Guarda los enlaces internos de una página."""
+        self._connection.executemany(
+            "INSERT OR IGNORE INTO links (run_id, source_url, target_url) VALUES (?, ?, ?)",
+            ((run_id, source_url, target_url) for target_url in target_urls),
+        )
+
+    def add_issues(self, run_id, issue_table):
+        """Guarda la tabla de problemas de `issue_aggregator.aggregate_issues`."""
+        with self._connection:
+            self._connection.execute("DELETE FROM issues WHERE run_id = ?", (run_id,))
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO issues (run_id, issue, url, severity) VALUES (?, ?, ?, ?)",
+                ((run_id, entry["issue"], url, entry["severity"])
+                 for entry in issue_table["issues"] for url in entry["urls"] if url),
+            )
+
+    def resumable_run(self, site):
+        """Último rastreo interrumpido de un sitio (para continuarlo con --resume) o None."""
+        row = self._connection.execute(
+            "SELECT run_id, status FROM runs WHERE site = ? ORDER BY started_at DESC, run_id DESC LIMIT 1",
+            (site_key(site),),
+        ).fetchone()
+        return row[0] if row and row[1] in ("running", "interrupted") else None
+
+    def finish_run(self, run_id, status="finished"):
+        with self._connection:
+            self._connection.execute(
+                "UPDATE runs SET finished_at = ?, status = ?, "
+                "page_count = (SELECT COUNT(*) FROM pages WHERE run_id = ?) WHERE run_id = ?",
+                (time.time(), status, run_id, run_id),
+            )
+        self._pending_pages = 0
+
+    def _count_pending(self):
+        self._pending_pages += 1
+        if self._pending_pages >= HISTORY_COMMIT_EVERY:
+            self._connection.commit()
+            self._pending_pages = 0
+
+    def delete_run(self, run_id):
+        with self._connection:
+            for table in ("pages", "headings", "links", "issues", "runs"):
+                self._connection.execute(f"DELETE FROM {table} WHERE run_id = ?", (run_id,))
+
+    # --- Consultas ---
+
+    def runs(self, site=None, limit=None):
+        """
+        Rastreos guardados, del más reciente al más antiguo.
+
+        Returns:
+            list: dicts con "run_id", "site", "start_url", "started_at", "finished_at",
+                "page_count" y "status".
+        """
+        query = "SELECT run_id, site, start_url, started_at, finished_at, page_count, status FROM runs"
+        params = []
+        if site:
+            query += " WHERE site = ?"
+            params.append(site_key(site))
+        query += " ORDER BY started_at DESC, run_id DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        columns = ("run_id", "site", "start_url", "started_at", "finished_at", "page_count", "status")
+        return [dict(zip(columns, row)) for row in self._connection.execute(query, params)]
+
+    def latest_run(self, site, before=None):
+        """
+        Último rastreo terminado de un sitio (opcionalmente, empezado antes de `before`).
+
+        Returns:
+            int or None: El run_id.
+        """
+        query = "SELECT run_id FROM runs WHERE site = ? AND status = 'finished'"
+        params = [site_key(site)]
+        if before is not None:
+            query += " AND started_at <= ?"
+            params.append(before)
+        row = self._connection.execute(query + " ORDER BY started_at DESC, run_id DESC LIMIT 1", params).fetchone()
+        return row[0] if row else None
+
+    def baseline_run(self, site, since):
+        """
+        Rastreo de referencia para comparar "desde" una fecha: el último empezado antes de
+        `since` o, si no hay ninguno, el más antiguo posterior.
+        """
+        run_id = self.latest_run(site, before=since)
+        if run_id is not None:
+            return run_id
+        row = self._connection.execute(
+            "SELECT run_id FROM runs WHERE site = ? AND status = 'finished' ORDER BY started_at, run_id LIMIT 1",
+            (site_key(site),),
+        ).fetchone()
+        return row[0] if row else None
+
+    def lost_field(self, old_run, new_run, field):
+        """
+        Páginas que tenían `field` ("canonical", "title", "meta_description", "h1" o
+        "viewport") en `old_run` y ya no lo tienen en `new_run`.
+
+        Returns:
+            list: dicts con "url" y el valor anterior ("previous").
+        """
+        if field not in LOSABLE_FIELDS:
+            raise ValueError(f"Campo desconocido '{field}'. Opciones: {', '.join(LOSABLE_FIELDS)}")
+        column, present = LOSABLE_FIELDS[field]
+        rows = self._connection.execute(
+            f"SELECT new.url, old.{column} FROM pages AS new "
+            f"JOIN pages AS old ON old.run_id = ? AND old.url = new.url "
+            f"WHERE new.run_id = ? AND {present.format(alias='old')} AND NOT ({present.format(alias='new')}) "
+            f"ORDER BY new.url",
+            (old_run, new_run),
+        )
+        return [{"url": url, "previous": previous} for url, previous in rows]
+
+    def compare_runs(self, old_run, new_run):
+        """
+        Diferencias entre dos rastreos del mismo sitio.
+
+        Returns:
+            dict: "added_pages" y "removed_pages" (URLs), "status_changes" (url, antes, después),
+                "new_issues" y "resolved_issues" (problema -> URLs, solo de páginas presentes en
+                los dos rastreos) y "lost" (campo -> URLs que lo han perdido).
+        """
+        def urls(query, params):
+            return [row[0] for row in self._connection.execute(query, params)]
+
+        not_in = "SELECT url FROM pages AS a WHERE a.run_id = ? AND NOT EXISTS (SELECT 1 FROM pages AS b WHERE b.run_id = ? AND b.url = a.url) ORDER BY url"
+        status_changes = self._connection.execute(
+            "SELECT new.url, old.http_status, new.http_status FROM pages AS new "
+            "JOIN pages AS old ON old.run_id = ? AND old.url = new.url "
+            "WHERE new.run_id = ? AND old.http_status IS NOT new.http_status ORDER BY new.url",
+            (old_run, new_run),
+        ).fetchall()
+        return {
+            "added_pages": urls(not_in, (new_run, old_run)),
+            "removed_pages": urls(not_in, (old_run, new_run)),
+            "status_changes": status_changes,
+            "new_issues": self._issue_difference(new_run, old_run),
+            "resolved_issues": self._issue_difference(old_run, new_run),
+            "lost": {field: [entry["url"] for entry in self.lost_field(old_run, new_run, field)]
+                     for field in LOSABLE_FIELDS},
+        }
+
+    def _issue_difference(self, run_id, other_run):
+        """Problemas de `run_id` que no tenía la misma página en `other_run` (problema -> URLs)."""
+        difference = {}
+        rows = self._connection.execute(
+            "SELECT a.issue, a.url FROM issues AS a "
+            "JOIN pages AS p ON p.run_id = ? AND p.url = a.url "
+            "WHERE a.run_id = ? AND NOT EXISTS "
+            "(SELECT 1 FROM issues AS b WHERE b.run_id = ? AND b.issue = a.issue AND b.url = a.url) "
+            "ORDER BY a.issue, a.url",
+            (other_run, run_id, other_run),
+        )
+        for issue, url in rows:
+            difference.setdefault(issue, []).append(url)
+        return difference
+
+    def issue_trend(self, site, limit=10):
+        """
+        Páginas afectadas por cada problema en los últimos rastreos de un sitio.
+
+        Returns:
+            list: (run_id, started_at, {problema: páginas}) del más antiguo al más reciente.
+        """
+        trend = []
+        for run in reversed(self.runs(site, limit)):
+            counts = dict(self._connection.execute(
+                "SELECT issue, COUNT(*) FROM issues WHERE run_id = ? GROUP BY issue", (run["run_id"],)
+            ).fetchall())
+            trend.append((run["run_id"], run["started_at"], counts))
+        return trend
+
+    def page_history(self, url):
+        """
+        Estado de una URL en cada rastreo en que aparece.
+
+        Returns:
+            list: dicts con "run_id", "started_at", "http_status", "title", "canonical_url",
+                "h1_count" e "issues".
+        """
+        history = []
+        rows = self._connection.execute(
+            "SELECT p.run_id, r.started_at, p.http_status, p.title, p.canonical_url, p.h1_count "
+            "FROM pages AS p JOIN runs AS r ON r.run_id = p.run_id WHERE p.url = ? ORDER BY r.started_at",
+            (url,),
+        ).fetchall()
+        for run_id, started_at, http_status, title, canonical_url, h1_count in rows:
+            issues = [issue for (issue,) in self._connection.execute(
+                "SELECT issue FROM issues WHERE run_id = ? AND url = ? ORDER BY issue", (run_id, url))]
+            history.append({"run_id": run_id, "started_at": started_at, "http_status": http_status, "title": title,
+                            "canonical_url": canonical_url, "h1_count": h1_count, "issues": issues})
+        return history
+
+    def inbound_links(self, run_id, url):
+        """Páginas que enlazan a `url` en un rastreo."""
+        return [source for (source,) in self._connection.execute(
+            "SELECT source_url FROM links WHERE run_id = ? AND target_url = ? ORDER BY source_url", (run_id, url))]
+
+    def iter_page_urls(self, run_id):
+        """URLs de las páginas guardadas de un rastreo."""
+        for (url,) in self._connection.execute("SELECT url FROM pages WHERE run_id = ?", (run_id,)):
+            yield url
+
+    def iter_links(self, run_id):
+        """
+        Enlaces internos de un rastreo, agrupados por página de origen.
+
+        Yields:
+            tuple: (source_url, list de target_url).
+        """
+        current_source, targets = None, []
+        for source_url, target_url in self._connection.execute(
+                "SELECT source_url, target_url FROM links WHERE run_id = ? ORDER BY source_url", (run_id,)):
+            if source_url != current_source:
+                if current_source is not None:
+                    yield current_source, targets
+                current_source, targets = source_url, []
+            targets.append(target_url)
+        if current_source is not None:
+            yield current_source, targets
+
+    def close(self):
+        self._connection.commit()
+        self._connection.close()
+
+
+def get_default_audit_history(results_dir):
+    """Histórico de auditorías dentro de 'resultados'."""
+    return AuditHistory(os.path.join(results_dir, AUDIT_HISTORY_FILE_NAME))
+
+
+def import_results(history, start_url, pages, started_at=None):
+    """
+    Guarda como un rastreo nuevo unos resultados ya existentes (p. ej. un NDJSON anterior).
+
+    Returns:
+        int: El run_id creado.
+    """
+    run_id = history.start_run(start_url, started_at)
+    aggregator = IssueAggregator()
+    for page in pages:
+        history.add_page(run_id, page)
+        aggregator.add(page)
+    history.add_issues(run_id, aggregator.result())
+    history.finish_run(run_id)
+    return run_id
+
+
+def _resolve_runs(history, args):
+    """Rastreos a comparar según --old/--new o --since (por defecto, los dos últimos)."""
+    new_run = args.new or history.latest_run(args.site)
+    if args.old:
+        old_run = args.old
+    elif args.since:
+        old_run = history.baseline_run(args.site, parse_since(args.since))
+    else:
+        previous = [run["run_id"] for run in history.runs(args.site) if run["status"] == "finished"]
+        old_run = previous[1] if len(previous) > 1 else None
+    if new_run is None or old_run is None:
+        raise SystemExit(f"No hay dos rastreos terminados de '{args.site}' para comparar.")
+    return old_run, new_run
+
+
+if __name__ == "__main__":
+    from crawler import RESULTS_DIR
+    from results_io import iter_analysis_results, NDJSON_FILE_NAME
+
+    parser = argparse.ArgumentParser(description="Consulta el histórico de auditorías SEO guardado por el crawler.")
+    parser.add_argument("--db", default=os.path.join(RESULTS_DIR, AUDIT_HISTORY_FILE_NAME), help="Archivo SQLite del histórico")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    runs_parser = subparsers.add_parser("runs", help="Lista los rastreos guardados")
+    runs_parser.add_argument("--site", help="Solo los de este sitio (dominio o URL)")
+    runs_parser.add_argument("--limit", type=int, default=20)
+
+    for name, help_text in (("lost", "Páginas que han perdido un campo (canonical, title, h1...)"),
+                            ("diff", "Diferencias entre dos rastreos de un sitio")):
+        command_parser = subparsers.add_parser(name, help=help_text)
+        if name == "lost":
+            command_parser.add_argument("field", choices=sorted(LOSABLE_FIELDS))
+        command_parser.add_argument("--site", required=True, help="Dominio o URL del sitio")
+        command_parser.add_argument("--since", help="Compara con el rastreo de esa fecha (7d, 2w, 2024-05-01...)")
+        command_parser.add_argument("--old", type=int, help="run_id de referencia")
+        command_parser.add_argument("--new", type=int, help="run_id a comparar (por defecto, el último)")
+
+    trend_parser = subparsers.add_parser("trend", help="Evolución del número de páginas con cada problema")
+    trend_parser.add_argument("--site", required=True)
+    trend_parser.add_argument("--limit", type=int, default=10)
+
+    page_parser = subparsers.add_parser("page", help="Historial de una URL")
+    page_parser.add_argument("url")
+
+    import_parser = subparsers.add_parser("import", help="Importa un NDJSON de resultados como un rastreo")
+    import_parser.add_argument("start_url", help="URL principal del sitio rastreado")
+    import_parser.add_argument("source", nargs="?", default=os.path.join(RESULTS_DIR, NDJSON_FILE_NAME))
+    args = parser.parse_args()
+
+    history = AuditHistory(args.db)
+    try:
+        if args.command == "runs":
+            for run in history.runs(args.site, args.limit):
+                print(f"#{run['run_id']:<5} {run['site']:<30} {_format_time(run['started_at'])}  "
+                      f"{run['page_count']:>6} páginas  {run['status']}")
+        elif args.command == "lost":
+            old_run, new_run = _resolve_runs(history, args)
+            lost = history.lost_field(old_run, new_run, args.field)
+            print(f"Páginas que han perdido '{args.field}' entre el rastreo #{old_run} y el #{new_run}: {len(lost)}")
+            for entry in lost:
+                print(f"- {entry['url']} (antes: {entry['previous']})")
+        elif args.command == "diff":
+            old_run, new_run = _resolve_runs(history, args)
+            diff = history.compare_runs(old_run, new_run)
+            print(f"Cambios entre el rastreo #{old_run} y el #{new_run}:")
+            print(f"Páginas nuevas: {len(diff['added_pages'])}; desaparecidas: {len(diff['removed_pages'])}")
+            for url, old_status, new_status in diff["status_changes"]:
+                print(f"- Estado HTTP {old_status} -> {new_status}: {url}")
+            for label, key in (("Problemas nuevos", "new_issues"), ("Problemas resueltos", "resolved_issues")):
+                for issue, urls in diff[key].items():
+                    print(f"- {label} · {issue}: {len(urls)} páginas ({', '.join(urls[:5])}{'...' if len(urls) > 5 else ''})")
+            for field, urls in diff["lost"].items():
+                if urls:
+                    print(f"- Han perdido '{field}': {len(urls)} páginas ({', '.join(urls[:5])}{'...' if len(urls) > 5 else ''})")
+        elif args.command == "trend":
+            for run_id, started_at, counts in history.issue_trend(args.site, args.limit):
+                summary = ", ".join(f"{issue}={count}" for issue, count in sorted(counts.items())) or "sin problemas"
+                print(f"#{run_id:<5} {_format_time(started_at)}  {summary}")
+        elif args.command == "page":
+            for entry in history.page_history(args.url):
+                print(f"#{entry['run_id']:<5} {_format_time(entry['started_at'])}  HTTP {entry['http_status']}  "
+                      f"title={entry['title']!r}  canonical={entry['canonical_url']!r}  h1={entry['h1_count']}  "
+                      f"problemas: {', '.join(entry['issues']) or '-'}")
+        elif args.command == "import":
+            run_id = import_results(history, args.start_url, iter_analysis_results(args.source))
+            print(f"Resultados de '{args.source}' importados como el rastreo #{run_id}.")
+    finally:
+        history.close()
@@ -0,0 +1,429 @@
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from analyzer import check_batch_size
+from crawler import RESULTS_DIR, parse_arguments
+from crawl_engine import DEFAULT_CONCURRENCY, DEFAULT_PARSE_WORKERS
+from fetcher import Fetcher
+from master import SEOPipeline
+
+# --- Configuración del servicio de auditorías ---
+DEFAULT_SERVICE_HOST = "127.0.0.1"
+DEFAULT_SERVICE_PORT = 8800
+DEFAULT_MAX_CONCURRENT_JOBS = 2    # Auditorías simultáneas en total (nunca dos del mismo sitio)
+DEFAULT_MAX_FINISHED_JOBS = 100    # Auditorías terminadas que se conservan en memoria para consultarlas
+SSE_KEEPALIVE_SECONDS = 15         # Sin eventos, se envía un comentario para que la conexión no se dé por muerta
+SITES_DIR_NAME = "sitios"          # Resultados y cachés de cada sitio dentro de results_dir
+
+# Opciones del informe que puede indicar quien encarga la auditoría (ver `analyzer.generate_technical_seo_report`)
+REPORT_OPTIONS = frozenset(["only_changed", "token_budget", "map_reduce", "batch_size", "max_concurrency"])
+# Opciones del rastreo que fija el servicio: el pool de procesos es el compartido y no se reanuda a medias
+FIXED_CRAWL_OPTIONS = frozenset(["parse_workers", "resume", "profile", "history_db"])
+
+FINISHED_STATUSES = frozenset(["finished", "failed", "cancelled"])
+
+
+def site_directory_name(domain):
+    """Nombre del directorio de resultados de un sitio ("example.com:8080" -> "example.com_8080")."""
+    return "".join(character if character.isalnum() or character in ".-" else "_" for character in domain)
+
+
+class AuditJob:
+    """
+    Una auditoría encargada al servicio: su estado, su resultado y sus eventos de progreso.
+
+    Los eventos se guardan numerados para que cualquier cliente pueda seguirlos desde el
+    principio o desde el último que recibió (`iter_events`), aunque se conecte tarde o se
+    reconecte a mitad.
+    """
+    def __init__(self, url, crawl_options=None, report_options=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.url = url
+        self.domain = urlparse(url).netloc.lower()
+        self.crawl_options = crawl_options or {}
+        self.report_options = report_options or {}
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.analyzed_count = None
+        self.report = None
+        self.plan = None
+        self._events = []
+        self._condition = threading.Condition()
+
+    def publish(self, event):
+        """Añade un evento de progreso (un diccionario con "stage" y "type") y avisa a quien lo espera."""
+        with self._condition:
+            self._events.append(dict(event, id=len(self._events), job=self.id))
+            self._condition.notify_all()
+
+    def set_status(self, status, **data):
+        """Cambia el estado de la auditoría y lo publica como evento {"stage": "job", "type": status}."""
+        with self._condition:
+            self.status = status
+            if status == "running":
+                self.started_at = time.time()
+            elif status in FINISHED_STATUSES:
+                self.finished_at = time.time()
+        self.publish(dict(data, stage="job", type=status))
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATUSES
+
+    def iter_events(self, after=-1, keepalive=SSE_KEEPALIVE_SECONDS):
+        """
+        Itera los eventos de la auditoría a partir del siguiente a `after`, esperando a los
+        nuevos hasta que termine.
+
+        Yields:
+            dict or None: Cada evento, o None si han pasado `keepalive` segundos sin ninguno.
+        """
+        next_id = after + 1
+        while True:
+            with self._condition:
+                if next_id >= len(self._events) and not self.finished:
+                    self._condition.wait(keepalive)
+                pending = self._events[next_id:]
+                done = self.finished
+            next_id += len(pending)
+            if not pending and done:
+                return
+            yield from pending or [None]
+
+    def describe(self, include_output=False):
+        """
+        Estado de la auditoría para la API.
+
+        Args:
+            include_output (bool): Incluye el informe y el plan ("report", "plan").
+        """
+        description = {
+            "id": self.id, "url": self.url, "domain": self.domain, "status": self.status,
+            "created_at": self.created_at, "started_at": self.started_at, "finished_at": self.finished_at,
+            "analyzed_count": self.analyzed_count, "error": self.error, "events": len(self._events),
+        }
+        if include_output:
+            description.update(report=self.report, plan=self.plan)
+        return description
+
+
+class AuditService:
+    """
+    Cola de auditorías SEO (rastreo -> informe -> plan) que se ejecutan en el mismo proceso.
+
+    Al seguir vivo entre auditorías, el servicio no vuelve a importar nada ni a crear los
+    agentes y su cliente del modelo, y comparte entre todas ellas una sesión HTTP con sus
+    conexiones keep-alive (`Fetcher`) y un pool de procesos de parseo ya arrancado. Cada sitio
+    tiene su propio directorio de resultados, así que su caché de robots.txt, el estado del
+    rastreo incremental, el estado de los enlaces y la caché del modelo se reutilizan en la
+    siguiente auditoría del mismo sitio.
+
+    Como mucho se ejecutan `max_concurrent_jobs` auditorías a la vez y nunca dos del mismo
+    sitio (comparten directorio). Las auditorías pendientes se reparten por turnos entre los
+    sitios, de modo que un sitio con muchas auditorías encoladas no retrasa a los demás.
+
+    Args:
+        results_dir (str): Directorio bajo el que se guarda cada sitio (en `SITES_DIR_NAME`).
+        max_concurrent_jobs (int): Auditorías simultáneas en total.
+        parse_workers (int): Procesos del pool de parseo compartido (0: se parsea en los hilos).
+        use_cache (bool): Reutiliza las respuestas guardadas del analizador y del estratega.
+        model (str or agents.Model, optional): Modelo del analizador y del estratega (p. ej. un
+            modelo local de pruebas).
+        crawl_defaults (dict, optional): Opciones de rastreo por defecto de todas las auditorías.
+        max_finished_jobs (int): Auditorías terminadas que se conservan para consultarlas.
+    """
+    def __init__(self, results_dir=RESULTS_DIR, max_concurrent_jobs=DEFAULT_MAX_CONCURRENT_JOBS,
+                 parse_workers=DEFAULT_PARSE_WORKERS, use_cache=True, model=None, crawl_defaults=None,
+                 max_finished_jobs=DEFAULT_MAX_FINISHED_JOBS):
+        self.results_dir = results_dir
+        self.max_concurrent_jobs = max(1, int(max_concurrent_jobs))
+        self.parse_workers = max(0, int(parse_workers))
+        self.use_cache = use_cache
+        self.model = model
+        self.crawl_defaults = dict(crawl_defaults or {})
+        self.max_finished_jobs = max_finished_jobs
+        self.fetcher = Fetcher(pool_size=self.max_concurrent_jobs * DEFAULT_CONCURRENCY)
+        self.parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers) if self.parse_workers else None
+        self.jobs = OrderedDict()       # id -> AuditJob, en orden de llegada
+        self._pending = OrderedDict()   # dominio -> deque de auditorías en cola; el orden es el turno
+        self._running_domains = set()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._workers = [threading.Thread(target=self._work, name=f"audit-worker-{index}", daemon=True)
+                         for index in range(self.max_concurrent_jobs)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, url, crawl_options=None, report_options=None):
+        """
+        Encola una auditoría.
+
+        Args:
+            url (str): URL principal del sitio (http o https).
+            crawl_options (dict, optional): Opciones de `crawler.crawl_site` (max_pages, concurrency...).
+            report_options (dict, optional): Opciones del informe (ver `REPORT_OPTIONS`).
+        Returns:
+            AuditJob: La auditoría encolada.
+        Raises:
+            ValueError: Si la URL no es http(s) o alguna opción no existe o no se puede cambiar.
+        """
+        if urlparse(url or "").scheme not in ("http", "https") or not urlparse(url).netloc:
+            raise ValueError(f"URL no válida: '{url}'")
+        crawl_options = dict(crawl_options or {})
+        report_options = dict(report_options or {})
+        known_crawl_options = vars(parse_arguments([url]))
+        for name in crawl_options:
+            if name not in known_crawl_options or name == "url" or name in FIXED_CRAWL_OPTIONS:
+                raise ValueError(f"Opción de rastreo no admitida: '{name}'")
+        for name in report_options:
+            if name not in REPORT_OPTIONS:
+                raise ValueError(f"Opción del informe no admitida: '{name}'")
+        if "batch_size" in report_options:
+            check_batch_size(report_options["batch_size"])
+
+        job = AuditJob(url, dict(self.crawl_defaults, **crawl_options), report_options)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("El servicio de auditorías está cerrado")
+            # El evento se publica antes de encolarla: ningún trabajador puede haberla empezado aún
+            job.set_status("queued", url=url, position=sum(len(jobs) for jobs in self._pending.values()) + 1)
+            self.jobs[job.id] = job
+            self._pending.setdefault(job.domain, deque()).append(job)
+            self._forget_finished_jobs()
+            self._condition.notify()
+        return job
+
+    def get(self, job_id):
+        with self._condition:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self):
+        with self._condition:
+            return list(self.jobs.values())
+
+    def cancel(self, job_id):
+        """
+        Cancela una auditoría que aún no ha empezado.
+
+        Returns:
+            bool: True si se ha cancelado; False si no existe o ya ha empezado.
+        """
+        with self._condition:
+            job = self.jobs.get(job_id)
+            if job is None or job.status != "queued":
+                return False
+            self._pending[job.domain].remove(job)
+            if not self._pending[job.domain]:
+                del self._pending[job.domain]
+            job.set_status("cancelled")
+        return True
+
+    def _forget_finished_jobs(self):
+        finished_ids = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished_ids[:max(0, len(finished_ids) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+    def _next_job(self):
+        """La siguiente auditoría pendiente de un sitio que no tenga otra en marcha, por turnos."""
+        for domain, jobs in self._pending.items():
+            if domain in self._running_domains:
+                continue
+            job = jobs.popleft()
+            del self._pending[domain]
+            if jobs:
+                self._pending[domain] = jobs # El sitio pasa al final del turno
+            self._running_domains.add(domain)
+            return job
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None and not self._closed:
+                    self._condition.wait()
+                    job = self._next_job()
+                if job is None:
+                    return
+            try:
+                self._run(job)
+            finally:
+                with self._condition:
+                    self._running_domains.discard(job.domain)
+                    self._condition.notify_all()
+
+    def site_results_dir(self, domain):
+        return os.path.join(self.results_dir, SITES_DIR_NAME, site_directory_name(domain))
+
+    def _run(self, job):
+        # Cualquier fallo, también al preparar la auditoría, la deja en "failed" con su evento final
+        try:
+            job.set_status("running")
+            pipeline = SEOPipeline(results_dir=self.site_results_dir(job.domain), on_event=job.publish,
+                                   use_cache=self.use_cache, model=self.model, stream_output=True)
+            crawl_options = dict(job.crawl_options, fetcher=self.fetcher, parse_pool=self.parse_pool,
+                                 parse_workers=self.parse_workers)
+            outcome = pipeline.run(job.url, crawl_options=crawl_options, report_options=job.report_options)
+        except Exception as e:
+            job.error = str(e)
+            job.set_status("failed", error=job.error)
+            return
+        job.analyzed_count = len(outcome["results"])
+        job.report = outcome["report"]
+        job.plan = outcome["plan"]
+        job.set_status("finished", analyzed_count=job.analyzed_count)
+
+    def close(self, wait=True):
+        """Deja de aceptar auditorías, cancela las pendientes y libera el pool de parseo y las conexiones."""
+        with self._condition:
+            self._closed = True
+            pending_jobs = [job for jobs in self._pending.values() for job in jobs]
+            self._pending.clear()
+            self._condition.notify_all()
+        for job in pending_jobs:
+            job.set_status("cancelled")
+        if wait:
+            for worker in self._workers:
+                worker.join()
+        if self.parse_pool is not None:
+            self.parse_pool.shutdown(cancel_futures=True)
+        self.fetcher.close()
+
+
+class AuditRequestHandler(BaseHTTPRequestHandler):
+    """
+    API HTTP del servicio de auditorías:
+
+        POST   /jobs              {"url": ..., "crawl_options": {...}, "report_options": {...}} -> 202
+        GET    /jobs              Estado de todas las auditorías
+        GET    /jobs/<id>         Estado, informe y plan de una auditoría
+        GET    /jobs/<id>/events  Eventos de progreso como Server-Sent Events (admite Last-Event-ID)
+        DELETE /jobs/<id>         Cancela una auditoría que aún no ha empezado
+    """
+    server_version = "SEOAuditService/1.0"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        pass # El progreso de las auditorías ya se muestra por consola
+
+    def _send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self):
+        """(auditoría o None, subrecurso) de la ruta /jobs/<id>[/<subrecurso>]."""
+        parts = [part for part in urlparse(self.path).path.split("/") if part]
+        if not parts or parts[0] != "jobs" or len(parts) > 3:
+            return None, None
+        if len(parts) == 1:
+            return None, ""
+        return self.service.get(parts[1]), (parts[2] if len(parts) == 3 else None)
+
+    def do_POST(self):
+        job, resource = self._route()
+        if resource != "":
+            return self._send_json(404, {"error": "Ruta no encontrada"})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            job = self.service.submit(request.get("url"), request.get("crawl_options"), request.get("report_options"))
+        except (ValueError, AttributeError, TypeError) as e:
+            return self._send_json(400, {"error": str(e)})
+        except RuntimeError as e:
+            return self._send_json(503, {"error": str(e)})
+        self._send_json(202, dict(job.describe(), events_url=f"/jobs/{job.id}/events"))
+
+    def do_GET(self):
+        job, resource = self._route()
+        if resource == "":
+            return self._send_json(200, [job.describe() for job in self.service.list_jobs()])
+        if job is None:
+            return self._send_json(404, {"error": "Auditoría no encontrada"})
+        if resource is None:
+            return self._send_json(200, job.describe(include_output=True))
+        if resource == "events":
+            return self._stream_events(job)
+        self._send_json(404, {"error": "Ruta no encontrada"})
+
+    def do_DELETE(self):
+        job, resource = self._route()
+        if job is None or resource is not None:
+            return self._send_json(404, {"error": "Auditoría no encontrada"})
+        if not self.service.cancel(job.id):
+            return self._send_json(409, {"error": f"La auditoría ya está en estado '{job.status}'"})
+        self._send_json(200, job.describe())
+
+    def _stream_events(self, job):
+        """Envía los eventos de la auditoría como Server-Sent Events hasta que termina."""
+        try:
+            after = int(self.headers.get("Last-Event-ID", -1))
+        except ValueError:
+            after = -1
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            for event in job.iter_events(after):
+                if event is None:
+                    self.wfile.write(b": keepalive\n\n")
+                else:
+                    data = json.dumps(event, ensure_ascii=False)
+                    self.wfile.write(f"id: {event['id']}\nevent: {event['stage']}\ndata: {data}\n\n".encode("utf-8"))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass # El cliente se ha desconectado; la auditoría sigue
+
+
+def create_server(service, host=DEFAULT_SERVICE_HOST, port=DEFAULT_SERVICE_PORT):
+    """Servidor HTTP (un hilo por conexión) de la API del servicio; se arranca con `serve_forever()`."""
+    server = ThreadingHTTPServer((host, port), AuditRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servicio HTTP que encola auditorías SEO y transmite su progreso (SSE).")
+    parser.add_argument("--host", default=DEFAULT_SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_SERVICE_PORT)
+    parser.add_argument("--max-jobs", type=int, default=DEFAULT_MAX_CONCURRENT_JOBS, help="Auditorías simultáneas")
+    parser.add_argument("--parse-workers", type=int, default=DEFAULT_PARSE_WORKERS,
+                        help="Procesos de parseo compartidos por todas las auditorías (0 para parsear en los hilos)")
+    parser.add_argument("--max-pages", type=int, default=None, help="Páginas máximas por auditoría si no se indican")
+    parser.add_argument("--model", default=None, help="Modelo del analizador y del estratega")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Llama siempre al modelo, sin reutilizar respuestas de la caché local")
+    args = parser.parse_args()
+
+    crawl_defaults = {} if args.max_pages is None else {"max_pages": args.max_pages}
+    service = AuditService(max_concurrent_jobs=args.max_jobs, parse_workers=args.parse_workers,
+                           use_cache=not args.no_cache, model=args.model, crawl_defaults=crawl_defaults)
+    server = create_server(service, args.host, args.port)
+    print(f"Servicio de auditorías SEO escuchando en http://{args.host}:{args.port} "
+          f"(POST /jobs para encargar una auditoría).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nDeteniendo el servicio de auditorías...")
+    finally:
+        server.server_close()
+        service.close(wait=False)
@@ -0,0 +1,468 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tracing import percentile
+
+# --- Configuración por defecto del sitio sintético ---
+DEFAULT_BENCH_PAGES = 300
+DEFAULT_BENCH_FANOUT = 8             # Enlaces internos por página
+DEFAULT_BENCH_PAGE_SIZE = 15000      # Bytes aproximados de HTML por página
+DEFAULT_BENCH_SLOW_RATIO = 0.02      # Fracción de páginas que tardan `slow_delay` en responder
+DEFAULT_BENCH_SLOW_DELAY = 0.3
+DEFAULT_BENCH_ERROR_RATIO = 0.02     # Fracción de páginas que responden 500 (o 404 si la URL no existe)
+DEFAULT_BENCH_SEED = 42
+SITEMAP_CHUNK_SIZE = 1000            # URLs por sitemap del índice
+DISALLOWED_PREFIX = "/private/"      # Ruta bloqueada en el robots.txt del sitio sintético
+
+# --- Configuración de las mediciones ---
+BENCH_STAGES = ("crawl", "fetch", "parse")
+DEFAULT_BENCH_CONCURRENCY = 8
+DEFAULT_BENCH_REPEAT = 1
+DEFAULT_REGRESSION_THRESHOLD = 0.15  # Empeoramiento relativo a partir del cual se marca una regresión
+BASELINE_FILE_NAME = "benchmark_baseline.json"
+STAGE_RESULT_MARKER = "BENCHMARK_RESULT "
+HIGHER_IS_BETTER = frozenset(["pages_per_sec"])
+
+_FILLER_WORDS = ("seo técnico rastreo enlace página contenido servidor índice etiqueta canonical "
+                 "robots sitemap velocidad imagen texto usuario búsqueda resultado estructura").split()
+
+
+def peak_rss_mb():
+    """Memoria residente máxima de este proceso y de sus hijos ya terminados, en MB."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024 # ru_maxrss está en bytes en macOS y en KB en Linux
+    return round(max(own, children) / divisor, 1)
+
+
+class SyntheticSite:
+    """
+    Sitio web generado de forma determinista para medir el crawler sin depender de Internet.
+
+    Con la misma `seed` se generan siempre las mismas páginas, enlaces, páginas lentas y
+    páginas con error, así que dos mediciones del mismo código son comparables. El HTML se
+    genera bajo demanda (no se guarda en memoria) con title, meta description, canonical,
+    encabezados, imágenes (algunas sin alt), `fanout` enlaces internos y texto de relleno
+    hasta `page_size` bytes. También sirve un robots.txt que bloquea `DISALLOWED_PREFIX` y
+    un índice de sitemaps con todas las páginas.
+
+    Args:
+        pages (int): Número de páginas del sitio.
+        fanout (int): Enlaces internos por página (uno de ellos siempre a la página siguiente,
+            para que todas sean alcanzables desde la portada).
+        page_size (int): Tamaño aproximado del HTML de cada página en bytes.
+        slow_ratio (float): Fracción de páginas que tardan `slow_delay` segundos.
+        slow_delay (float): Retardo de las páginas lentas.
+        error_ratio (float): Fracción de páginas que responden 500.
+        seed (int): Semilla de la generación.
+    """
+    def __init__(self, pages=DEFAULT_BENCH_PAGES, fanout=DEFAULT_BENCH_FANOUT, page_size=DEFAULT_BENCH_PAGE_SIZE,
+                 slow_ratio=DEFAULT_BENCH_SLOW_RATIO, slow_delay=DEFAULT_BENCH_SLOW_DELAY,
+                 error_ratio=DEFAULT_BENCH_ERROR_RATIO, seed=DEFAULT_BENCH_SEED):
+        self.pages = pages
+        self.fanout = fanout
+        self.page_size = page_size
+        self.slow_ratio = slow_ratio
+        self.slow_delay = slow_delay
+        self.error_ratio = error_ratio
+        self.seed = seed
+        rng = random.Random(seed)
+        self._kinds = ["ok"] * pages
+        for index in range(1, pages): # La portada siempre responde bien
+            roll = rng.random()
+            if roll < error_ratio:
+                self._kinds[index] = "error"
+            elif roll < error_ratio + slow_ratio:
+                self._kinds[index] = "slow"
+        self._link_seeds = [rng.randrange(1 << 30) for _ in range(pages)]
+        self._filler = " ".join(rng.choice(_FILLER_WORDS) for _ in range(400))
+        self._lastmod_base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def config(self):
+        """Argumentos con los que se vuelve a generar exactamente el mismo sitio."""
+        return {"pages": self.pages, "fanout": self.fanout, "page_size": self.page_size, "slow_ratio": self.slow_ratio,
+                "slow_delay": self.slow_delay, "error_ratio": self.error_ratio, "seed": self.seed}
+
+    @staticmethod
+    def page_path(index):
+        return "/" if index == 0 else f"/p/{index}"
+
+    def page_links(self, index):
+        """Rutas enlazadas desde una página (deterministas)."""
+        rng = random.Random(self._link_seeds[index])
+        targets = [(index + 1) % self.pages] + [rng.randrange(self.pages) for _ in range(max(0, self.fanout - 1))]
+        links = [self.page_path(target) for target in targets]
+        if index % 10 == 0:
+            links.append(f"{DISALLOWED_PREFIX}{index}") # Enlaces bloqueados por robots.txt
+        return links
+
+    def render_page(self, index):
+        """HTML de una página."""
+        links = "".join(f'<li><a href="{path}">Enlace {position}</a></li>'
+                        for position, path in enumerate(self.page_links(index)))
+        head = (f'<!DOCTYPE html><html lang="es"><head><meta charset="utf-8">'
+                f'<title>Página sintética {index}</title>'
+                f'<meta name="description" content="Descripción de la página sintética {index}">'
+                f'<meta name="viewport" content="width=device-width, initial-scale=1">'
+                f'<link rel="canonical" href="{self.page_path(index)}">'
+                f'<script type="application/ld+json">{{"@context": "https://schema.org", "@type": "WebPage", "name": "Página {index}"}}</script>'
+                f'</head><body><h1>Página {index}</h1><nav><ul>{links}</ul></nav>'
+                f'<img src="/img/{index}.png" alt="Imagen {index}"><img src="/img/{index}-b.png">')
+        sections, size, section = [], len(head), 0
+        while size < self.page_size:
+            paragraph = f"<h2>Sección {section}</h2><p>{self._filler}</p>"
+            sections.append(paragraph)
+            size += len(paragraph)
+            section += 1
+        return (head + "".join(sections) + "</body></html>").encode("utf-8")
+
+    def robots_txt(self, base_url):
+        return f"User-agent: *\nDisallow: {DISALLOWED_PREFIX}\nSitemap: {base_url}/sitemap.xml\n".encode("utf-8")
+
+    def sitemap_index(self, base_url):
+        chunks = (self.pages + SITEMAP_CHUNK_SIZE - 1) // SITEMAP_CHUNK_SIZE
+        entries = "".join(f"<sitemap><loc>{base_url}/sitemap-{chunk}.xml</loc></sitemap>" for chunk in range(chunks))
+        return ('<?xml version="1.0" encoding="UTF-8"?>'
+                f'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</sitemapindex>').encode("utf-8")
+
+    def sitemap(self, base_url, chunk):
+        start = chunk * SITEMAP_CHUNK_SIZE
+        entries = "".join(
+            f"<url><loc>{base_url}{self.page_path(index)}</loc>"
+            f"<lastmod>{(self._lastmod_base + timedelta(hours=index)).strftime('%Y-%m-%dT%H:%M:%SZ')}</lastmod></url>"
+            for index in range(start, min(self.pages, start + SITEMAP_CHUNK_SIZE))
+        )
+        return ('<?xml version="1.0" encoding="UTF-8"?>'
+                f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>').encode("utf-8")
+
+    def page_index(self, path):
+        """Índice de la página de una ruta o None si la ruta no es una página del sitio."""
+        if path == "/":
+            return 0
+        if path.startswith("/p/"):
+            try:
+                index = int(path[3:])
+            except ValueError:
+                return None
+            return index if 0 < index < self.pages else None
+        return None
+
+    def respond(self, path, base_url):
+        """
+        Respuesta para una ruta.
+
+        Returns:
+            tuple: (estado HTTP, Content-Type, cuerpo en bytes, segundos de retardo)
+        """
+        path = path.split("?", 1)[0]
+        if path == "/robots.txt":
+            return 200, "text/plain; charset=utf-8", self.robots_txt(base_url), 0
+        if path == "/sitemap.xml":
+            return 200, "application/xml", self.sitemap_index(base_url), 0
+        if path.startswith("/sitemap-") and path.endswith(".xml"):
+            try:
+                return 200, "application/xml", self.sitemap(base_url, int(path[len("/sitemap-"):-len(".xml")])), 0
+            except ValueError:
+                pass
+        index = self.page_index(path)
+        if index is None:
+            return 404, "text/html; charset=utf-8", b"<html><head><title>No encontrada</title></head><body></body></html>", 0
+        kind = self._kinds[index]
+        if kind == "error":
+            return 500, "text/html; charset=utf-8", b"<html><head><title>Error</title></head><body></body></html>", 0
+        return 200, "text/html; charset=utf-8", self.render_page(index), self.slow_delay if kind == "slow" else 0
+
+
+class SyntheticSiteServer:
+    """
+    Servidor HTTP local (en un hilo) que sirve un `SyntheticSite`.
+
+    Anota el instante (`time.monotonic()`) de la primera petición de cada ruta en
+    `request_times`, para medir la latencia de cada página de principio a fin.
+    Se usa como gestor de contexto: `with SyntheticSiteServer(site) as server: server.url`.
+    """
+    def __init__(self, site, host="127.0.0.1", port=0):
+        self.site = site
+        self.request_times = {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                server.request_times.setdefault(self.path, time.monotonic())
+                status, content_type, body, delay = server.site.respond(self.path, server.url)
+                if delay:
+                    time.sleep(delay)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self.url = f"http://{host}:{self._httpd.server_address[1]}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="synthetic-site", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+# --- Etapas medidas (cada una se ejecuta en un proceso aparte para medir su memoria máxima) ---
+
+def bench_crawl(site_url, config):
+    """Rastreo completo con `crawler.crawl_site` en un directorio de resultados temporal."""
+    from crawler import crawl_site
+
+    results_dir = tempfile.mkdtemp(prefix="seo-bench-")
+    completed_at = {}
+    try:
+        started_at = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()): # El crawler informa de cada página por consola
+            summary = crawl_site(site_url, results_dir=results_dir,
+                                 on_result=lambda result: completed_at.setdefault(result["url"], time.monotonic()),
+                                 max_pages=config["site"]["pages"], concurrency=config["concurrency"], delay=0,
+                                 parse_workers=config["parse_workers"])
+        elapsed = time.perf_counter() - started_at
+    finally:
+        shutil.rmtree(results_dir, ignore_errors=True)
+    return {"pages": summary["analyzed_count"], "elapsed_s": round(elapsed, 3),
+            "pages_per_sec": round(summary["analyzed_count"] / elapsed, 2) if elapsed else None,
+            "completed_at": completed_at, "peak_rss_mb": peak_rss_mb()}
+
+
+def bench_fetch(site_url, config):
+    """Solo descargas: todas las páginas del sitio con el `Fetcher` compartido del crawler."""
+    from fetcher import Fetcher
+
+    site = SyntheticSite(**config["site"])
+    urls = [site_url + site.page_path(index) for index in range(site.pages)]
+    fetcher = Fetcher(pool_size=config["concurrency"])
+    try:
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=config["concurrency"]) as pool:
+            latencies = [result.total_time for result in pool.map(fetcher.fetch, urls)]
+        elapsed = time.perf_counter() - started_at
+    finally:
+        fetcher.close()
+    return {"pages": len(urls), "elapsed_s": round(elapsed, 3), "pages_per_sec": round(len(urls) / elapsed, 2),
+            "latency_p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+            "latency_p95_ms": round(percentile(latencies, 0.95) * 1000, 2), "peak_rss_mb": peak_rss_mb()}
+
+
+def bench_parse(site_url, config):
+    """Solo parseo: `extractor.extract_page` sobre el HTML de todas las páginas, sin red."""
+    from extractor import extract_page
+    from urllib.parse import urlparse
+
+    site = SyntheticSite(**config["site"])
+    base_domain = urlparse(site_url).netloc
+    parse_times = []
+    for index in range(site.pages):
+        html_content = site.render_page(index).decode("utf-8")
+        started_at = time.perf_counter()
+        extract_page(html_content, site_url + site.page_path(index), base_domain)
+        parse_times.append(time.perf_counter() - started_at)
+    return {"pages": site.pages, "parse_ms_mean": round(sum(parse_times) / len(parse_times) * 1000, 3),
+            "parse_ms_p95": round(percentile(parse_times, 0.95) * 1000, 3), "peak_rss_mb": peak_rss_mb()}
+
+
+STAGE_FUNCTIONS = {"crawl": bench_crawl, "fetch": bench_fetch, "parse": bench_parse}
+
+
+def run_stage(stage, server, config):
+    """
+    Ejecuta una etapa en un proceso hijo contra el servidor sintético.
+
+    Returns:
+        dict: Las métricas de la etapa.
+    Raises:
+        RuntimeError: Si el proceso hijo falla o no devuelve resultados.
+    """
+    server.request_times.clear()
+    process = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-stage", stage, "--site-url", server.url,
+         "--stage-config", json.dumps(config)],
+        capture_output=True, text=True,
+    )
+    for line in reversed(process.stdout.splitlines()):
+        if line.startswith(STAGE_RESULT_MARKER):
+            metrics = json.loads(line[len(STAGE_RESULT_MARKER):])
+            break
+    else:
+        raise RuntimeError(f"La etapa '{stage}' no devolvió resultados (código {process.returncode}):\n{process.stderr[-2000:]}")
+
+    completed_at = metrics.pop("completed_at", None)
+    if completed_at is not None:
+        # Latencia de cada página: desde que el servidor recibe su petición hasta que el crawler entrega su análisis
+        latencies = [finished - server.request_times[url[len(server.url):] or "/"]
+                     for url, finished in completed_at.items() if (url[len(server.url):] or "/") in server.request_times]
+        metrics["latency_p50_ms"] = round(percentile(latencies, 0.5) * 1000, 2) if latencies else None
+        metrics["latency_p95_ms"] = round(percentile(latencies, 0.95) * 1000, 2) if latencies else None
+    return metrics
+
+
+def median_metrics(samples):
+    """Mediana de cada métrica de varias repeticiones de una etapa."""
+    return {key: percentile([sample[key] for sample in samples if sample.get(key) is not None], 0.5)
+            for key in samples[0]}
+
+
+def run_benchmark(site, stages=BENCH_STAGES, concurrency=DEFAULT_BENCH_CONCURRENCY, parse_workers=0,
+                  repeat=DEFAULT_BENCH_REPEAT):
+    """
+    Mide las etapas indicadas contra un servidor local con el sitio sintético.
+
+    Returns:
+        dict: {"config": configuración de la medición, "stages": {etapa: métricas}}.
+    """
+    config = {"site": site.config(), "concurrency": concurrency, "parse_workers": parse_workers}
+    results = {}
+    with SyntheticSiteServer(site) as server:
+        print(f"Sitio sintético de {site.pages} páginas servido en {server.url}")
+        for stage in stages:
+            samples = []
+            for attempt in range(1, repeat + 1):
+                print(f"   Midiendo la etapa '{stage}' ({attempt}/{repeat})...")
+                samples.append(run_stage(stage, server, config))
+            results[stage] = median_metrics(samples)
+    return {"config": config, "stages": results}
+
+
+def compare_with_baseline(results, baseline, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """
+    Compara unas mediciones con la línea base guardada.
+
+    Returns:
+        list: Regresiones como dicts {"stage", "metric", "baseline", "current", "change"}
+            (cambio relativo, positivo = peor).
+    """
+    regressions = []
+    for stage, metrics in results["stages"].items():
+        baseline_metrics = baseline.get("stages", {}).get(stage, {})
+        for metric, current in metrics.items():
+            previous = baseline_metrics.get(metric)
+            if metric == "pages" or not previous or current is None:
+                continue
+            change = (previous - current) / previous if metric in HIGHER_IS_BETTER else (current - previous) / previous
+            if change > threshold:
+                regressions.append({"stage": stage, "metric": metric, "baseline": previous, "current": current,
+                                    "change": round(change, 3)})
+    return regressions
+
+
+def print_results(results):
+    for stage, metrics in results["stages"].items():
+        print(f"\n[{stage}]")
+        for metric, value in metrics.items():
+            print(f"   {metric:<16} {value}")
+
+
+if __name__ == "__main__":
+    from crawler import RESULTS_DIR
+
+    parser = argparse.ArgumentParser(description="Mide el rendimiento del crawler contra un sitio sintético local.")
+    parser.add_argument("--pages", type=int, default=DEFAULT_BENCH_PAGES, help="Páginas del sitio sintético")
+    parser.add_argument("--fanout", type=int, default=DEFAULT_BENCH_FANOUT, help="Enlaces internos por página")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_BENCH_PAGE_SIZE, help="Bytes aproximados de HTML por página")
+    parser.add_argument("--slow-ratio", type=float, default=DEFAULT_BENCH_SLOW_RATIO, help="Fracción de páginas lentas")
+    parser.add_argument("--slow-delay", type=float, default=DEFAULT_BENCH_SLOW_DELAY, help="Segundos de las páginas lentas")
+    parser.add_argument("--error-ratio", type=float, default=DEFAULT_BENCH_ERROR_RATIO, help="Fracción de páginas con error 500")
+    parser.add_argument("--seed", type=int, default=DEFAULT_BENCH_SEED, help="Semilla del sitio sintético")
+    parser.add_argument("--stages", default=",".join(BENCH_STAGES), help=f"Etapas a medir ({', '.join(BENCH_STAGES)})")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_BENCH_CONCURRENCY, help="Descargas simultáneas")
+    parser.add_argument("--parse-workers", type=int, default=0, help="Procesos de parseo del rastreo completo")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_BENCH_REPEAT, help="Repeticiones de cada etapa (se usa la mediana)")
+    parser.add_argument("--baseline", default=os.path.join(RESULTS_DIR, BASELINE_FILE_NAME), help="Archivo de la línea base")
+    parser.add_argument("--save-baseline", action="store_true", help="Guarda estas mediciones como nueva línea base")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help="Empeoramiento relativo que se considera regresión (0.15 = 15 %%)")
+    parser.add_argument("--output", help="Guarda las mediciones en este archivo JSON")
+    parser.add_argument("--serve", action="store_true", help="Solo sirve el sitio sintético hasta pulsar Ctrl+C")
+    parser.add_argument("--port", type=int, default=0, help="Puerto del servidor con --serve")
+    parser.add_argument("--run-stage", choices=BENCH_STAGES, help=argparse.SUPPRESS)
+    parser.add_argument("--site-url", help=argparse.SUPPRESS)
+    parser.add_argument("--stage-config", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stage: # Proceso hijo de `run_stage`
+        stage_metrics = STAGE_FUNCTIONS[args.run_stage](args.site_url, json.loads(args.stage_config))
+        print(STAGE_RESULT_MARKER + json.dumps(stage_metrics))
+        sys.exit(0)
+
+    synthetic_site = SyntheticSite(pages=args.pages, fanout=args.fanout, page_size=args.page_size,
+                                   slow_ratio=args.slow_ratio, slow_delay=args.slow_delay,
+                                   error_ratio=args.error_ratio, seed=args.seed)
+    if args.serve:
+        with SyntheticSiteServer(synthetic_site, port=args.port) as site_server:
+            print(f"Sitio sintético de {args.pages} páginas servido en {site_server.url} (Ctrl+C para terminar)")
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                pass
+        sys.exit(0)
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown_stages = set(stages) - set(BENCH_STAGES)
+    if unknown_stages:
+        parser.error(f"Etapas desconocidas: {', '.join(sorted(unknown_stages))}")
+
+    benchmark_results = run_benchmark(synthetic_site, stages, args.concurrency, args.parse_workers, args.repeat)
+    benchmark_results["created_at"] = datetime.now().isoformat(timespec="seconds")
+    print_results(benchmark_results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(benchmark_results, f, indent=2)
+
+    exit_code = 0
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline_results = json.load(f)
+        if baseline_results.get("config") != benchmark_results["config"]:
+            print("\nAviso: la línea base se midió con otra configuración; la comparación puede no ser fiable.")
+        regressions = compare_with_baseline(benchmark_results, baseline_results, args.threshold)
+        if regressions:
+            exit_code = 1
+            print(f"\n❌ Regresiones respecto a la línea base ({baseline_results.get('created_at', '-')}):")
+            for regression in regressions:
+                print(f"   [{regression['stage']}] {regression['metric']}: {regression['baseline']} -> "
+                      f"{regression['current']} ({regression['change']:+.0%})")
+        else:
+            print(f"\n✅ Sin regresiones respecto a la línea base (umbral {args.threshold:.0%}).")
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(benchmark_results, f, indent=2)
+        print(f"\nLínea base guardada en '{args.baseline}'.")
+    sys.exit(exit_code)
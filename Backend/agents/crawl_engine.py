@@ -0,0 +1,342 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlparse, urljoin
+
+import requests
+
+from frontier import Frontier
+from tracing import fetch_timings_ms
+from robots_cache import get_default_robots_cache
+from url_normalizer import URLNormalizer
+
+# --- Valores por defecto del motor de rastreo ---
+DEFAULT_CONCURRENCY = 4     # Peticiones simultáneas en vuelo
+DEFAULT_HOST_DELAY = 0.5    # Segundos mínimos entre dos peticiones al mismo host
+DEFAULT_PARSE_WORKERS = os.cpu_count() or 1  # Procesos que parsean el HTML en paralelo
+DEFAULT_CHECKPOINT_INTERVAL = 30  # Segundos entre checkpoints de la cola de rastreo
+
+
+class HostRateLimiter:
+    """
+    Limita el ritmo de peticiones por host.
+
+    Cada host tiene un intervalo mínimo entre el inicio de dos peticiones consecutivas.
+    Los hilos reservan su "turno" bajo un lock y duermen fuera de él, de modo que
+    varios hosts distintos no se bloquean entre sí.
+    """
+    def __init__(self, default_delay=DEFAULT_HOST_DELAY):
+        self.default_delay = default_delay
+        self._delays = {}
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def set_delay(self, host, delay):
+        """Fija el intervalo mínimo (en segundos) para un host concreto."""
+        with self._lock:
+            self._delays[host] = max(0.0, float(delay))
+
+    def get_delay(self, host):
+        with self._lock:
+            return self._delays.get(host, self.default_delay)
+
+    def wait(self, host):
+        """Bloquea el hilo actual hasta que el host admita una nueva petición."""
+        with self._lock:
+            delay = self._delays.get(host, self.default_delay)
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + delay
+        sleep_for = slot - now
+        if sleep_for > 0:
+            time.sleep(sleep_for)
+
+
+class CrawlEngine:
+    """
+    Motor de rastreo concurrente en tres etapas.
+
+    1. Descarga: un pool de hilos mantiene hasta `concurrency` peticiones en vuelo y respeta un
+       intervalo mínimo por host (el mayor entre `delay` y el Crawl-delay de robots.txt).
+       `page_fetcher(url)` devuelve un `FetchResult` o lanza una excepción.
+    2. Parseo: los bytes descargados se pasan a `page_parser(url, content, encoding)`, que devuelve
+       (page_metrics, found_internal_links). Con `parse_workers > 0` se ejecuta en un pool de
+       procesos, así que debe ser una función de módulo (picklable); con 0 se ejecuta en el
+       mismo hilo de descarga. Si se pasa un `parse_pool` ya creado (p. ej. compartido entre
+       rastreos), se usa ese en lugar de crear uno nuevo y no se cierra al terminar.
+    3. Resultado: `result_builder(url, page_metrics, fetch_result)` compone el `analysis_results`
+       en el hilo principal, que también añade los enlaces descubiertos a la cola.
+
+    Si el parseo se queda atrás, se dejan de lanzar descargas nuevas hasta que haya como
+    mucho `max_pending_parses` páginas esperando a ser parseadas.
+    Las URLs que robots.txt no permite rastrear se descartan antes de pedirlas.
+
+    La cola de URLs es un `Frontier` (BFS, DFS o por prioridad). Si se pasa un
+    `FrontierCheckpoint`, su estado se guarda cada `checkpoint_interval` segundos y al terminar,
+    de modo que un rastreo interrumpido puede reanudarse pasando el `frontier` y el
+    `resume_state` cargados del checkpoint.
+
+    Con un `recrawl_state` (ver `recrawl_state.RecrawlState`), las páginas que no han cambiado
+    desde el rastreo anterior (304 o mismo hash del cuerpo) no se parsean: se reutiliza su
+    `analysis_results` y se siguen sus enlaces guardados.
+
+    Todas las URLs pasan por `url_normalizer` antes de entrar en la cola, de modo que las
+    variantes de una misma página se rastrean una sola vez. Si el normalizador tiene
+    `respect_canonical`, una página cuyo rel=canonical apunta a otra URL del sitio encola esa
+    URL canónica en lugar de seguir sus propios enlaces (evita recorrer todas las combinaciones
+    de filtros de un e-commerce).
+
+    Con un `tracer` (ver `tracing.Tracer`) se registran los tiempos por etapa de cada página,
+    la espera por el límite de ritmo y contadores de páginas, errores y bytes transferidos.
+    """
+    def __init__(self, start_url, page_fetcher, page_parser, result_builder, max_pages=20,
+                 concurrency=DEFAULT_CONCURRENCY, delay=DEFAULT_HOST_DELAY, respect_crawl_delay=True,
+                 robots_cache=None, parse_workers=0, max_pending_parses=None, frontier=None,
+                 checkpoint=None, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL, resume_state=None,
+                 recrawl_state=None, url_normalizer=None, tracer=None, parse_pool=None):
+        self.url_normalizer = url_normalizer or URLNormalizer()
+        start_url = self.url_normalizer(start_url)
+        self.start_url = start_url
+        self.page_fetcher = page_fetcher
+        self.page_parser = page_parser
+        self.result_builder = result_builder
+        self.max_pages = max_pages
+        self.concurrency = max(1, int(concurrency))
+        self.base_domain = urlparse(start_url).netloc
+        self.rate_limiter = HostRateLimiter(default_delay=delay)
+        self.respect_crawl_delay = respect_crawl_delay
+        self.robots_cache = robots_cache or get_default_robots_cache()
+        self.parse_pool = parse_pool
+        self.parse_workers = max(0, int(parse_workers))
+        if parse_pool is not None and not self.parse_workers:
+            self.parse_workers = 1 # Con un pool ya creado el parseo siempre se hace en él
+        self.max_pending_parses = max_pending_parses or max(1, self.parse_workers * 2)
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        self.recrawl_state = recrawl_state
+        self.tracer = tracer
+        self.disallowed_urls = []
+        self.failed_urls = {}          # URL -> error de la descarga o del parseo
+        self.reused_urls = []
+        self.canonicalized_urls = {}   # URL rastreada -> URL canónica que declara
+
+        if frontier is None:
+            frontier = Frontier()
+            frontier.add(start_url, depth=0)
+        self.frontier = frontier
+        self.scheduled_count = (resume_state or {}).get("scheduled_count", 0)
+        self.analyzed_count = (resume_state or {}).get("analyzed_count", 0)
+
+    def _configure_host_delay(self):
+        """Aplica el Crawl-delay de robots.txt si es más restrictivo que el configurado."""
+        if not self.respect_crawl_delay:
+            return
+        crawl_delay = self.robots_cache.crawl_delay(self.start_url)
+        if crawl_delay is not None and crawl_delay > self.rate_limiter.default_delay:
+            print(f"robots.txt declara Crawl-delay de {crawl_delay}s para {self.base_domain}.")
+            self.rate_limiter.set_delay(self.base_domain, crawl_delay)
+
+    def _fetch(self, url):
+        if self.tracer is not None:
+            with self.tracer.stage("rate_limit_wait"):
+                self.rate_limiter.wait(urlparse(url).netloc)
+        else:
+            self.rate_limiter.wait(urlparse(url).netloc)
+        fetch_result = self.page_fetcher(url)
+        if self.recrawl_state is not None:
+            previous = self.recrawl_state.reusable(url, fetch_result)
+            if previous is not None:
+                return fetch_result, previous, True
+        if self.parse_workers:
+            return fetch_result, None, False
+        # Sin pool de procesos el parseo se hace en el mismo hilo de descarga
+        return fetch_result, self.page_parser(url, fetch_result.content, fetch_result.encoding), False
+
+    def save_checkpoint(self, finished=False):
+        """Guarda el estado de la cola y los contadores en el checkpoint (si hay uno)."""
+        if self.checkpoint is None:
+            return
+        self.checkpoint.save(self.frontier, {
+            "start_url": self.start_url,
+            "scheduled_count": self.scheduled_count,
+            "analyzed_count": self.analyzed_count,
+            "finished": finished,
+        })
+
+    def _schedule_fetches(self, fetch_pool):
+        # Contrapresión: no se lanzan descargas nuevas si el parseo va por detrás
+        while (self.frontier and len(self._fetching) < self.concurrency and self.scheduled_count < self.max_pages
+               and len(self._parsing) < self.max_pending_parses):
+            current_url, depth = self.frontier.pop()
+            if not self.robots_cache.can_fetch(current_url):
+                print(f"robots.txt no permite rastrear {current_url}, se omite.")
+                self.disallowed_urls.append(current_url)
+                self._count("disallowed")
+                self.frontier.complete(current_url)
+                continue
+            self._fetching[fetch_pool.submit(self._fetch, current_url)] = (current_url, depth)
+            self.scheduled_count += 1
+
+    def _handle_fetched(self, future, parse_pool):
+        current_url, depth = self._fetching.pop(future)
+        try:
+            fetch_result, parsed, reused = future.result()
+        except requests.exceptions.RequestException as e:
+            print(f"Error al obtener la URL {current_url}: {e}")
+            self.failed_urls[current_url] = str(e)
+            self._count("fetch_errors")
+            self.frontier.complete(current_url)
+            return
+        except Exception as e:
+            print(f"Ocurrió un error inesperado al procesar {current_url}: {e}")
+            self.failed_urls[current_url] = str(e)
+            self._count("errors")
+            self.frontier.complete(current_url)
+            return
+        self._count("transfer_bytes", fetch_result.transfer_size or 0)
+        if reused:
+            analysis_results, found_links = parsed
+            print(f"Sin cambios desde el último rastreo, se reutiliza su análisis: {current_url}")
+            self.reused_urls.append(current_url)
+            self._count("pages_reused")
+            if self.tracer is not None:
+                self.tracer.record_page(fetch_timings_ms(fetch_result)) # Sin parseo ni análisis
+            self._finish_page(current_url, depth, analysis_results, found_links)
+        elif parse_pool is None:
+            self._handle_parsed(current_url, depth, fetch_result, parsed)
+        else:
+            parse_future = parse_pool.submit(self.page_parser, current_url, fetch_result.content, fetch_result.encoding)
+            self._parsing[parse_future] = (current_url, depth, fetch_result)
+
+    def _handle_parse_done(self, future):
+        current_url, depth, fetch_result = self._parsing.pop(future)
+        try:
+            parsed = future.result()
+        except Exception as e:
+            print(f"Ocurrió un error inesperado al procesar {current_url}: {e}")
+            self.failed_urls[current_url] = str(e)
+            self._count("errors")
+            self.frontier.complete(current_url)
+            return
+        self._handle_parsed(current_url, depth, fetch_result, parsed)
+
+    def _handle_parsed(self, url, depth, fetch_result, parsed):
+        page_metrics, found_links = parsed
+        analysis_results = self.result_builder(url, page_metrics, fetch_result)
+        if analysis_results:
+            print(f"Análisis completado para: {url}")
+            self._count("pages_analyzed")
+            if self.tracer is not None:
+                self.tracer.record_page(analysis_results.get("timings_ms"))
+            if self.recrawl_state is not None:
+                self.recrawl_state.update(url, fetch_result, analysis_results, found_links or [])
+        self._finish_page(url, depth, analysis_results, found_links)
+
+    def _finish_page(self, url, depth, analysis_results, found_links):
+        if analysis_results:
+            self.analyzed_count += 1
+            if self._keep_results:
+                self._results.append(analysis_results)
+            if self._on_result:
+                self._on_result(analysis_results)
+
+        if self._on_links and analysis_results:
+            self._on_links(url, [self.url_normalizer(link) for link in found_links or []])
+
+        canonical_url = self._canonical_target(url, analysis_results)
+        if canonical_url is not None:
+            print(f"{url} declara como canónica {canonical_url}; se rastrea esa en lugar de seguir sus enlaces.")
+            self.canonicalized_urls[url] = canonical_url
+            self.frontier.add(canonical_url, depth=depth)
+            found_links = []
+
+        for link in found_links or []:
+            link = self.url_normalizer(link)
+            if urlparse(link).netloc == self.base_domain:
+                self.frontier.add(link, depth=depth + 1)
+        self.frontier.complete(url)
+
+    def _count(self, name, amount=1):
+        if self.tracer is not None:
+            self.tracer.count(name, amount)
+
+    def _canonical_target(self, url, analysis_results):
+        """URL canónica (normalizada) que declara la página si es otra URL del mismo sitio."""
+        if not self.url_normalizer.respect_canonical or not analysis_results:
+            return None
+        canonical_href = analysis_results.get("canonical_url")
+        if not canonical_href:
+            return None
+        canonical_url = self.url_normalizer(urljoin(url, canonical_href))
+        if canonical_url == url or urlparse(canonical_url).netloc != self.base_domain:
+            return None
+        return canonical_url
+
+    def run(self, on_result=None, keep_results=True, on_links=None):
+        """
+        Ejecuta el rastreo completo (o lo que quede de él si se reanuda).
+
+        Args:
+            on_result (callable, optional): Se invoca con cada `analysis_results` en cuanto
+                su página termina de procesarse.
+            keep_results (bool): Si es False, los resultados no se acumulan en memoria y solo
+                llegan a `on_result` (p. ej. para escribirlos en streaming).
+            on_links (callable, optional): Se invoca con (url, enlaces internos normalizados)
+                de cada página analizada.
+        Returns:
+            list: Los resultados de análisis de las páginas rastreadas con éxito en esta ejecución
+                (vacía si `keep_results` es False). El total queda en `self.analyzed_count`.
+        """
+        self._configure_host_delay()
+
+        self._fetching = {}   # future -> (url, depth)
+        self._parsing = {}    # future -> (url, depth, fetch_result)
+        self._results = []
+        self._on_result = on_result
+        self._on_links = on_links
+        self._keep_results = keep_results
+        initial_scheduled = self.scheduled_count
+        started_at = last_checkpoint_at = time.monotonic()
+        finished = False
+
+        own_parse_pool = self.parse_pool is None and self.parse_workers > 0
+        parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers) if own_parse_pool else self.parse_pool
+        try:
+            fetch_thread_initializer = self.tracer.thread_started if self.tracer is not None else None
+            with ThreadPoolExecutor(max_workers=self.concurrency, initializer=fetch_thread_initializer) as fetch_pool:
+                while True:
+                    self._schedule_fetches(fetch_pool)
+                    if not self._fetching and not self._parsing:
+                        break
+
+                    done, _ = wait(list(self._fetching) + list(self._parsing), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future in self._fetching:
+                            self._handle_fetched(future, parse_pool)
+                        else:
+                            self._handle_parse_done(future)
+
+                    if self.checkpoint is not None and time.monotonic() - last_checkpoint_at >= self.checkpoint_interval:
+                        self.save_checkpoint()
+                        last_checkpoint_at = time.monotonic()
+            finished = True
+        finally:
+            if own_parse_pool:
+                parse_pool.shutdown(cancel_futures=True)
+            else:
+                for future in self._parsing: # El pool compartido sigue en uso: solo se cancela lo de este rastreo
+                    future.cancel()
+            # También al interrumpir (Ctrl+C o error): lo que estaba en curso vuelve a la cola al reanudar
+            self.save_checkpoint(finished=finished)
+
+        elapsed = time.monotonic() - started_at
+        crawled_now = self.scheduled_count - initial_scheduled
+        if elapsed > 0:
+            print(f"\nRastreadas {crawled_now} páginas en {elapsed:.1f}s "
+                  f"({crawled_now / elapsed:.2f} páginas/s, concurrencia {self.concurrency}, "
+                  f"procesos de parseo {self.parse_workers}).")
+        if self.recrawl_state is not None:
+            print(f"Páginas sin cambios reutilizadas del rastreo anterior: {len(self.reused_urls)}; "
+                  f"descargadas y analizadas de nuevo: {crawled_now - len(self.reused_urls)}.")
+        return self._results
@@ -1,25 +1,50 @@
 import requests
 from bs4 import BeautifulSoup
 import os
-import re
 from urllib.parse import urlparse, urljoin
 import json
+import argparse # Argumentos de línea de comandos (URL y opciones del rastreo)
+import functools
 import time
-import sys # Importar sys para acceder a los argumentos de línea de comandos
 
-# Directorio donde se guardarán los resultados
-RESULTS_DIR = "resultados"
+from extractor import extract_page_content, new_page_metrics, clean_internal_link, resolve_link
+from crawl_engine import CrawlEngine, DEFAULT_CONCURRENCY, DEFAULT_HOST_DELAY, DEFAULT_PARSE_WORKERS, DEFAULT_CHECKPOINT_INTERVAL
+from fetcher import Fetcher, get_default_fetcher, decode_body, DEFAULT_MAX_BYTES
+from frontier import Frontier, FrontierCheckpoint, FRONTIER_ORDERS, DEFAULT_FRONTIER_ORDER
+from page_archive import PageArchive, hash_content
+from recrawl_state import RecrawlState
+from results_io import (NDJSONResultsWriter, convert_ndjson_to_json, iter_analysis_results, rewrite_ndjson,
+                        NDJSON_FILE_NAME, JSON_FILE_NAME)
+from robots_cache import RobotsCache, DEFAULT_ROBOTS_TTL, get_default_robots_cache
+from url_normalizer import URLNormalizer, IdentityNormalizer
+from audit_history import AuditHistory, AUDIT_HISTORY_FILE_NAME
+from issue_aggregator import aggregate_issues
+from tracing import Tracer, PROFILERS, fetch_timings_ms, page_performance
+from sitemap import (SitemapReader, discover_sitemaps, lastmod_priority, build_sitemap_report, save_sitemap_report,
+                     print_sitemap_report, DEFAULT_SITEMAP_MAX_URLS)
+from near_duplicates import content_fingerprint, find_duplicate_clusters, attach_duplicate_cluster, summarize_clusters
+from link_graph import LinkGraph, attach_link_metrics, print_link_summary
+from link_checker import (LinkChecker, LinkStatusCache, check_crawl_links, attach_link_status, LINK_STATUS_CACHE_FILE,
+                          DEFAULT_LINK_CHECK_CONCURRENCY, DEFAULT_LINK_CHECK_PER_HOST, DEFAULT_LINK_CHECK_TTL)
 
-def create_results_directory():
+# Directorio donde se guardarán los resultados
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados") # Junto al script, sea cual sea el directorio de trabajo
+ROBOTS_CACHE_FILE = "robots_cache.json" # robots.txt compartido por todas las páginas de cada origen
+ARCHIVE_DIR_NAME = "archive"            # HTML original de cada página, comprimido y direccionado por contenido
+FRONTIER_CHECKPOINT_FILE = "frontier.sqlite" # Cola de rastreo pendiente, para reanudar con --resume
+RECRAWL_STATE_FILE = "recrawl_state.sqlite"  # Validadores, hash y análisis de cada URL del rastreo anterior
+RECRAWL_SUMMARY_FILE = "recrawl_summary.json" # URLs reutilizadas sin cambios en el último rastreo
+
+def create_results_directory(results_dir=RESULTS_DIR):
     """Crea el directorio de resultados si no existe."""
-    if not os.path.exists(RESULTS_DIR):
-        os.makedirs(RESULTS_DIR)
-        print(f"Directorio '{RESULTS_DIR}' creado.")
+    if not os.path.exists(results_dir):
+        os.makedirs(results_dir)
+        print(f"Directorio '{results_dir}' creado.")
 
 def get_html_and_parse(url, base_domain, processed_urls, max_pages_to_crawl):
     """
     Dada una URL, obtiene el código HTML y lo parsea usando BeautifulSoup.
-    Guarda el HTML original y el HTML parseado/prettificado en la carpeta 'resultados'.
+    Guarda el HTML original en el archivo de páginas de 'resultados' (ver page_archive.py).
 
     Args:
         url (str): La URL de la página web a rastrear.
@@ -38,65 +63,113 @@ def get_html_and_parse(url, base_domain, processed_urls, max_pages_to_crawl):
 
     processed_urls.add(url) # Añadir la URL al conjunto de procesadas
 
-    try:
-        print(f"\nIntentando obtener contenido de: {url}")
-        response = requests.get(url, timeout=10) # Añadir timeout para evitar esperas infinitas
-        response.raise_for_status()
-
-        html_content = response.text
-        print("Contenido HTML obtenido exitosamente.")
+    soup, found_internal_links, _ = download_and_parse(url, base_domain)
+    return soup, found_internal_links
 
-        # Limpiar el nombre de archivo de caracteres no válidos para usarlo en el nombre del archivo
-        # Asegurarse de que el nombre del archivo sea único y descriptivo
-        parsed_url_for_filename = re.sub(r'[^a-zA-Z0-9_.-]', '_', urlparse(url).netloc + urlparse(url).path).strip('_')
-        filename_prefix = parsed_url_for_filename[:60] if len(parsed_url_for_filename) > 60 else parsed_url_for_filename
-        
-        # Construir rutas completas para los archivos dentro de la carpeta 'resultados'
-        original_html_filename = os.path.join(RESULTS_DIR, f"{filename_prefix}_original.html")
-        prettified_html_filename = os.path.join(RESULTS_DIR, f"{filename_prefix}_parsed_prettified.html")
-
-        # 1. Guardar el HTML original
-        with open(original_html_filename, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        print(f"HTML original guardado en: {original_html_filename}")
-
-        # 2. Parsear el HTML con BeautifulSoup
-        soup = BeautifulSoup(html_content, 'html.parser')
-        print("HTML parseado con BeautifulSoup.")
+def download_and_parse(url, base_domain, fetcher=None, archive=None):
+    """
+    Descarga y parsea una URL sin comprobar duplicados ni límites de rastreo.
+    Es la parte de `get_html_and_parse` que puede ejecutarse en paralelo desde el motor concurrente.
 
-        # 3. Guardar el HTML parseado (prettificado)
-        with open(prettified_html_filename, 'w', encoding='utf-8') as f:
-            f.write(soup.prettify())
-        print(f"HTML parseado y prettificado guardado en: {prettified_html_filename}")
+    Args:
+        url (str): La URL de la página web a rastrear.
+        base_domain (str): El dominio base para filtrar enlaces internos.
+        fetcher (Fetcher, optional): Capa de descarga con sesión compartida. Si no se indica,
+            se usa la sesión por defecto del módulo `fetcher`.
+        archive (PageArchive, optional): Archivo donde se guarda el HTML original.
+    Returns:
+        tuple: (BeautifulSoup object, list of found internal links, FetchResult)
+            o (None, [], None) si hay un error.
+    """
+    try:
+        fetch_result = fetch_page(url, fetcher)
+        (archive or get_default_archive()).store_page(url, fetch_result.content, fetch_result.encoding)
 
-        found_internal_links = []
-        for a_tag in soup.find_all('a', href=True):
-            href = a_tag.get('href')
-            full_url = urljoin(url, href)
-            parsed_full_url = urlparse(full_url)
-            
-            # Filtra enlaces internos y URLs que no sean de archivo
-            if parsed_full_url.netloc == base_domain and not parsed_full_url.path.lower().endswith(('.pdf', '.zip', '.rar', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.jpg', '.jpeg', '.png', '.gif', '.svg')):
-                # Construye una URL limpia sin fragmentos
-                clean_url = urljoin(full_url, parsed_full_url.path)
-                if parsed_full_url.query:
-                    clean_url += "?" + parsed_full_url.query
-                
-                found_internal_links.append(clean_url)
+        # Parsear el HTML con BeautifulSoup
+        soup = BeautifulSoup(fetch_result.text, 'html.parser')
+        print("HTML parseado con BeautifulSoup.")
 
+        found_internal_links = extract_internal_links_from_soup(url, soup, base_domain)
         print("Enlaces internos encontrados para rastreo posterior.")
-        return soup, found_internal_links
+        return soup, found_internal_links, fetch_result
 
     except requests.exceptions.RequestException as e:
         print(f"Error al obtener la URL {url}: {e}")
     except Exception as e:
         print(f"Ocurrió un error inesperado al procesar {url}: {e}")
-    return None, []
+    return None, [], None
+
+def get_default_archive(results_dir=RESULTS_DIR):
+    """Archivo de páginas dentro de 'resultados'."""
+    return PageArchive(os.path.join(results_dir, ARCHIVE_DIR_NAME))
+
+def fetch_page(url, fetcher=None, recrawl_state=None):
+    """
+    Descarga una URL con una única petición.
+    Con un `recrawl_state`, la petición es condicional (If-None-Match / If-Modified-Since)
+    y puede devolver un 304 sin cuerpo si la página no ha cambiado.
+
+    Returns:
+        FetchResult: La descarga completa (bytes del cuerpo, estado, cabeceras, tiempos).
+    Raises:
+        requests.exceptions.RequestException: Si la descarga falla o el estado HTTP es de error.
+    """
+    fetcher = fetcher or get_default_fetcher()
+    print(f"\nIntentando obtener contenido de: {url}")
+    headers = recrawl_state.conditional_headers(url) if recrawl_state is not None else None
+    fetch_result = fetcher.fetch(url, headers=headers) # Una única descarga por página, con conexión keep-alive
+    fetch_result.raise_for_status()
+    if fetch_result.status_code == 304:
+        print("Contenido sin cambios (304 Not Modified).")
+    else:
+        print("Contenido HTML obtenido exitosamente.")
+    return fetch_result
+
+def extract_internal_links_from_soup(url, soup, base_domain):
+    """Devuelve los enlaces internos rastreables (sin fragmentos) de un árbol de BeautifulSoup."""
+    found_internal_links = []
+    for a_tag in soup.find_all('a', href=True):
+        clean_url = clean_internal_link(url, a_tag.get('href'), base_domain)
+        if clean_url is not None:
+            found_internal_links.append(clean_url)
+    return found_internal_links
+
+def parse_page(url, content, encoding=None, base_domain=None, archive=None):
+    """
+    Etapa de CPU del rastreo: archiva el cuerpo, lo decodifica y extrae métricas y enlaces.
+
+    Solo recibe bytes y texto, y devuelve estructuras simples, de modo que puede ejecutarse
+    en un proceso del pool de parseo sin compartir estado con los hilos de descarga.
 
-def analyze_html_content(url, parsed_soup_object):
+    Las métricas incluyen "timings_ms" con lo que han tardado el archivado y el parseo, y la
+    huella SimHash del texto principal ("content_fingerprint") con su número de palabras.
+
+    Returns:
+        tuple: (dict con las métricas HTML, list of found internal links)
+    """
+    archive = archive or get_default_archive()
+    started_at = time.perf_counter()
+    html_sha256 = archive.store_page(url, content, encoding)
+    archived_at = time.perf_counter()
+    page_metrics, found_internal_links, main_text = extract_page_content(decode_body(content, encoding), url, base_domain)
+    page_metrics["content_fingerprint"], page_metrics["word_count"] = content_fingerprint(main_text)
+    page_metrics["html_sha256"] = html_sha256
+    page_metrics["html_saved_original"] = archive.object_path(html_sha256)
+    page_metrics["timings_ms"] = {"archive": round((archived_at - started_at) * 1000, 3),
+                                  "parse": round((time.perf_counter() - archived_at) * 1000, 3)}
+    return page_metrics, found_internal_links
+
+def analyze_html_content(url, parsed_soup_object, fetch_result=None, fetcher=None, robots_cache=None, archive=None):
     """
     Realiza el análisis SEO y técnico del contenido HTML.
     Retorna un diccionario con los resultados del análisis.
+
+    Si se pasa el `fetch_result` de la descarga de la página, el estado HTTP, la URL final
+    y la cadena de redirecciones se toman de él en lugar de volver a pedir la URL.
+    El robots.txt se obtiene de `robots_cache` (una descarga por origen) y el registro solo
+    guarda su origen en `robots_txt_ref`; el contenido queda en la caché compartida.
+    La ruta del HTML archivado se toma del `archive` del rastreo (el mismo que se pasó a
+    `download_and_parse`); sin él, del archivo de páginas de 'resultados'.
     """
     if not parsed_soup_object:
         print("\nNo se pudo parsear el contenido HTML. No se realizará el análisis detallado.")
@@ -104,49 +177,64 @@ def analyze_html_content(url, parsed_soup_object):
 
     print("\n--- ¡Iniciando análisis detallado del HTML! ---")
 
-    analysis_results = {
+    analysis_results = new_analysis_results(url)
+    _apply_fetch_info(analysis_results, url, fetch_result, fetcher)
+    analysis_results.update(extract_soup_metrics(url, parsed_soup_object))
+    _apply_site_info(analysis_results, url, robots_cache)
+    if fetch_result is not None:
+        html_sha256 = hash_content(fetch_result.content)
+        analysis_results["html_sha256"] = html_sha256
+        analysis_results["html_saved_original"] = (archive or get_default_archive()).object_path(html_sha256)
+    return analysis_results
+
+def new_analysis_results(url):
+    """Plantilla del diccionario de resultados de una página."""
+    return {
         "url": url,
         "http_status": None,
         "final_url_after_redirects": None,
-        "title": None,
-        "meta_description": None,
-        "meta_robots": None,
-        "viewport": None,
-        "canonical_url": None,
-        "hreflang_tags": [],
-        "h1_tags": [],
-        "h2_tags": [],
-        "h3_h6_tags": [],
-        "internal_links_count": 0,
-        "external_links_count": 0,
-        "image_count": 0,
-        "images_without_alt": 0,
-        "lazy_loaded_images_count": 0,
-        "javascript_usage_indicators": {
-            "inline_scripts": 0,
-            "external_scripts": 0,
-            "noscript_tag_present": False
-        },
-        "structured_data_scripts": [],
-        "wai_aria_attributes_found": 0,
-        "mobile_friendly_meta_tags": False,
+        "redirect_chain": [],
+        "performance": None,    # TTFB, tamaño transferido, compresión y saltos de la descarga
+        **new_page_metrics(),
         "sitemap_links": [],
         "robots_txt_status": None,
-        "robots_txt_content": None,
-        # Estos se actualizarán a las rutas completas en el main
+        "robots_txt_ref": None,
+        # Copia archivada del HTML original; el prettificado se genera bajo demanda con page_archive.py
+        "html_sha256": None,
         "html_saved_original": "",
-        "html_saved_prettified": ""
+        "link_metrics": None,   # Profundidad de clics, enlaces entrantes y PageRank interno (al terminar el rastreo)
+        "broken_links": None,   # Enlaces que no responden o dan error (con --check-links; None si no se comprueban)
+        "redirecting_links": None,
+        "word_count": None,             # Palabras del texto principal
+        "content_fingerprint": None,    # Huella SimHash del texto principal (hexadecimal)
+        "duplicate_cluster": None,      # Grupo de páginas casi duplicadas (al terminar el rastreo)
+        "timings_ms": {}        # Tiempo de cada etapa del rastreo de la página
     }
 
-    try:
-        response_info = requests.get(url, allow_redirects=True, timeout=10)
-        analysis_results["http_status"] = response_info.status_code
-        analysis_results["final_url_after_redirects"] = response_info.url
-        print(f"Estado HTTP y URL final obtenidos: {response_info.status_code}, {response_info.url}")
-    except requests.exceptions.RequestException as e:
-        print(f"Error al obtener información HTTP para {url}: {e}")
-        analysis_results["http_status"] = "Error de red"
-        analysis_results["final_url_after_redirects"] = url
+def _apply_fetch_info(analysis_results, url, fetch_result=None, fetcher=None):
+    """Rellena el estado HTTP, la URL final y las redirecciones a partir de la descarga de la página."""
+    fetcher = fetcher or get_default_fetcher()
+    if fetch_result is None:
+        # Compatibilidad: sin la descarga original hay que pedir la URL para conocer estado y URL final
+        try:
+            fetch_result = fetcher.fetch(url)
+        except requests.exceptions.RequestException as e:
+            print(f"Error al obtener información HTTP para {url}: {e}")
+            analysis_results["http_status"] = "Error de red"
+            analysis_results["final_url_after_redirects"] = url
+    if fetch_result is not None:
+        analysis_results["http_status"] = fetch_result.status_code
+        analysis_results["final_url_after_redirects"] = fetch_result.final_url
+        analysis_results["redirect_chain"] = fetch_result.redirect_chain
+        analysis_results["performance"] = page_performance(fetch_result)
+        print(f"Estado HTTP y URL final obtenidos: {fetch_result.status_code}, {fetch_result.final_url}")
+
+def extract_soup_metrics(url, parsed_soup_object):
+    """
+    Obtiene las métricas HTML recorriendo un árbol de BeautifulSoup.
+    Es el camino clásico; `extractor.extract_page` calcula lo mismo en una sola pasada sin construir el árbol.
+    """
+    analysis_results = new_page_metrics()
 
     title_tag = parsed_soup_object.find('title')
     if title_tag:
@@ -187,6 +275,9 @@ def analyze_html_content(url, parsed_soup_object):
     for a_tag in parsed_soup_object.find_all('a', href=True):
         href = a_tag.get('href')
         if href:
+            outgoing_url = resolve_link(url, href)
+            if outgoing_url is not None and outgoing_url not in analysis_results["outgoing_links"]:
+                analysis_results["outgoing_links"].append(outgoing_url)
             full_url = urljoin(url, href)
             parsed_href_domain = urlparse(full_url).netloc
             if parsed_href_domain == base_domain_current_page:
@@ -222,84 +313,413 @@ def analyze_html_content(url, parsed_soup_object):
                 analysis_results["wai_aria_attributes_found"] += 1
                 break
 
-    parsed_url_obj = urlparse(url)
-    base_url_for_robots = f"{parsed_url_obj.scheme}://{parsed_url_obj.netloc}"
-    robots_txt_url = urljoin(base_url_for_robots, '/robots.txt')
-    
-    try:
-        robots_response = requests.get(robots_txt_url, timeout=5)
-        analysis_results["robots_txt_status"] = robots_response.status_code
-        if robots_response.status_code == 200:
-            analysis_results["robots_txt_content"] = robots_response.text
-            for line in robots_response.text.splitlines():
-                if line.lower().startswith('sitemap:'):
-                    sitemap_link = line[len('sitemap:'):].strip()
-                    analysis_results["sitemap_links"].append(sitemap_link)
-        else:
-            print(f"robots.txt no encontrado o error: {robots_response.status_code}")
-    except requests.exceptions.RequestException as e:
-        analysis_results["robots_txt_status"] = f"Error: {e}"
-        print(f"Error al obtener robots.txt: {e}")
-    
+    return analysis_results
+
+def _apply_site_info(analysis_results, url, robots_cache=None):
+    """Rellena robots.txt y sitemaps."""
+    # robots.txt se descarga una vez por origen; la página solo guarda una referencia a la entrada compartida
+    robots_entry = (robots_cache or get_default_robots_cache()).get(url)
+    base_url_for_robots = robots_entry.origin
+    analysis_results["robots_txt_status"] = robots_entry.status
+    analysis_results["robots_txt_ref"] = robots_entry.origin
+    analysis_results["sitemap_links"].extend(robots_entry.sitemaps)
+
     default_sitemap_xml = urljoin(base_url_for_robots, '/sitemap.xml')
     if default_sitemap_xml not in analysis_results["sitemap_links"]:
         analysis_results["sitemap_links"].append(default_sitemap_xml + " (Default check)")
 
-    # Actualizar las rutas de los archivos guardados en el diccionario de resultados
-    filename_prefix = re.sub(r'[^a-zA-Z0-9_.-]', '_', urlparse(url).netloc + urlparse(url).path).strip('_')
-    filename_prefix = filename_prefix[:60] if len(filename_prefix) > 60 else filename_prefix
-    analysis_results["html_saved_original"] = os.path.join(RESULTS_DIR, f"{filename_prefix}_original.html")
-    analysis_results["html_saved_prettified"] = os.path.join(RESULTS_DIR, f"{filename_prefix}_parsed_prettified.html")
-
+def analyze_page(url, page_metrics, fetch_result=None, fetcher=None, robots_cache=None):
+    """
+    Compone los resultados del análisis a partir de las métricas de `extractor.extract_page`.
+    Produce el mismo diccionario que `analyze_html_content` sin recorrer un árbol de BeautifulSoup.
+    Añade a "timings_ms" los tiempos de red de la descarga y el del propio análisis.
+    """
+    print("\n--- ¡Iniciando análisis detallado del HTML! ---")
+    started_at = time.perf_counter()
+    analysis_results = new_analysis_results(url)
+    _apply_fetch_info(analysis_results, url, fetch_result, fetcher)
+    analysis_results.update(page_metrics)
+    _apply_site_info(analysis_results, url, robots_cache)
+    timings_ms = fetch_timings_ms(fetch_result) if fetch_result is not None else {}
+    timings_ms.update(page_metrics.get("timings_ms") or {})
+    timings_ms["analysis"] = round((time.perf_counter() - started_at) * 1000, 3)
+    analysis_results["timings_ms"] = timings_ms
     return analysis_results
 
+def process_page(url, base_domain, fetcher=None, robots_cache=None, archive=None):
+    """
+    Rastrea y analiza una única página con una sola descarga.
+    Las métricas y los enlaces salen de un único recorrido del HTML (`extractor.extract_page`).
 
-if __name__ == "__main__":
-    create_results_directory() # Asegurarse de que la carpeta 'resultados' exista
-
-    # --- CAMBIO CLAVE: Obtener la URL de los argumentos de línea de comandos ---
-    if len(sys.argv) > 1:
-        target_url = sys.argv[1] # El primer argumento después del nombre del script es la URL
-    else:
-        print("Error: No se proporcionó ninguna URL. Uso: python crawler.py <URL>")
-        sys.exit(1) # Salir con error si no hay URL
-
-    MAX_PAGES = 20 # Límite de páginas a rastrear
-
-    parsed_target_url = urlparse(target_url)
-    base_domain = parsed_target_url.netloc
-
-    urls_to_crawl = [target_url] # Cola de URLs a rastrear, empieza con la principal
-    processed_urls = set()       # Conjunto de URLs ya procesadas
-    all_analysis_results = []    # Lista para almacenar todos los resultados
+    Returns:
+        tuple: (analysis_results o None, list of found internal links)
+    """
+    try:
+        fetch_result = fetch_page(url, fetcher)
+        page_metrics, found_links = parse_page(url, fetch_result.content, fetch_result.encoding, base_domain, archive)
+    except requests.exceptions.RequestException as e:
+        print(f"Error al obtener la URL {url}: {e}")
+        return None, []
+    except Exception as e:
+        print(f"Ocurrió un error inesperado al procesar {url}: {e}")
+        return None, []
+    return analyze_page(url, page_metrics, fetch_result, fetcher, robots_cache), found_links
+
+def parse_arguments(argv=None):
+    """Lee los argumentos de línea de comandos del crawler."""
+    parser = argparse.ArgumentParser(description="Rastrea un sitio web y guarda el análisis SEO técnico de cada página.")
+    parser.add_argument("url", help="URL principal a rastrear")
+    parser.add_argument("--max-pages", type=int, default=20, help="Número máximo de páginas a rastrear")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Peticiones simultáneas en vuelo")
+    parser.add_argument("--delay", type=float, default=DEFAULT_HOST_DELAY,
+                        help="Segundos mínimos entre peticiones al mismo host (robots.txt puede aumentarlo con Crawl-delay)")
+    parser.add_argument("--parse-workers", type=int, default=DEFAULT_PARSE_WORKERS,
+                        help="Procesos que parsean y analizan el HTML en paralelo (0 = en los hilos de descarga)")
+    parser.add_argument("--max-page-bytes", type=int, default=DEFAULT_MAX_BYTES,
+                        help="Bytes máximos (descomprimidos) que se leen de cada página; el resto no se descarga")
+    parser.add_argument("--robots-ttl", type=int, default=DEFAULT_ROBOTS_TTL,
+                        help="Segundos durante los que se reutiliza el robots.txt guardado de rastreos anteriores")
+    parser.add_argument("--order", choices=FRONTIER_ORDERS, default=None,
+                        help="Orden de rastreo: por niveles (bfs), en profundidad (dfs) o por prioridad "
+                             f"(por defecto, {DEFAULT_FRONTIER_ORDER}; con sitemaps, priority)")
+    parser.add_argument("--max-depth", type=int, default=None, help="Profundidad máxima de enlaces desde la URL inicial")
+    parser.add_argument("--resume", action="store_true",
+                        help="Reanuda el último rastreo interrumpido de esta URL desde su checkpoint")
+    parser.add_argument("--checkpoint-interval", type=float, default=DEFAULT_CHECKPOINT_INTERVAL,
+                        help="Segundos entre checkpoints de la cola de rastreo")
+    parser.add_argument("--no-normalize", action="store_true",
+                        help="No normaliza las URLs (mayúsculas del host, puertos, barra final, parámetros de seguimiento...)")
+    parser.add_argument("--strip-trailing-slash", action="store_true",
+                        help="Trata '/ruta/' y '/ruta' como la misma página (solo si el sitio sirve ambas sin redirigir)")
+    parser.add_argument("--drop-param", action="append", default=[], metavar="NOMBRE",
+                        help="Parámetro de la query string que no cambia la página (p. ej. sort); se puede repetir")
+    parser.add_argument("--ignore-canonical", action="store_true",
+                        help="Sigue los enlaces de las páginas aunque declaren otra URL como canónica")
+    parser.add_argument("--exact-seen-set", action="store_true",
+                        help="Guarda las URLs vistas completas en memoria en lugar de huellas de 64 bits")
+    parser.add_argument("--full-recrawl", action="store_true",
+                        help="Descarga y analiza todas las páginas aunque no hayan cambiado desde el rastreo anterior")
+    parser.add_argument("--profile", choices=PROFILERS, default=None,
+                        help="Perfila el rastreo con cProfile (hilo principal y de descarga) o pyinstrument")
+    parser.add_argument("--sitemaps", action="store_true",
+                        help="Siembra la cola con las URLs de los sitemaps de robots.txt (o /sitemap.xml), "
+                             "las modificadas más recientemente primero, e informa de su cobertura")
+    parser.add_argument("--sitemap", action="append", default=[], metavar="URL",
+                        help="Sitemap (o sitemap índice, también .xml.gz) con el que sembrar la cola; se puede repetir")
+    parser.add_argument("--sitemap-max-urls", type=int, default=DEFAULT_SITEMAP_MAX_URLS,
+                        help="URLs como máximo que se leen de los sitemaps")
+    parser.add_argument("--check-links", action="store_true",
+                        help="Comprueba al final todos los enlaces distintos (internos y externos) y marca los rotos y con redirección")
+    parser.add_argument("--link-check-concurrency", type=int, default=DEFAULT_LINK_CHECK_CONCURRENCY,
+                        help="Comprobaciones de enlaces simultáneas")
+    parser.add_argument("--link-check-per-host", type=int, default=DEFAULT_LINK_CHECK_PER_HOST,
+                        help="Comprobaciones de enlaces simultáneas como mucho contra un mismo host")
+    parser.add_argument("--link-check-ttl", type=int, default=DEFAULT_LINK_CHECK_TTL,
+                        help="Segundos durante los que se reutiliza el estado de un enlace comprobado en rastreos anteriores")
+    parser.add_argument("--no-history", action="store_true",
+                        help="No guarda este rastreo en el histórico de auditorías")
+    parser.add_argument("--history-db", default=None, metavar="ARCHIVO",
+                        help=f"Archivo SQLite del histórico de auditorías (por defecto, '{AUDIT_HISTORY_FILE_NAME}' en los resultados)")
+    return parser.parse_args(argv)
+
+
+def build_url_normalizer(args):
+    """Normalizador de URLs configurado con las opciones de línea de comandos."""
+    if args.no_normalize:
+        return IdentityNormalizer(respect_canonical=not args.ignore_canonical)
+    return URLNormalizer(strip_trailing_slash=args.strip_trailing_slash, drop_params=args.drop_param,
+                         respect_canonical=not args.ignore_canonical)
+
+
+def seed_from_sitemaps(frontier, sitemap_urls, url_normalizer, base_domain, session, max_urls):
+    """
+    Añade a la cola las URLs del sitio que aparecen en los sitemaps, leídos en streaming.
 
-    while urls_to_crawl and len(processed_urls) < MAX_PAGES:
-        current_url = urls_to_crawl.pop(0) # Obtener la siguiente URL de la cola
+    Cada URL entra a profundidad 1 con una prioridad según su <lastmod> (ver
+    `sitemap.lastmod_priority`); las que ya se habían visto (p. ej. al reanudar) se ignoran.
 
-        soup, found_links = get_html_and_parse(current_url, base_domain, processed_urls, MAX_PAGES)
-        
-        if soup:
-            analysis_results = analyze_html_content(current_url, soup)
-            if analysis_results:
-                all_analysis_results.append(analysis_results)
-                print(f"Análisis completado para: {current_url}")
+    Returns:
+        set: Las URLs (normalizadas) del sitio que aparecen en los sitemaps.
+    """
+    reader = SitemapReader(session=session, max_urls=max_urls)
+    listed_urls = set()
+    queued = 0
+    now = time.time()
+    for loc, lastmod in reader.iter_urls(sitemap_urls):
+        url = url_normalizer(loc)
+        if urlparse(url).netloc != base_domain:
+            continue
+        listed_urls.add(url)
+        queued += frontier.add(url, depth=1, priority=lastmod_priority(lastmod, now))
+    print(f"Sitemaps: {len(listed_urls)} URLs del sitio en {len(reader.sitemaps_read)} sitemaps, "
+          f"{queued} añadidas a la cola ({len(reader.errors)} sitemaps con errores).")
+    return listed_urls
+
+
+def load_resume_state(checkpoint, start_url, ndjson_filename):
+    """
+    Prepara la reanudación de un rastreo a partir de su checkpoint.
 
-            # Añadir nuevos enlaces encontrados a la cola si no han sido procesados y son del mismo dominio
-            for link in found_links:
-                if link not in processed_urls and urlparse(link).netloc == base_domain:
-                    if len(processed_urls) < MAX_PAGES: # Comprobar el límite antes de añadir
-                        urls_to_crawl.append(link)
-                    else:
-                        break # Salir si se alcanzó el límite
+    Las URLs que ya están en el NDJSON se quitan de la cola: llegaron a guardarse aunque el
+    checkpoint sea anterior a ellas.
 
-        time.sleep(1) # Pequeño retraso para no sobrecargar el servidor (ajustar si es necesario)
+    Returns:
+        tuple: (Frontier, dict de estado) o (None, None) si no hay nada que reanudar.
+    """
+    frontier, state = checkpoint.load()
+    if frontier is None or state.get("start_url") != start_url:
+        print("No hay un rastreo interrumpido de esta URL; se empieza desde cero.")
+        return None, None
+    if state.get("finished"):
+        print("El último rastreo de esta URL ya terminó; se empieza desde cero.")
+        return None, None
+
+    done_urls = set()
+    if os.path.exists(ndjson_filename):
+        done_urls = {analysis_results.get("url") for analysis_results in iter_analysis_results(ndjson_filename)}
+    frontier.discard(done_urls)
+    for url in done_urls:
+        frontier.mark_seen(url)
+    # Las URLs que estaban en curso vuelven a la cola, así que solo cuentan las páginas guardadas
+    state["analyzed_count"] = state["scheduled_count"] = len(done_urls)
+    print(f"Reanudando rastreo: {len(done_urls)} páginas ya analizadas, {len(frontier)} URLs pendientes.")
+    return frontier, state
+
+
+def crawl_site(url, results_dir=RESULTS_DIR, on_result=None, fetcher=None, parse_pool=None, **options):
+    """
+    Rastrea un sitio y guarda sus resultados, igual que `python crawler.py <URL> [opciones]`.
 
-    # Guardar todos los resultados de todas las páginas en un único archivo JSON
-    output_filename = os.path.join(RESULTS_DIR, "all_analysis_results.json")
+    Args:
+        url (str): URL principal a rastrear.
+        results_dir (str): Directorio donde se guardan los resultados, el archivo de páginas,
+            la caché de robots.txt y el estado para reanudar o rastrear de forma incremental.
+        on_result (callable, optional): Se invoca con cada `analysis_results` en cuanto su
+            página termina de procesarse.
+        fetcher (Fetcher, optional): Capa de descarga ya creada (p. ej. la que comparte el servicio
+            de auditorías entre rastreos, con sus conexiones abiertas). No se cierra al terminar y,
+            con ella, --concurrency no cambia el pool de conexiones ni se aplica --max-page-bytes.
+        parse_pool (concurrent.futures.ProcessPoolExecutor, optional): Pool de procesos de parseo
+            ya creado; no se cierra al terminar (ver `crawl_engine.CrawlEngine`).
+        **options: Opciones de la línea de comandos con su nombre en Python
+            (max_pages=50, concurrency=8, resume=True...). Las no indicadas toman su valor por defecto.
+    Returns:
+        dict: Resumen del rastreo: "url", "analyzed_count", "reused_urls", "disallowed_urls",
+            "robots_entries" (robots.txt de cada origen), "ndjson_path", "json_path", "history_run_id"
+            (rastreo en el histórico de auditorías, o None), "trace" (tiempos por etapa, ver
+            `tracing.Tracer.summary`), "sitemap_report" (cobertura del sitemap con --sitemaps,
+            ver `sitemap.build_sitemap_report`, o None), "link_metrics" (`link_graph.LinkGraphMetrics`
+            de todas las URLs), "link_summary" (ver `LinkGraphMetrics.summary`), "link_statuses"
+            (URL normalizada -> estado de cada enlace con --check-links, o None), "url_normalizer"
+            (el `URLNormalizer` del rastreo, para buscar los enlaces en "link_statuses"), "duplicate_clusters" (URL ->
+            grupo de casi duplicados, ver `near_duplicates.DuplicateIndex.clusters`) e "interrupted".
+    Raises:
+        TypeError: Si se pasa una opción que no existe.
+    """
+    args = parse_arguments([url])
+    for name, value in options.items():
+        if not hasattr(args, name):
+            raise TypeError(f"Opción de rastreo desconocida: '{name}'")
+        setattr(args, name, value)
+
+    create_results_directory(results_dir) # Asegurarse de que la carpeta 'resultados' exista
+
+    use_sitemaps = args.sitemaps or bool(args.sitemap)
+    if args.order is None:
+        # Con sitemaps, la cola por prioridad rastrea primero las páginas modificadas más recientemente
+        args.order = "priority" if use_sitemaps else DEFAULT_FRONTIER_ORDER
+
+    url_normalizer = build_url_normalizer(args)
+    target_url = url_normalizer(args.url)
+    MAX_PAGES = args.max_pages # Límite de páginas a rastrear
+
+    base_domain = urlparse(target_url).netloc
+    own_fetcher = fetcher is None
+    if own_fetcher:
+        fetcher = Fetcher(pool_size=args.concurrency, max_bytes=args.max_page_bytes) # Sesión keep-alive compartida por todos los hilos
+    robots_cache = RobotsCache(os.path.join(results_dir, ROBOTS_CACHE_FILE), ttl=args.robots_ttl, session=fetcher.session)
+    archive = get_default_archive(results_dir) # HTML comprimido y direccionado por contenido
+    ndjson_filename = os.path.join(results_dir, NDJSON_FILE_NAME)
+
+    # Rastreo incremental: las páginas sin cambios reutilizan el análisis del rastreo anterior
+    recrawl_state = None if args.full_recrawl else RecrawlState(os.path.join(results_dir, RECRAWL_STATE_FILE))
+
+    # Tiempos por etapa de cada página y, con --profile, perfil de CPU del rastreo
+    tracer = Tracer(profiler=args.profile)
+
+    checkpoint = FrontierCheckpoint(os.path.join(results_dir, FRONTIER_CHECKPOINT_FILE))
+    frontier, resume_state = None, None
+    if args.resume:
+        frontier, resume_state = load_resume_state(checkpoint, target_url, ndjson_filename)
+    if frontier is None:
+        checkpoint.clear()
+        frontier = Frontier(order=args.order, max_depth=args.max_depth, compact_seen=not args.exact_seen_set)
+        frontier.add(target_url, depth=0)
+
+    sitemap_urls = None
+    if use_sitemaps:
+        sitemap_urls = seed_from_sitemaps(frontier, args.sitemap or discover_sitemaps(robots_cache, target_url),
+                                          url_normalizer, base_domain, fetcher.session, args.sitemap_max_urls)
+
+    engine = CrawlEngine(
+        target_url,
+        page_fetcher=lambda page_url: fetch_page(page_url, fetcher, recrawl_state),
+        page_parser=functools.partial(parse_page, base_domain=base_domain, archive=archive), # Se envía a los procesos de parseo
+        result_builder=lambda page_url, page_metrics, fetch_result: analyze_page(page_url, page_metrics, fetch_result, fetcher, robots_cache),
+        max_pages=MAX_PAGES,
+        concurrency=args.concurrency,
+        delay=args.delay,
+        robots_cache=robots_cache,
+        parse_workers=args.parse_workers,
+        frontier=frontier,
+        checkpoint=checkpoint,
+        checkpoint_interval=args.checkpoint_interval,
+        resume_state=resume_state,
+        recrawl_state=recrawl_state,
+        url_normalizer=url_normalizer,
+        tracer=tracer,
+        parse_pool=parse_pool,
+    )
+
+    # Histórico de auditorías: cada rastreo queda guardado por sitio y fecha para compararlos
+    history, history_run_id = None, None
+    if not args.no_history:
+        history = AuditHistory(args.history_db or os.path.join(results_dir, AUDIT_HISTORY_FILE_NAME))
+        if resume_state is not None:
+            history_run_id = history.resumable_run(target_url)
+        if history_run_id is None:
+            history_run_id = history.start_run(target_url)
+
+    # Grafo de enlaces internos; las URLs del sitemap permiten detectar páginas que nadie enlaza
+    link_graph = LinkGraph()
+    for sitemap_url in sitemap_urls or ():
+        link_graph.add_url(sitemap_url)
+    if history_run_id is not None and resume_state is not None:
+        for source_url, target_urls in history.iter_links(history_run_id): # Enlaces de antes de reanudar
+            link_graph.add_page(source_url, target_urls)
+
+    interrupted = False
+    # Cada página se añade al NDJSON en cuanto termina: memoria constante y nada se pierde si el proceso cae
+    with NDJSONResultsWriter(ndjson_filename, append=resume_state is not None) as results_writer:
+        def handle_result(analysis_results):
+            with tracer.stage("write"):
+                results_writer.write(analysis_results)
+            if on_result:
+                on_result(analysis_results)
+
+        def handle_links(page_url, links):
+            link_graph.add_page(page_url, links)
+            if history is not None:
+                history.add_links(history_run_id, page_url, links)
+
+        started_at = time.perf_counter()
+        tracer.start_profiling()
+        try:
+            engine.run(on_result=handle_result, keep_results=False, on_links=handle_links)
+        except KeyboardInterrupt:
+            interrupted = True
+            print("\nRastreo interrumpido. Ejecuta de nuevo con --resume para continuar donde se quedó.")
+        finally:
+            checkpoint.close()
+            if recrawl_state is not None:
+                recrawl_state.close()
+            robots_cache.save()
+            archive.close()
+            if own_fetcher:
+                fetcher.close()
+            profile_path = tracer.stop_profiling(results_dir)
+    wall_time = time.perf_counter() - started_at
+    if profile_path:
+        print(f"Perfil del rastreo guardado en '{profile_path}'.")
+    trace_summary = tracer.print_summary(wall_time)
+    tracer.save_summary(results_dir, wall_time)
+    print(f"\nResultados de análisis de {engine.analyzed_count} páginas guardados en '{ndjson_filename}'.")
+
+    # Comprobación de enlaces: cada URL distinta una sola vez, reutilizando las ya rastreadas y las de la caché
+    link_statuses = None
+    if args.check_links:
+        link_status_cache = LinkStatusCache(os.path.join(results_dir, LINK_STATUS_CACHE_FILE), ttl=args.link_check_ttl)
+        checker = LinkChecker(link_status_cache, concurrency=args.link_check_concurrency, per_host=args.link_check_per_host,
+                              url_normalizer=url_normalizer)
+        try:
+            link_statuses = check_crawl_links(iter_analysis_results(ndjson_filename), checker)
+        finally:
+            checker.close()
+            link_status_cache.close()
+
+    # Las métricas del grafo, el estado de los enlaces y los casi duplicados solo se conocen al final:
+    # se añaden a cada página del NDJSON y, ya completa, la página se guarda en el histórico (también
+    # las rastreadas antes de reanudar, que así se actualizan con el grafo completo)
+    link_metrics = link_graph.compute(target_url)
+    duplicate_clusters = find_duplicate_clusters(iter_analysis_results(ndjson_filename))
+
+    def finish_page(analysis_results):
+        attach_link_metrics(analysis_results, link_metrics)
+        attach_duplicate_cluster(analysis_results, duplicate_clusters)
+        if link_statuses is not None:
+            attach_link_status(analysis_results, link_statuses, url_normalizer)
+        if history is not None:
+            history.add_page(history_run_id, analysis_results)
+        return analysis_results
+
+    rewrite_ndjson(ndjson_filename, finish_page)
+    link_summary = link_metrics.summary()
+    print_link_summary(link_summary)
+    duplicate_summary = summarize_clusters(duplicate_clusters)
+    if duplicate_summary["clusters"]:
+        print(f"Contenido casi duplicado: {duplicate_summary['pages']} páginas en {duplicate_summary['clusters']} grupos "
+              f"(detalle con 'python near_duplicates.py').")
+
+    if history is not None:
+        # La tabla de problemas se calcula sobre el NDJSON completo (también lo rastreado antes de reanudar)
+        history.add_issues(history_run_id, aggregate_issues(iter_analysis_results(ndjson_filename), url_normalizer))
+        history.finish_run(history_run_id, "interrupted" if interrupted else "finished")
+        history.close()
+        print(f"Rastreo guardado en el histórico de auditorías como #{history_run_id} "
+              f"(consulta con 'python audit_history.py runs').")
+
+    sitemap_report = None
+    if sitemap_urls is not None:
+        sitemap_report = build_sitemap_report(sitemap_urls, iter_analysis_results(ndjson_filename),
+                                              failed_urls=engine.failed_urls, disallowed_urls=engine.disallowed_urls,
+                                              canonicalized_urls=engine.canonicalized_urls, url_normalizer=url_normalizer)
+        print_sitemap_report(sitemap_report)
+        print(f"Informe de cobertura del sitemap guardado en '{save_sitemap_report(sitemap_report, results_dir)}'.")
+
+    # El analizador puede limitarse a las páginas que han cambiado (python analyzer.py --only-changed)
+    with open(os.path.join(results_dir, RECRAWL_SUMMARY_FILE), 'w', encoding='utf-8') as f:
+        json.dump({"reused_urls": engine.reused_urls}, f, indent=4, ensure_ascii=False)
+
+    # Array JSON clásico para las herramientas que aún lo leen
+    output_filename = os.path.join(results_dir, JSON_FILE_NAME)
     try:
-        with open(output_filename, 'w', encoding='utf-8') as f:
-            json.dump(all_analysis_results, f, indent=4, ensure_ascii=False)
-        print(f"\nResultados de análisis de {len(all_analysis_results)} páginas guardados en '{output_filename}'.")
+        convert_ndjson_to_json(ndjson_filename, output_filename)
+        print(f"Resultados también guardados en formato JSON clásico en '{output_filename}'.")
         print("Por favor, ejecuta 'python analyzer.py' para ver el resumen de la primera página o procesar todos los resultados.")
     except Exception as e:
         print(f"Error al guardar los resultados en JSON: {e}")
+
+    return {
+        "url": target_url,
+        "analyzed_count": engine.analyzed_count,
+        "reused_urls": engine.reused_urls,
+        "disallowed_urls": engine.disallowed_urls,
+        "robots_entries": robots_cache.entries(),
+        "ndjson_path": ndjson_filename,
+        "json_path": output_filename,
+        "history_run_id": history_run_id,
+        "trace": trace_summary,
+        "sitemap_report": sitemap_report,
+        "link_metrics": link_metrics,
+        "link_summary": link_summary,
+        "link_statuses": link_statuses,
+        "url_normalizer": url_normalizer,
+        "duplicate_clusters": duplicate_clusters,
+        "interrupted": interrupted,
+    }
+
+
+if __name__ == "__main__":
+    # La URL llega como primer argumento posicional: python crawler.py <URL> [opciones]
+    options = vars(parse_arguments())
+    crawl_site(options.pop("url"), **options)
@@ -0,0 +1,395 @@
+import json
+from html.parser import HTMLParser
+from urllib.parse import urlparse, urljoin, urldefrag
+
+# Extensiones de archivo que no se rastrean como páginas HTML
+NON_HTML_EXTENSIONS = ('.pdf', '.zip', '.rar', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx',
+                       '.jpg', '.jpeg', '.png', '.gif', '.svg')
+
+# Elementos sin contenido: nunca quedan abiertos en la pila (mismo criterio que BeautifulSoup con html.parser)
+VOID_ELEMENTS = frozenset(['area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed', 'frame', 'hr',
+                           'image', 'img', 'input', 'isindex', 'keygen', 'link', 'menuitem', 'meta', 'nextid',
+                           'param', 'source', 'spacer', 'track', 'wbr'])
+
+# Elementos cuyo texto BeautifulSoup no incluye en el get_text() de sus ancestros
+STRING_CONTAINERS = frozenset(['script', 'style', 'template', 'rt', 'rp'])
+
+HEADING_TAGS = frozenset(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+
+# Texto principal de la página: el de <main>/<article> si los hay y, si no, el del documento sin
+# la navegación, las cabeceras y pies, los laterales ni el contenido de <noscript>
+BOILERPLATE_TAGS = frozenset(['nav', 'header', 'footer', 'aside', 'noscript'])
+MAIN_CONTENT_TAGS = frozenset(['main', 'article'])
+
+
+def clean_internal_link(page_url, href, base_domain):
+    """
+    Resuelve un href y lo devuelve sin fragmento si es un enlace interno rastreable.
+
+    Returns:
+        str or None: La URL limpia, o None si es externa o apunta a un archivo no HTML.
+    """
+    full_url = urljoin(page_url, href)
+    parsed_full_url = urlparse(full_url)
+    if parsed_full_url.netloc != base_domain or parsed_full_url.path.lower().endswith(NON_HTML_EXTENSIONS):
+        return None
+    clean_url = urljoin(full_url, parsed_full_url.path)
+    if parsed_full_url.query:
+        clean_url += "?" + parsed_full_url.query
+    return clean_url
+
+
+def resolve_link(page_url, href):
+    """
+    Resuelve un href a una URL absoluta sin fragmento para comprobar si responde.
+
+    Returns:
+        str or None: La URL, o None si no es un enlace http(s) (mailto:, tel:, javascript:...).
+    """
+    full_url = urldefrag(urljoin(page_url, href.strip()))[0]
+    return full_url if urlparse(full_url).scheme in ("http", "https") else None
+
+
+def new_page_metrics():
+    """Plantilla de las métricas que se obtienen del HTML (mismas claves que en `analysis_results`)."""
+    return {
+        "title": None,
+        "meta_description": None,
+        "meta_robots": None,
+        "viewport": None,
+        "canonical_url": None,
+        "hreflang_tags": [],
+        "h1_tags": [],
+        "h2_tags": [],
+        "h3_h6_tags": [],
+        "internal_links_count": 0,
+        "external_links_count": 0,
+        "outgoing_links": [],   # URLs distintas de todos los enlaces de la página (internos y externos)
+        "image_count": 0,
+        "images_without_alt": 0,
+        "lazy_loaded_images_count": 0,
+        "javascript_usage_indicators": {
+            "inline_scripts": 0,
+            "external_scripts": 0,
+            "noscript_tag_present": False
+        },
+        "structured_data_scripts": [],
+        "wai_aria_attributes_found": 0,
+        "mobile_friendly_meta_tags": False,
+    }
+
+
+class _Capture:
+    """Texto de un elemento abierto (title, hN o script JSON-LD) que se completa al cerrarse."""
+    __slots__ = ("kind", "slot", "parts")
+
+    def __init__(self, kind, slot=None):
+        self.kind = kind
+        self.slot = slot
+        self.parts = []
+
+
+class SinglePassExtractor(HTMLParser):
+    """
+    Extrae todas las métricas SEO y los enlaces internos en un único recorrido del HTML.
+
+    Trabaja sobre los eventos del tokenizador de `html.parser` sin construir el árbol, pero
+    reproduce las reglas de árbol de BeautifulSoup que afectan a los resultados: los elementos
+    vacíos no se abren, una etiqueta de cierre cierra el elemento abierto más reciente con ese
+    nombre, y el texto de script/style/template no cuenta en el `get_text(strip=True)` de los
+    encabezados ni del título.
+    """
+    def __init__(self, url, base_domain=None):
+        super().__init__(convert_charrefs=True)
+        self.url = url
+        self.page_domain = urlparse(url).netloc
+        self.base_domain = base_domain if base_domain is not None else self.page_domain
+        self.metrics = new_page_metrics()
+        self.found_internal_links = []
+        self._outgoing_seen = set()
+
+        self._stack = []           # Nombres de los elementos abiertos
+        self._captures = []        # Captura asociada a cada elemento abierto (o None)
+        self._containers = []      # Índices de pila de los script/style/template/rt/rp abiertos
+        self._open_captures = 0
+        self._text_run = []
+        self._title_seen = False
+        self._canonical_seen = False
+        self._h3_h6_slots = []
+        self._boilerplate_depth = 0  # Elementos de BOILERPLATE_TAGS abiertos
+        self._main_depth = 0         # Elementos de MAIN_CONTENT_TAGS abiertos
+        self._content_parts = []
+        self._main_parts = []
+
+    # --- Texto ---
+
+    def handle_data(self, data):
+        if self._open_captures:
+            self._text_run.append(data)
+        if not self._containers and not self._boilerplate_depth and self._stack and self._stack[-1] != 'title':
+            self._content_parts.append(data)
+            if self._main_depth:
+                self._main_parts.append(data)
+
+    def main_text(self):
+        """Texto principal de la página (ver `BOILERPLATE_TAGS` y `MAIN_CONTENT_TAGS`)."""
+        return ' '.join(self._main_parts if self._main_parts else self._content_parts)
+
+    def _flush_text(self):
+        """Cierra el tramo de texto actual, igual que BeautifulSoup al encontrar cualquier marca."""
+        if not self._text_run:
+            return
+        text = ''.join(self._text_run).strip()
+        self._text_run = []
+        if not text:
+            return
+
+        container_name = self._stack[self._containers[-1]] if self._containers else None
+        for capture in self._captures:
+            if capture is None:
+                continue
+            if container_name is None and capture.kind != 'json_ld':
+                capture.parts.append(text)
+            elif container_name == 'script' and capture.kind == 'json_ld' and capture is self._captures[-1]:
+                capture.parts.append(text)
+
+    def handle_comment(self, data):
+        self._flush_text()
+
+    def handle_decl(self, decl):
+        self._flush_text()
+
+    def handle_pi(self, data):
+        self._flush_text()
+
+    def unknown_decl(self, data):
+        self._flush_text()
+
+    # --- Etiquetas ---
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        metrics = self.metrics
+        # BeautifulSoup convierte los atributos sin valor en "" y se queda con el último duplicado
+        attributes = {name: ('' if value is None else value) for name, value in attrs}
+        capture = None
+
+        if tag == 'a':
+            if 'href' in attributes:
+                self._handle_link(attributes['href'])
+        elif tag in HEADING_TAGS:
+            capture = self._start_heading(tag)
+        elif tag == 'img':
+            metrics["image_count"] += 1
+            if not attributes.get('alt'):
+                metrics["images_without_alt"] += 1
+            if attributes.get('loading') == 'lazy' or 'data-src' in attributes or 'data-srcset' in attributes:
+                metrics["lazy_loaded_images_count"] += 1
+        elif tag == 'script':
+            if attributes.get('src'):
+                metrics["javascript_usage_indicators"]["external_scripts"] += 1
+            else:
+                metrics["javascript_usage_indicators"]["inline_scripts"] += 1
+            if attributes.get('type') == 'application/ld+json':
+                capture = _Capture('json_ld')
+        elif tag == 'meta':
+            self._handle_meta(attributes)
+        elif tag == 'link':
+            self._handle_link_tag(attributes)
+        elif tag == 'title':
+            if not self._title_seen:
+                self._title_seen = True
+                capture = _Capture('title')
+        elif tag == 'noscript':
+            metrics["javascript_usage_indicators"]["noscript_tag_present"] = True
+
+        for name in attributes:
+            if name.startswith('aria-'):
+                metrics["wai_aria_attributes_found"] += 1
+                break
+
+        if tag in VOID_ELEMENTS:
+            return
+        if tag in STRING_CONTAINERS:
+            self._containers.append(len(self._stack))
+        if tag in BOILERPLATE_TAGS:
+            self._boilerplate_depth += 1
+        elif tag in MAIN_CONTENT_TAGS:
+            self._main_depth += 1
+        self._stack.append(tag)
+        self._captures.append(capture)
+        if capture is not None:
+            self._open_captures += 1
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        if tag not in self._stack:
+            return
+        while self._stack:
+            name = self._pop()
+            if name == tag:
+                break
+
+    def close(self):
+        super().close()
+        self._flush_text()
+        while self._stack:
+            self._pop()
+
+    def _pop(self):
+        index = len(self._stack) - 1
+        if self._containers and self._containers[-1] == index:
+            self._containers.pop()
+        capture = self._captures.pop()
+        if capture is not None:
+            self._open_captures -= 1
+            self._finish_capture(capture)
+        name = self._stack.pop()
+        if name in BOILERPLATE_TAGS:
+            self._boilerplate_depth -= 1
+        elif name in MAIN_CONTENT_TAGS:
+            self._main_depth -= 1
+        return name
+
+    # --- Métricas por tipo de elemento ---
+
+    def _handle_link(self, href):
+        clean_url = clean_internal_link(self.url, href, self.base_domain)
+        if clean_url is not None:
+            self.found_internal_links.append(clean_url)
+        if href:
+            outgoing_url = resolve_link(self.url, href)
+            if outgoing_url is not None and outgoing_url not in self._outgoing_seen:
+                self._outgoing_seen.add(outgoing_url)
+                self.metrics["outgoing_links"].append(outgoing_url)
+            if urlparse(urljoin(self.url, href)).netloc == self.page_domain:
+                self.metrics["internal_links_count"] += 1
+            else:
+                self.metrics["external_links_count"] += 1
+
+    def _handle_meta(self, attributes):
+        name = attributes.get('name', '').lower()
+        content = attributes.get('content')
+        if name == 'description':
+            self.metrics["meta_description"] = content
+        elif name == 'robots':
+            self.metrics["meta_robots"] = content
+        elif name == 'viewport':
+            self.metrics["viewport"] = content
+            if content and 'width=device-width' in content and 'initial-scale' in content:
+                self.metrics["mobile_friendly_meta_tags"] = True
+
+    def _handle_link_tag(self, attributes):
+        rel_values = attributes.get('rel', '').split()
+        if 'canonical' in rel_values and not self._canonical_seen:
+            self._canonical_seen = True
+            if attributes.get('href'):
+                self.metrics["canonical_url"] = attributes['href']
+        if 'alternate' in rel_values and attributes.get('hreflang') and attributes.get('href'):
+            self.metrics["hreflang_tags"].append({
+                "hreflang": attributes['hreflang'],
+                "href": attributes['href']
+            })
+
+    def _start_heading(self, tag):
+        if tag == 'h1':
+            target = self.metrics["h1_tags"]
+        elif tag == 'h2':
+            target = self.metrics["h2_tags"]
+        else:
+            target = self._h3_h6_slots
+        # El hueco se reserva al abrir para conservar el orden del documento con encabezados anidados
+        target.append(None)
+        return _Capture(tag, (target, len(target) - 1))
+
+    def _finish_capture(self, capture):
+        text = ''.join(capture.parts)
+        if capture.kind == 'title':
+            self.metrics["title"] = text
+        elif capture.kind == 'json_ld':
+            try:
+                json_data = json.loads(text)
+                self.metrics["structured_data_scripts"].append({"type": "JSON-LD", "content_preview": str(json_data)[:200] + "..."})
+            except json.JSONDecodeError:
+                self.metrics["structured_data_scripts"].append({"type": "JSON-LD", "error": "Invalid JSON-LD format"})
+        else:
+            target, index = capture.slot
+            target[index] = text if target is not self._h3_h6_slots else {capture.kind: text}
+
+    def result(self):
+        self.metrics["h3_h6_tags"] = self._h3_h6_slots
+        return self.metrics
+
+
+def extract_page(html_content, url, base_domain=None):
+    """
+    Extrae en una sola pasada las métricas HTML de `analysis_results` y los enlaces internos.
+
+    Args:
+        html_content (str): El HTML de la página.
+        url (str): La URL de la página (para resolver enlaces relativos).
+        base_domain (str, optional): Dominio usado para filtrar enlaces internos rastreables.
+            Por defecto, el dominio de `url`.
+    Returns:
+        tuple: (dict con las métricas HTML, list of found internal links)
+    """
+    metrics, found_internal_links, _ = extract_page_content(html_content, url, base_domain)
+    return metrics, found_internal_links
+
+
+def extract_page_content(html_content, url, base_domain=None):
+    """
+    Igual que `extract_page`, pero devuelve también el texto principal de la página.
+
+    Returns:
+        tuple: (dict con las métricas HTML, list of found internal links, str con el texto principal)
+    """
+    extractor = SinglePassExtractor(url, base_domain)
+    extractor.feed(html_content)
+    extractor.close()
+    return extractor.result(), extractor.found_internal_links, extractor.main_text()
+
+
+# Comparación con el recorrido de BeautifulSoup sobre HTML guardado (p. ej. resultados/*_original.html)
+if __name__ == "__main__":
+    import glob
+    import os
+    import sys
+    import time
+    from bs4 import BeautifulSoup
+    from crawler import RESULTS_DIR, extract_soup_metrics, extract_internal_links_from_soup
+
+    paths = sys.argv[1:] or sorted(glob.glob(os.path.join(RESULTS_DIR, "*_original.html")))
+    if not paths:
+        print("Uso: python extractor.py <archivo.html> [...]")
+        sys.exit(1)
+
+    total_soup, total_single = 0.0, 0.0
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            html_content = f.read()
+        page_url = "https://example.com/"
+
+        started_at = time.perf_counter()
+        soup = BeautifulSoup(html_content, 'html.parser')
+        soup_metrics = extract_soup_metrics(page_url, soup)
+        soup_links = extract_internal_links_from_soup(page_url, soup, urlparse(page_url).netloc)
+        soup_time = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        single_metrics, single_links = extract_page(html_content, page_url)
+        single_time = time.perf_counter() - started_at
+
+        total_soup += soup_time
+        total_single += single_time
+        same = soup_metrics == single_metrics and soup_links == single_links
+        print(f"{os.path.basename(path)[:60]:<60} {len(html_content) / 1024:8.0f} KB  "
+              f"BeautifulSoup {soup_time * 1000:7.1f} ms  una pasada {single_time * 1000:6.1f} ms  "
+              f"x{soup_time / single_time:4.1f}  {'idéntico' if same else 'DIFERENTE'}")
+
+    print(f"\nTotal: BeautifulSoup {total_soup:.3f}s, una pasada {total_single:.3f}s (x{total_soup / total_single:.1f})")
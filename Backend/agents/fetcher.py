@@ -0,0 +1,222 @@
+import codecs
+import re
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- Configuración de la capa de descarga ---
+DEFAULT_TIMEOUT = 10      # Segundos antes de abandonar una petición
+DEFAULT_POOL_SIZE = 10    # Conexiones keep-alive reutilizables por host
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024  # Cuerpo máximo (descomprimido) que se lee de una página; el resto se descarta
+FETCH_CHUNK_SIZE = 64 * 1024          # Bytes por lectura del cuerpo en streaming
+CHARSET_SNIFF_BYTES = 4096            # Bytes del principio del HTML en los que se busca <meta charset>
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+
+# <meta charset="..."> o <meta http-equiv="Content-Type" content="text/html; charset=...">
+_META_CHARSET = re.compile(rb'<meta[^>]*?charset\s*=\s*["\']?\s*([a-zA-Z0-9_.:-]+)', re.IGNORECASE)
+_BOM_ENCODINGS = ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+
+
+class UnsupportedContentError(requests.exceptions.RequestException):
+    """La respuesta no es HTML (imagen, PDF, binario...) y su cuerpo no se descarga."""
+
+
+def charset_from_headers(headers):
+    """Parámetro charset del Content-Type de una respuesta, o None si no lo declara."""
+    for parameter in (headers.get("Content-Type") or "").split(";")[1:]:
+        name, _, value = parameter.partition("=")
+        if name.strip().lower() == "charset" and value.strip(" \"'"):
+            return value.strip(" \"'").lower()
+    return None
+
+
+def sniff_encoding(content, headers):
+    """
+    Codificación del cuerpo sin detección estadística: la marca BOM, el charset de la
+    cabecera Content-Type o el <meta charset> de los primeros `CHARSET_SNIFF_BYTES` bytes.
+
+    Returns:
+        str or None: La codificación, o None si la página no declara ninguna (se usará UTF-8).
+    """
+    for bom, encoding in _BOM_ENCODINGS:
+        if content.startswith(bom):
+            return encoding
+    charset = charset_from_headers(headers)
+    if charset:
+        return charset
+    match = _META_CHARSET.search(content[:CHARSET_SNIFF_BYTES])
+    return match.group(1).decode("ascii").lower() if match else None
+
+
+def content_type_allowed(content_type, allowed_types=HTML_CONTENT_TYPES):
+    """True si el tipo del Content-Type está en `allowed_types` o no se ha declarado."""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return not media_type or media_type in allowed_types
+
+
+def decode_body(content, encoding=None):
+    """Decodifica el cuerpo de una respuesta con la codificación declarada (UTF-8 si no hay ninguna)."""
+    try:
+        return content.decode(encoding or 'utf-8', errors='replace')
+    except LookupError:
+        return content.decode('utf-8', errors='replace')
+
+
+@dataclass
+class FetchResult:
+    """Todo lo que el crawler y el analizador necesitan de una única descarga."""
+    url: str
+    final_url: str
+    status_code: int
+    headers: dict
+    content: bytes
+    encoding: str = None
+    redirect_chain: list = field(default_factory=list)
+    ttfb: float = None          # Segundos hasta recibir las cabeceras de la respuesta final
+    total_time: float = None    # Segundos de la descarga completa, redirecciones incluidas
+    transfer_size: int = None   # Bytes del cuerpo recibidos por la red (comprimidos si hay Content-Encoding)
+    dns_time: float = None      # Segundos de la resolución DNS (solo en la primera petición a cada host)
+    truncated: bool = False     # El cuerpo superaba `max_bytes` y solo se ha leído el principio
+
+    @property
+    def text(self):
+        """Cuerpo decodificado. Se calcula bajo demanda para poder pasar solo los bytes a otros procesos."""
+        return decode_body(self.content, self.encoding)
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def raise_for_status(self):
+        """Lanza `requests.HTTPError` si el estado HTTP es de error (igual que `Response.raise_for_status`)."""
+        if not self.ok:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error para la URL: {self.final_url}")
+
+
+class Fetcher:
+    """
+    Capa de descarga con una sesión HTTP compartida.
+
+    La sesión mantiene un pool de conexiones keep-alive, de modo que las páginas de un mismo
+    sitio reutilizan la conexión TCP/TLS en lugar de abrir una nueva en cada petición.
+    Es segura para usarse desde los hilos del motor de rastreo.
+
+    El cuerpo se lee en streaming y por trozos: como mucho `max_bytes` (ya descomprimidos, así
+    que una bomba gzip tampoco pasa del límite), y las respuestas 200 cuyo Content-Type no está
+    en `content_types` se descartan sin leer el cuerpo (`content_types=None` las admite todas).
+    """
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT, headers=None,
+                 max_bytes=DEFAULT_MAX_BYTES, content_types=HTML_CONTENT_TYPES):
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.content_types = content_types
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+        self._resolved_hosts = set()
+        self._resolved_lock = threading.Lock()
+
+    def _resolve_once(self, url):
+        """Mide la resolución DNS del host la primera vez que se pide (después la conexión keep-alive la evita)."""
+        parts = urlsplit(url)
+        host_key = (parts.hostname, parts.port)
+        with self._resolved_lock:
+            if host_key in self._resolved_hosts:
+                return None
+            self._resolved_hosts.add(host_key)
+        started_at = time.perf_counter()
+        try:
+            socket.getaddrinfo(parts.hostname, parts.port or (443 if parts.scheme == "https" else 80),
+                               type=socket.SOCK_STREAM)
+        except (socket.gaierror, UnicodeError, TypeError):
+            return None # El error real lo dará la propia petición
+        return time.perf_counter() - started_at
+
+    def fetch(self, url, timeout=None, headers=None):
+        """
+        Descarga una URL siguiendo redirecciones.
+
+        Args:
+            url (str): La URL a descargar.
+            timeout (float, optional): Segundos de espera; por defecto, el del Fetcher.
+            headers (dict, optional): Cabeceras extra de esta petición (p. ej. If-None-Match).
+
+        Returns:
+            FetchResult: Cuerpo, estado, cadena de redirecciones, cabeceras, tamaño transferido y tiempos.
+        Raises:
+            UnsupportedContentError: Si la respuesta es un 200 con un Content-Type no admitido.
+            requests.exceptions.RequestException: Si falla la conexión.
+        """
+        dns_time = self._resolve_once(url)
+        started_at = time.perf_counter()
+        with self.session.get(url, timeout=timeout or self.timeout, headers=headers, allow_redirects=True,
+                              stream=True) as response:
+            content_type = response.headers.get("Content-Type")
+            if (self.content_types is not None and response.status_code == 200
+                    and not content_type_allowed(content_type, self.content_types)):
+                raise UnsupportedContentError(f"Contenido no HTML ({content_type}) en {response.url}, no se descarga")
+            content, truncated = self._read_body(response)
+            total_time = time.perf_counter() - started_at
+            try:
+                transfer_size = response.raw.tell() # Bytes leídos del socket, antes de descomprimir
+            except (AttributeError, OSError, ValueError):
+                transfer_size = None
+        if not transfer_size:
+            content_length = response.headers.get("Content-Length", "")
+            transfer_size = int(content_length) if content_length.isdigit() and not truncated else len(content)
+        if truncated:
+            print(f"Aviso: {url} supera {self.max_bytes} bytes; solo se analiza el principio.")
+
+        return FetchResult(
+            url=url,
+            final_url=response.url,
+            status_code=response.status_code,
+            headers=dict(response.headers),
+            content=content,
+            encoding=sniff_encoding(content, response.headers),
+            redirect_chain=[{"url": hop.url, "status": hop.status_code} for hop in response.history],
+            ttfb=response.elapsed.total_seconds(),
+            total_time=total_time,
+            transfer_size=transfer_size,
+            dns_time=dns_time,
+            truncated=truncated,
+        )
+
+    def _read_body(self, response):
+        """
+        Lee el cuerpo por trozos hasta `max_bytes`.
+
+        Returns:
+            tuple: (bytes del cuerpo, True si se ha cortado).
+        """
+        body = bytearray()
+        for chunk in response.iter_content(FETCH_CHUNK_SIZE):
+            body += chunk
+            if self.max_bytes is not None and len(body) > self.max_bytes:
+                del body[self.max_bytes:]
+                return bytes(body), True # Al cerrar la respuesta se descarta el resto sin leerlo
+        return bytes(body), False
+
+    def close(self):
+        self.session.close()
+
+
+_default_fetcher = None
+_default_fetcher_lock = threading.Lock()
+
+
+def get_default_fetcher():
+    """Devuelve un Fetcher compartido para los llamadores que no inyectan el suyo."""
+    global _default_fetcher
+    with _default_fetcher_lock:
+        if _default_fetcher is None:
+            _default_fetcher = Fetcher()
+        return _default_fetcher
@@ -0,0 +1,282 @@
+import hashlib
+import heapq
+import json
+import os
+import sqlite3
+from array import array
+from collections import deque
+
+# --- Órdenes de rastreo disponibles ---
+FRONTIER_ORDERS = ("bfs", "dfs", "priority")
+DEFAULT_FRONTIER_ORDER = "bfs"
+
+# --- Conjunto compacto de URLs vistas ---
+FINGERPRINT_INITIAL_SLOTS = 1 << 16
+FINGERPRINT_MAX_LOAD = 0.5   # Con más ocupación la tabla dobla su tamaño
+
+
+def url_fingerprint(url):
+    """Huella de 64 bits de una URL (nunca 0, que marca los huecos vacíos de la tabla)."""
+    fingerprint = int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little')
+    return fingerprint or 1
+
+
+class FingerprintSet:
+    """
+    Conjunto de URLs vistas que guarda solo una huella de 64 bits por URL.
+
+    Es una tabla hash de direccionamiento abierto sobre un `array('Q')`: unos 16 bytes por URL
+    con la ocupación máxima del 50 %, es decir, 1 millón de URLs en ~16-32 MB frente a los
+    ~150 MB de un `set` de cadenas. Con 64 bits, la probabilidad de que dos URLs distintas
+    compartan huella en un rastreo de 1 millón de URLs es del orden de 1 entre 40 millones;
+    en ese caso la segunda URL se daría por vista y no se rastrearía.
+    """
+    def __init__(self, urls=None):
+        self._slots = array('Q', bytes(8 * FINGERPRINT_INITIAL_SLOTS))
+        self._mask = FINGERPRINT_INITIAL_SLOTS - 1
+        self._count = 0
+        for url in urls or ():
+            self.add(url)
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, url):
+        return self._find(url_fingerprint(url))[1]
+
+    def _find(self, fingerprint):
+        slots, mask = self._slots, self._mask
+        index = fingerprint & mask
+        while True:
+            value = slots[index]
+            if value == 0:
+                return index, False
+            if value == fingerprint:
+                return index, True
+            index = (index + 1) & mask
+
+    def add(self, url):
+        """
+        Añade una URL.
+
+        Returns:
+            bool: True si la URL no estaba en el conjunto.
+        """
+        fingerprint = url_fingerprint(url)
+        index, found = self._find(fingerprint)
+        if found:
+            return False
+        self._slots[index] = fingerprint
+        self._count += 1
+        if self._count > len(self._slots) * FINGERPRINT_MAX_LOAD:
+            self._grow()
+        return True
+
+    def _grow(self):
+        old_slots = self._slots
+        self._slots = array('Q', bytes(16 * len(old_slots)))
+        self._mask = len(self._slots) - 1
+        for fingerprint in old_slots:
+            if fingerprint:
+                self._slots[self._find(fingerprint)[0]] = fingerprint
+
+    @property
+    def nbytes(self):
+        """Memoria ocupada por la tabla, en bytes."""
+        return len(self._slots) * self._slots.itemsize
+
+
+class Frontier:
+    """
+    Cola de URLs pendientes de rastrear.
+
+    - "bfs": primero en entrar, primero en salir (por niveles de profundidad).
+    - "dfs": último en entrar, primero en salir (en profundidad).
+    - "priority": mayor prioridad primero; por defecto la prioridad es `-depth`.
+
+    Las operaciones de añadir y sacar son O(1) (O(log n) con prioridad). Un conjunto aparte
+    recuerda todas las URLs encoladas alguna vez, así que cada URL entra en la cola una sola vez.
+    Por defecto es un `FingerprintSet` (huellas de 64 bits); con `compact_seen=False` es un
+    `set` exacto de cadenas.
+    Las URLs que se han sacado pero aún no se han completado se guardan en `in_progress`
+    para volver a encolarlas si el rastreo se reanuda tras una caída.
+    """
+    def __init__(self, order=DEFAULT_FRONTIER_ORDER, max_depth=None, compact_seen=True):
+        if order not in FRONTIER_ORDERS:
+            raise ValueError(f"Orden de rastreo desconocido '{order}'. Opciones: {', '.join(FRONTIER_ORDERS)}")
+        self.order = order
+        self.max_depth = max_depth
+        self.compact_seen = compact_seen
+        self._queue = [] if order == "priority" else deque()
+        self._seen = FingerprintSet() if compact_seen else set()
+        self._new_seen = []       # URLs vistas desde el último checkpoint
+        self._in_progress = {}    # url -> (depth, priority)
+        self._sequence = 0
+
+    def __len__(self):
+        return len(self._queue)
+
+    def __bool__(self):
+        return bool(self._queue)
+
+    def is_seen(self, url):
+        return url in self._seen
+
+    def mark_seen(self, url):
+        """Marca una URL como vista sin encolarla (p. ej. porque ya se rastreó con otra forma)."""
+        if url not in self._seen:
+            self._seen.add(url)
+            self._new_seen.append(url)
+
+    def add(self, url, depth=0, priority=None):
+        """
+        Encola una URL si nunca se ha encolado y no supera la profundidad máxima.
+
+        Returns:
+            bool: True si se ha encolado.
+        """
+        if url in self._seen:
+            return False
+        if self.max_depth is not None and depth > self.max_depth:
+            return False
+        self.mark_seen(url)
+        self._push(url, depth, -depth if priority is None else priority)
+        return True
+
+    def _push(self, url, depth, priority, front=False):
+        self._sequence += 1
+        if self.order == "priority":
+            heapq.heappush(self._queue, (-priority, self._sequence, url, depth))
+        elif front and self.order == "bfs":
+            self._queue.appendleft((url, depth, priority))
+        else:
+            self._queue.append((url, depth, priority))
+
+    def pop(self):
+        """
+        Saca la siguiente URL según el orden configurado.
+
+        Returns:
+            tuple: (url, depth)
+        """
+        if self.order == "priority":
+            negative_priority, _, url, depth = heapq.heappop(self._queue)
+            priority = -negative_priority
+        elif self.order == "dfs":
+            url, depth, priority = self._queue.pop()
+        else:
+            url, depth, priority = self._queue.popleft()
+        self._in_progress[url] = (depth, priority)
+        return url, depth
+
+    def complete(self, url):
+        """Indica que una URL sacada de la cola ya se ha procesado (con éxito o no)."""
+        self._in_progress.pop(url, None)
+
+    def discard(self, urls):
+        """Quita de la cola las URLs indicadas (siguen marcadas como vistas)."""
+        urls = set(urls)
+        if not urls:
+            return
+        items = [item for item in self._pending_items() if item[0] not in urls]
+        self._queue = [] if self.order == "priority" else deque()
+        for url, depth, priority in items:
+            self._push(url, depth, priority)
+
+    def _pending_items(self):
+        """URLs pendientes como (url, depth, priority), en el orden en que saldrían de la cola."""
+        if self.order == "priority":
+            return [(url, depth, -negative_priority) for negative_priority, _, url, depth in sorted(self._queue)]
+        if self.order == "dfs":
+            return list(self._queue)[::-1]
+        return list(self._queue)
+
+    def snapshot(self):
+        """
+        Estado pendiente para un checkpoint: las URLs en curso primero y después la cola.
+
+        Returns:
+            list: Tuplas (url, depth, priority) en orden de salida.
+        """
+        in_progress = [(url, depth, priority) for url, (depth, priority) in self._in_progress.items()]
+        return in_progress + self._pending_items()
+
+    def drain_new_seen(self):
+        new_seen, self._new_seen = self._new_seen, []
+        return new_seen
+
+    @classmethod
+    def restore(cls, pending, seen, order=DEFAULT_FRONTIER_ORDER, max_depth=None, compact_seen=True):
+        """Reconstruye una cola a partir de un `snapshot()` y del conjunto de URLs vistas."""
+        frontier = cls(order=order, max_depth=max_depth, compact_seen=compact_seen)
+        for url in seen:
+            frontier._seen.add(url)
+        if order == "dfs":
+            pending = list(pending)[::-1]
+        for url, depth, priority in pending:
+            frontier._seen.add(url)
+            frontier._push(url, depth, priority)
+        return frontier
+
+
+class FrontierCheckpoint:
+    """
+    Checkpoint de la cola de rastreo en un archivo SQLite local.
+
+    Guarda la cola pendiente (las URLs en curso incluidas), todas las URLs vistas y un
+    pequeño diccionario de estado (URL inicial, páginas lanzadas, orden...). Las URLs vistas
+    se añaden de forma incremental, así que guardar un rastreo de 100k páginas solo reescribe
+    la cola pendiente.
+    """
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);"
+            "CREATE TABLE IF NOT EXISTS queue (position INTEGER PRIMARY KEY, url TEXT, depth INTEGER, priority REAL);"
+            "CREATE TABLE IF NOT EXISTS seen (url TEXT PRIMARY KEY);"
+        )
+
+    def clear(self):
+        """Borra cualquier checkpoint anterior (al empezar un rastreo desde cero)."""
+        with self._connection:
+            self._connection.execute("DELETE FROM meta")
+            self._connection.execute("DELETE FROM queue")
+            self._connection.execute("DELETE FROM seen")
+
+    def save(self, frontier, state):
+        """Guarda la cola y el estado del rastreo en una única transacción."""
+        pending = frontier.snapshot()
+        new_seen = frontier.drain_new_seen()
+        state = dict(state, order=frontier.order, max_depth=frontier.max_depth, compact_seen=frontier.compact_seen)
+        with self._connection:
+            self._connection.execute("DELETE FROM queue")
+            self._connection.executemany(
+                "INSERT INTO queue (position, url, depth, priority) VALUES (?, ?, ?, ?)",
+                ((position, url, depth, priority) for position, (url, depth, priority) in enumerate(pending)),
+            )
+            self._connection.executemany("INSERT OR IGNORE INTO seen (url) VALUES (?)", ((url,) for url in new_seen))
+            self._connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('state', ?)", (json.dumps(state),))
+
+    def load(self):
+        """
+        Carga el último checkpoint.
+
+        Returns:
+            tuple: (Frontier, dict de estado) o (None, None) si no hay checkpoint.
+        """
+        row = self._connection.execute("SELECT value FROM meta WHERE key = 'state'").fetchone()
+        if row is None:
+            return None, None
+        state = json.loads(row[0])
+        pending = self._connection.execute("SELECT url, depth, priority FROM queue ORDER BY position").fetchall()
+        seen = (url for (url,) in self._connection.execute("SELECT url FROM seen"))
+        frontier = Frontier.restore(pending, seen, order=state.get("order", DEFAULT_FRONTIER_ORDER),
+                                    max_depth=state.get("max_depth"), compact_seen=state.get("compact_seen", True))
+        return frontier, state
+
+    def close(self):
+        self._connection.close()
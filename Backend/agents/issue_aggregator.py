@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import time
+
+from prompt_compactor import page_issue_signature, SLOW_TTFB_MS, MAX_CLICK_DEPTH, THIN_CONTENT_WORDS
+
+# --- Configuración de la tabla de problemas del sitio ---
+ISSUES_FILE_NAME = "issues.json"
+ISSUES_PROMPT_MAX_URLS = 10   # URLs de ejemplo por problema en el prompt (el artefacto las guarda todas)
+SEVERITY_ORDER = ("alta", "media", "baja")
+
+# Problemas por página (códigos de `page_issue_signature`) y entre páginas: código -> (gravedad, descripción)
+ISSUE_DEFINITIONS = {
+    "estado_http_4xx": ("alta", "La página responde con un error 4xx"),
+    "estado_http_5xx": ("alta", "La página responde con un error 5xx"),
+    "estado_http_otro": ("media", "La página no responde con 200"),
+    "pagina_huerfana": ("alta", "No se llega a la página siguiendo enlaces desde la URL inicial (página huérfana)"),
+    "noindex": ("alta", "La página tiene meta robots noindex"),
+    "enlaces_rotos": ("alta", "La página enlaza a URLs que dan error o no responden"),
+    "sin_title": ("alta", "Falta la etiqueta <title>"),
+    "title_duplicado": ("alta", "El <title> se repite en varias páginas"),
+    "sin_viewport": ("alta", "Falta la meta viewport"),
+    "sin_meta_description": ("media", "Falta la meta description"),
+    "meta_description_duplicada": ("media", "La meta description se repite en varias páginas"),
+    "sin_h1": ("media", "Falta el H1"),
+    "canonical_a_otra_url": ("media", "El canonical apunta a otra URL"),
+    "redirecciones": ("media", "La URL llega a su destino a través de redirecciones"),
+    "ttfb_lento": ("media", f"El servidor tarda más de {SLOW_TTFB_MS} ms en empezar a responder (TTFB)"),
+    "sin_compresion": ("media", "El HTML se sirve sin compresión (gzip, br...)"),
+    "html_demasiado_grande": ("media", "El HTML supera el tamaño máximo de descarga y solo se ha analizado el principio"),
+    "viewport_no_movil": ("media", "La meta viewport no está adaptada a móviles"),
+    "json_ld_invalido": ("media", "Hay datos estructurados JSON-LD que no se pueden interpretar"),
+    "imagenes_sin_alt": ("media", "Hay imágenes sin atributo alt"),
+    "contenido_duplicado": ("media", "El texto principal es casi idéntico al de otras páginas"),
+    "pagina_profunda": ("media", f"La página está a más de {MAX_CLICK_DEPTH} clics de la URL inicial"),
+    "sin_enlaces_internos": ("baja", "La página no enlaza a ninguna otra página del sitio"),
+    "enlaces_con_redireccion": ("baja", "La página enlaza a URLs que redirigen a otra"),
+    "contenido_escaso": ("baja", f"El texto principal tiene menos de {THIN_CONTENT_WORDS} palabras"),
+    "varios_h1": ("baja", "Hay más de un H1"),
+    "h1_duplicado": ("baja", "El H1 se repite en varias páginas"),
+    "title_largo": ("baja", "El <title> supera los 60 caracteres"),
+    "meta_description_larga": ("baja", "La meta description supera los 160 caracteres"),
+    "sin_canonical": ("baja", "Falta la etiqueta canonical"),
+    "sin_datos_estructurados": ("baja", "No hay datos estructurados"),
+}
+
+# Campos cuyo valor no debería repetirse entre páginas: campo -> código del problema
+DUPLICATE_FIELDS = {
+    "title": "title_duplicado",
+    "meta_description": "meta_description_duplicada",
+    "h1_tags": "h1_duplicado",
+}
+
+
+def _issue_code(code):
+    """Agrupa los códigos de estado HTTP concretos (estado_http_404 -> estado_http_4xx)."""
+    if code.startswith("estado_http_"):
+        status = code[len("estado_http_"):]
+        return f"estado_http_{status[0]}xx" if status[:1] in ("4", "5") else "estado_http_otro"
+    return code
+
+
+def _duplicate_text(value):
+    """Texto comparable entre páginas (sin espacios sobrantes) o None si no hay un único texto."""
+    if isinstance(value, list):
+        value = value[0] if len(value) == 1 else None # Solo se comparan páginas con un único H1
+    if not isinstance(value, str):
+        return None
+    return " ".join(value.split()) or None
+
+
+class IssueAggregator:
+    """
+    Tabla exacta de los problemas SEO de todo el sitio, calculada en una sola pasada y sin
+    llamar al modelo.
+
+    Cada página se añade con `add` (se puede ir alimentando mientras se leen los resultados
+    en streaming); los problemas por página salen de `page_issue_signature` y los duplicados
+    (title, meta description, H1) se detectan con un índice hash por campo. El coste es O(n)
+    en tiempo y en memoria solo se guardan las URLs afectadas y los índices de duplicados.
+
+    Args:
+        url_normalizer (URLNormalizer, optional): El normalizador del rastreo (ver
+            `page_issue_signature`).
+    """
+    def __init__(self, url_normalizer=None):
+        self.url_normalizer = url_normalizer
+        self.total_pages = 0
+        self._affected = {}   # código -> lista de URLs
+        self._statuses = {}   # código agrupado -> estados HTTP concretos vistos
+        self._duplicate_index = {field: {} for field in DUPLICATE_FIELDS} # campo -> clave -> (texto, URLs)
+
+    def add(self, page):
+        """Añade los problemas de una página (`analysis_results`)."""
+        self.total_pages += 1
+        url = page.get("url")
+        for code in page_issue_signature(page, self.url_normalizer):
+            grouped_code = _issue_code(code)
+            if grouped_code != code:
+                self._statuses.setdefault(grouped_code, set()).add(code[len("estado_http_"):])
+            self._affected.setdefault(grouped_code, []).append(url)
+
+        if page.get("http_status") not in (None, 200):
+            return # Las páginas de error no cuentan para los duplicados
+        for field, index in self._duplicate_index.items():
+            text = _duplicate_text(page.get(field))
+            if text is not None:
+                index.setdefault(text.casefold(), (text, []))[1].append(url)
+
+    def update(self, pages):
+        for page in pages:
+            self.add(page)
+        return self
+
+    def result(self):
+        """
+        Tabla de problemas ordenada por gravedad y número de páginas afectadas.
+
+        Returns:
+            dict: {"total_pages", "issues"}; cada problema es {"issue", "severity",
+                "description", "count", "urls"} y los duplicados incluyen además "groups"
+                (lista de {"value", "urls"} con las páginas que comparten cada texto).
+        """
+        issues = []
+        for code, urls in self._affected.items():
+            issues.append(self._issue_entry(code, urls))
+
+        for field, code in DUPLICATE_FIELDS.items():
+            groups = [{"value": text, "urls": urls}
+                      for text, urls in self._duplicate_index[field].values() if len(urls) > 1]
+            if not groups:
+                continue
+            groups.sort(key=lambda group: len(group["urls"]), reverse=True)
+            entry = self._issue_entry(code, [url for group in groups for url in group["urls"]])
+            entry["groups"] = groups
+            issues.append(entry)
+
+        issues.sort(key=lambda entry: (SEVERITY_ORDER.index(entry["severity"]), -entry["count"], entry["issue"]))
+        return {"total_pages": self.total_pages, "issues": issues}
+
+    def _issue_entry(self, code, urls):
+        severity, description = ISSUE_DEFINITIONS.get(code, ("media", code))
+        if code in self._statuses:
+            description += f" ({', '.join(sorted(self._statuses[code]))})"
+        return {"issue": code, "severity": severity, "description": description, "count": len(urls), "urls": urls}
+
+
+def aggregate_issues(pages, url_normalizer=None):
+    """
+    Calcula la tabla de problemas de un conjunto de páginas (ver `IssueAggregator.result`).
+
+    Args:
+        pages (iterable): Los `analysis_results` de las páginas (lista o iterador).
+        url_normalizer (URLNormalizer, optional): El normalizador del rastreo.
+    """
+    return IssueAggregator(url_normalizer).update(pages).result()
+
+
+def save_issue_table(issue_table, results_dir):
+    """
+    Guarda la tabla de problemas como artefacto JSON en `results_dir`.
+
+    Returns:
+        str: Ruta del archivo guardado.
+    """
+    os.makedirs(results_dir, exist_ok=True)
+    filepath = os.path.join(results_dir, ISSUES_FILE_NAME)
+    with open(filepath, "w", encoding="utf-8") as f:
+        json.dump(issue_table, f, indent=2, ensure_ascii=False)
+    return filepath
+
+
+def format_issue_table(issue_table, max_urls=ISSUES_PROMPT_MAX_URLS):
+    """
+    Tabla de problemas en texto compacto para el prompt del analizador.
+
+    Returns:
+        str: Una línea por problema con su gravedad, páginas afectadas y URLs de ejemplo.
+    """
+    lines = []
+    for entry in issue_table["issues"]:
+        urls = entry["urls"][:max_urls]
+        more = f" (+{entry['count'] - len(urls)} más)" if entry["count"] > len(urls) else ""
+        lines.append(f"- [{entry['severity']}] {entry['issue']}: {entry['description']}. "
+                     f"{entry['count']} de {issue_table['total_pages']} páginas: {', '.join(map(str, urls))}{more}")
+        for group in entry.get("groups", [])[:max_urls]:
+            lines.append(f"    - \"{group['value']}\" en {len(group['urls'])} páginas")
+    return "\n".join(lines) if lines else "- No se han detectado problemas."
+
+
+if __name__ == "__main__":
+    from crawler import RESULTS_DIR
+    from results_io import iter_analysis_results, NDJSON_FILE_NAME
+
+    parser = argparse.ArgumentParser(description="Calcula la tabla de problemas SEO del sitio a partir de los resultados del crawler.")
+    parser.add_argument("source", nargs="?", default=os.path.join(RESULTS_DIR, NDJSON_FILE_NAME), help="Archivo NDJSON de entrada")
+    parser.add_argument("--results-dir", default=RESULTS_DIR, help="Directorio donde se guarda 'issues.json'")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    issue_table = aggregate_issues(iter_analysis_results(args.source))
+    elapsed = time.perf_counter() - start_time
+    filepath = save_issue_table(issue_table, args.results_dir)
+    print(format_issue_table(issue_table))
+    print(f"\nTabla de {len(issue_table['issues'])} problemas en {issue_table['total_pages']} páginas "
+          f"calculada en {elapsed:.2f} s y guardada en '{filepath}'.")
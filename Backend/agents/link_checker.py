@@ -0,0 +1,306 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from results_io import iter_analysis_results
+
+# --- Configuración de la comprobación de enlaces ---
+LINK_STATUS_CACHE_FILE = "link_status.sqlite"  # Estado de cada enlace comprobado, compartido entre rastreos
+DEFAULT_LINK_CHECK_CONCURRENCY = 16   # Comprobaciones simultáneas en total
+DEFAULT_LINK_CHECK_PER_HOST = 2       # Comprobaciones simultáneas como mucho contra un mismo host
+DEFAULT_LINK_CHECK_TTL = 24 * 3600    # Segundos durante los que se reutiliza el estado guardado de un enlace
+LINK_CHECK_ERROR_TTL = 15 * 60        # Sin respuesta o con un 5xx el fallo puede ser pasajero: se vuelve a comprobar antes
+LINK_CHECK_TIMEOUT = 10
+
+
+class LinkStatusCache:
+    """
+    Estado de los enlaces comprobados en un archivo SQLite, para no volver a pedir en cada
+    rastreo los mismos enlaces (el pie de página, las redes sociales...) mientras no caduquen.
+
+    Los enlaces sin respuesta (error de red, timeout) o con un error 5xx caducan a los
+    `error_ttl` segundos: un corte momentáneo no debe darlos por rotos durante todo un día.
+    """
+    def __init__(self, path, ttl=DEFAULT_LINK_CHECK_TTL, error_ttl=LINK_CHECK_ERROR_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.error_ttl = min(error_ttl, ttl)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=30)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS links ("
+            "url TEXT PRIMARY KEY, status INTEGER, final_url TEXT, redirects INTEGER NOT NULL, "
+            "error TEXT, checked_at REAL NOT NULL) WITHOUT ROWID"
+        )
+        self._connection.commit()
+
+    def get(self, url):
+        """
+        Estado guardado de un enlace si no ha caducado.
+
+        Returns:
+            dict or None: {"status", "final_url", "redirects", "error"}.
+        """
+        now = time.time()
+        row = self._connection.execute(
+            "SELECT status, final_url, redirects, error FROM links WHERE url = ? AND checked_at >= ? "
+            "AND ((status IS NOT NULL AND status < 500) OR checked_at >= ?)",
+            (url, now - self.ttl, now - self.error_ttl),
+        ).fetchone()
+        if row is None:
+            return None
+        return {"status": row[0], "final_url": row[1], "redirects": row[2], "error": row[3]}
+
+    def put_many(self, statuses):
+        """Guarda el estado de varios enlaces (dict URL -> estado)."""
+        checked_at = time.time()
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO links (url, status, final_url, redirects, error, checked_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                ((url, status["status"], status["final_url"], status["redirects"], status["error"], checked_at)
+                 for url, status in statuses.items()),
+            )
+
+    def close(self):
+        self._connection.close()
+
+
+def check_link(session, url, timeout=LINK_CHECK_TIMEOUT):
+    """
+    Comprueba si un enlace responde, siguiendo sus redirecciones.
+
+    Primero con HEAD, que no descarga el cuerpo; si el HEAD falla o devuelve un error (hay
+    servidores que no lo admiten o responden 403/404/405 solo a HEAD), se repite con un GET
+    en streaming del que solo se leen las cabeceras.
+
+    Returns:
+        dict: "status" (código HTTP final o None si no hay respuesta), "final_url",
+            "redirects" (saltos) y "error" (mensaje si no hubo respuesta).
+    """
+    try:
+        response = session.head(url, timeout=timeout, allow_redirects=True)
+        response.close()
+        if response.status_code < 400:
+            return {"status": response.status_code, "final_url": response.url,
+                    "redirects": len(response.history), "error": None}
+    except requests.exceptions.RequestException:
+        pass
+    try:
+        with session.get(url, timeout=timeout, allow_redirects=True, stream=True) as response:
+            return {"status": response.status_code, "final_url": response.url,
+                    "redirects": len(response.history), "error": None}
+    except requests.exceptions.RequestException as e:
+        return {"status": None, "final_url": None, "redirects": 0, "error": str(e)}
+
+
+def _interleave_by_host(urls):
+    """Ordena las URLs alternando hosts para que los hilos no esperen todos al mismo host."""
+    by_host = {}
+    for url in urls:
+        by_host.setdefault(urlparse(url).netloc, []).append(url)
+    queues = sorted(by_host.values(), key=len, reverse=True)
+    ordered = []
+    for index in range(len(queues[0]) if queues else 0):
+        ordered.extend(queue[index] for queue in queues if index < len(queue))
+    return ordered
+
+
+class LinkChecker:
+    """
+    Comprueba una sola vez cada enlace distinto de todo el rastreo.
+
+    Los enlaces se deduplican entre páginas (el menú y el pie se repiten en todas), los que
+    ya se conocen por el propio rastreo se registran con `record` sin pedirlos de nuevo, y el
+    resto se busca en la `LinkStatusCache` y, si no está o ha caducado, se comprueba con
+    `check_link` en un pool de `concurrency` hilos y como mucho `per_host` peticiones
+    simultáneas a cada host. Con `url_normalizer`, las URLs registradas y las enlazadas se
+    normalizan igual que en el rastreo, así que "/ruta#seccion" o "/ruta?utm_source=x" se
+    reconocen como la página "/ruta" ya rastreada y los estados quedan indexados por la URL
+    normalizada.
+
+    Args:
+        cache (LinkStatusCache, optional): Estado guardado entre rastreos.
+        concurrency (int): Comprobaciones simultáneas en total.
+        per_host (int): Comprobaciones simultáneas contra un mismo host.
+        timeout (float): Segundos de espera de cada petición.
+        session (requests.Session, optional): Sesión HTTP; por defecto, una con un pool de
+            conexiones del tamaño de `concurrency`.
+        url_normalizer (URLNormalizer, optional): El normalizador del rastreo.
+    """
+    def __init__(self, cache=None, concurrency=DEFAULT_LINK_CHECK_CONCURRENCY, per_host=DEFAULT_LINK_CHECK_PER_HOST,
+                 timeout=LINK_CHECK_TIMEOUT, session=None, url_normalizer=None):
+        self.cache = cache
+        self.url_normalizer = url_normalizer
+        self.concurrency = max(1, int(concurrency))
+        self.per_host = max(1, int(per_host))
+        self.timeout = timeout
+        self._own_session = session is None
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.concurrency, pool_maxsize=self.concurrency)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self.statuses = {}    # URL -> estado
+        self.stats = {"links": 0, "from_crawl": 0, "from_cache": 0, "checked": 0}
+        self._host_slots = {}
+        self._host_lock = threading.Lock()
+
+    def record(self, url, status, final_url=None, redirects=0):
+        """Registra el estado de una URL que ya se ha descargado durante el rastreo."""
+        url = normalize_link(url, self.url_normalizer)
+        self.statuses[url] = {"status": status, "final_url": final_url or url, "redirects": redirects, "error": None}
+
+    def _host_slot(self, url):
+        host = urlparse(url).netloc
+        with self._host_lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return slot
+
+    def _check(self, url):
+        with self._host_slot(url):
+            return url, check_link(self.session, url, self.timeout)
+
+    def check(self, urls):
+        """
+        Comprueba un conjunto de enlaces.
+
+        Args:
+            urls (iterable): URLs de los enlaces (se ignoran las repetidas, también las que solo
+                se diferencian en lo que quita el normalizador).
+        Returns:
+            dict: URL normalizada -> {"status", "final_url", "redirects", "error"} de todas las
+                URLs registradas o comprobadas.
+        """
+        pending = []
+        for url in {normalize_link(url, self.url_normalizer) for url in urls}:
+            self.stats["links"] += 1
+            if url in self.statuses:
+                self.stats["from_crawl"] += 1
+                continue
+            cached = self.cache.get(url) if self.cache is not None else None
+            if cached is not None:
+                self.statuses[url] = cached
+                self.stats["from_cache"] += 1
+            else:
+                pending.append(url)
+
+        checked = {}
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for url, status in pool.map(self._check, _interleave_by_host(pending)):
+                checked[url] = status
+        self.statuses.update(checked)
+        self.stats["checked"] += len(checked)
+        if self.cache is not None and checked:
+            self.cache.put_many(checked)
+        print(f"Enlaces: {self.stats['links']} distintos; {self.stats['from_crawl']} ya conocidos por el rastreo, "
+              f"{self.stats['from_cache']} de la caché y {len(checked)} comprobados en "
+              f"{time.perf_counter() - started_at:.1f} s.")
+        return self.statuses
+
+    def close(self):
+        if self._own_session:
+            self.session.close()
+
+
+def normalize_link(url, url_normalizer=None):
+    """URL con la que se indexa el estado de un enlace: la normalizada, si hay normalizador."""
+    return url_normalizer(url) if url_normalizer is not None else url
+
+
+def link_findings(outgoing_links, statuses, url_normalizer=None):
+    """
+    Enlaces rotos y enlaces con redirección de una página.
+
+    Args:
+        outgoing_links (iterable): Los enlaces tal como aparecen en la página.
+        statuses (dict): Estados devueltos por `LinkChecker.check`.
+        url_normalizer (URLNormalizer, optional): El mismo normalizador del `LinkChecker`.
+    Returns:
+        dict: "broken_links" (lista de {"url", "status", "error"}: errores 4xx/5xx o sin
+            respuesta) y "redirecting_links" (lista de {"url", "final_url", "redirects"}).
+    """
+    broken_links, redirecting_links = [], []
+    seen = set()
+    for url in outgoing_links or []:
+        key = normalize_link(url, url_normalizer)
+        status = statuses.get(key)
+        if status is None or key in seen:
+            continue
+        seen.add(key)
+        if status["status"] is None or status["status"] >= 400:
+            broken_links.append({"url": url, "status": status["status"], "error": status["error"]})
+        elif status["redirects"] or (status["final_url"] and status["final_url"] != key):
+            redirecting_links.append({"url": url, "final_url": status["final_url"], "redirects": status["redirects"]})
+    return {"broken_links": broken_links, "redirecting_links": redirecting_links}
+
+
+def attach_link_status(analysis_results, statuses, url_normalizer=None):
+    """Añade a una página sus enlaces rotos y con redirección ("broken_links", "redirecting_links")."""
+    analysis_results.update(link_findings(analysis_results.get("outgoing_links"), statuses, url_normalizer))
+    return analysis_results
+
+
+def check_crawl_links(pages, checker):
+    """
+    Comprueba todos los enlaces de las páginas de un rastreo.
+
+    Las páginas rastreadas se registran con su estado y su URL final, así que los enlaces
+    internos ya rastreados no se vuelven a pedir. Para que coincidan con los enlaces tal como
+    aparecen en el HTML (con barra final, parámetros de seguimiento o fragmento), el `checker`
+    debe usar el `url_normalizer` del rastreo.
+
+    Args:
+        pages (iterable): Los `analysis_results` de las páginas (se recorren una vez).
+        checker (LinkChecker): El comprobador.
+    Returns:
+        dict: URL -> estado de cada enlace (ver `LinkChecker.check`).
+    """
+    outgoing_links = set()
+    for page in pages:
+        if isinstance(page.get("http_status"), int):
+            checker.record(page.get("url"), page["http_status"], page.get("final_url_after_redirects"),
+                           len(page.get("redirect_chain") or []))
+        outgoing_links.update(page.get("outgoing_links") or [])
+    return checker.check(outgoing_links)
+
+
+if __name__ == "__main__":
+    from crawler import RESULTS_DIR
+    from results_io import NDJSON_FILE_NAME
+    from url_normalizer import URLNormalizer
+
+    parser = argparse.ArgumentParser(description="Comprueba los enlaces de las páginas rastreadas y muestra los rotos y con redirección.")
+    parser.add_argument("source", nargs="?", default=os.path.join(RESULTS_DIR, NDJSON_FILE_NAME), help="Archivo NDJSON de entrada")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_LINK_CHECK_CONCURRENCY)
+    parser.add_argument("--per-host", type=int, default=DEFAULT_LINK_CHECK_PER_HOST)
+    parser.add_argument("--ttl", type=int, default=DEFAULT_LINK_CHECK_TTL, help="Segundos de validez del estado guardado")
+    args = parser.parse_args()
+
+    url_normalizer = URLNormalizer()
+    cache = LinkStatusCache(os.path.join(RESULTS_DIR, LINK_STATUS_CACHE_FILE), ttl=args.ttl)
+    checker = LinkChecker(cache, concurrency=args.concurrency, per_host=args.per_host, url_normalizer=url_normalizer)
+    try:
+        statuses = check_crawl_links(iter_analysis_results(args.source), checker)
+        for page in iter_analysis_results(args.source):
+            findings = link_findings(page.get("outgoing_links"), statuses, url_normalizer)
+            for entry in findings["broken_links"]:
+                print(f"[roto] {page['url']} -> {entry['url']} ({entry['status'] or entry['error']})")
+            for entry in findings["redirecting_links"]:
+                print(f"[redirección] {page['url']} -> {entry['url']} -> {entry['final_url']}")
+    finally:
+        checker.close()
+        cache.close()
@@ -0,0 +1,290 @@
+import argparse
+import os
+import time
+from array import array
+from collections import deque
+
+try:
+    import numpy as np # Opcional: cálculo vectorizado para grafos de millones de enlaces
+except ImportError:
+    np = None
+
+# --- Configuración del grafo de enlaces internos ---
+PAGERANK_DAMPING = 0.85
+PAGERANK_TOLERANCE = 1e-6        # Cambio total (norma L1) por debajo del cual el PageRank ha convergido
+PAGERANK_MAX_ITERATIONS = 100
+LINK_SUMMARY_TOP = 10            # Páginas de ejemplo de cada lista del resumen
+
+
+class LinkGraph:
+    """
+    Grafo de los enlaces internos del sitio, guardado como una lista compacta de aristas.
+
+    Cada URL recibe un identificador entero y cada enlace se guarda como dos enteros de
+    32 bits (`array("I")`), así que un millón de enlaces ocupan unos 8 MB. Los enlaces
+    repetidos dentro de una misma página y los enlaces de una página a sí misma se ignoran.
+
+    Las páginas se añaden con `add_page` según se rastrean (p. ej. desde el `on_links` del
+    motor de rastreo); `add_url` registra páginas conocidas por otra vía (las del sitemap)
+    para poder detectar las que no enlaza nadie. `compute` calcula las métricas.
+    """
+    def __init__(self):
+        self._ids = {}             # url -> identificador
+        self._urls = []
+        self._crawled = bytearray() # 1 si la página se ha rastreado (sus enlaces salientes son conocidos)
+        self._sources = array("I")
+        self._targets = array("I")
+
+    def __len__(self):
+        return len(self._urls)
+
+    @property
+    def edge_count(self):
+        return len(self._sources)
+
+    def _node(self, url):
+        node = self._ids.get(url)
+        if node is None:
+            node = self._ids[url] = len(self._urls)
+            self._urls.append(url)
+            self._crawled.append(0)
+        return node
+
+    def add_url(self, url):
+        """Registra una URL conocida aunque no se haya rastreado ni la enlace nadie."""
+        self._node(url)
+
+    def add_page(self, url, links):
+        """Añade una página rastreada con sus enlaces internos (ya normalizados)."""
+        source = self._node(url)
+        self._crawled[source] = 1
+        for link in set(links):
+            target = self._node(link)
+            if target != source:
+                self._sources.append(source)
+                self._targets.append(target)
+
+    def compute(self, start_url, damping=PAGERANK_DAMPING, tolerance=PAGERANK_TOLERANCE,
+                max_iterations=PAGERANK_MAX_ITERATIONS):
+        """
+        Calcula la profundidad de clics desde `start_url` (BFS), los enlaces entrantes y
+        salientes y el PageRank interno (método de potencias, repartiendo el peso de las
+        páginas sin enlaces salientes entre todas).
+
+        Con NumPy, el BFS avanza por niveles sobre una matriz de adyacencia dispersa (CSR) y
+        cada iteración del PageRank es un `bincount` ponderado sobre las aristas, de modo que
+        millones de enlaces se procesan en segundos; sin NumPy se usa el mismo algoritmo en
+        Python puro, válido para sitios pequeños y medianos.
+
+        Returns:
+            LinkGraphMetrics: Las métricas de cada URL del grafo.
+        """
+        start = self._node(start_url)
+        calculate = _compute_numpy if np is not None else _compute_python
+        started_at = time.perf_counter()
+        click_depths, inlinks, outlinks, pagerank, iterations = calculate(
+            len(self._urls), self._sources, self._targets, start, damping, tolerance, max_iterations)
+        elapsed = time.perf_counter() - started_at
+        print(f"Grafo de enlaces: {len(self._urls)} URLs y {self.edge_count} enlaces calculados en {elapsed:.2f} s "
+              f"({'NumPy' if np is not None else 'Python'}, PageRank en {iterations} iteraciones).")
+        return LinkGraphMetrics(self._ids, self._urls, self._crawled, click_depths, inlinks, outlinks, pagerank)
+
+
+def _compute_python(node_count, sources, targets, start, damping, tolerance, max_iterations):
+    """Métricas del grafo en Python puro (ver `LinkGraph.compute`)."""
+    adjacency = [[] for _ in range(node_count)]
+    inlinks = [0] * node_count
+    for source, target in zip(sources, targets):
+        adjacency[source].append(target)
+        inlinks[target] += 1
+    outlinks = [len(neighbors) for neighbors in adjacency]
+
+    click_depths = [-1] * node_count
+    click_depths[start] = 0
+    queue = deque([start])
+    while queue:
+        node = queue.popleft()
+        for target in adjacency[node]:
+            if click_depths[target] < 0:
+                click_depths[target] = click_depths[node] + 1
+                queue.append(target)
+
+    rank = [1.0 / node_count] * node_count
+    iterations = 0
+    for iterations in range(1, max_iterations + 1):
+        dangling = sum(rank[node] for node in range(node_count) if not outlinks[node])
+        base = (1 - damping) / node_count + damping * dangling / node_count
+        new_rank = [base] * node_count
+        for node, neighbors in enumerate(adjacency):
+            if neighbors:
+                share = damping * rank[node] / len(neighbors)
+                for target in neighbors:
+                    new_rank[target] += share
+        delta = sum(abs(new - old) for new, old in zip(new_rank, rank))
+        rank = new_rank
+        if delta < tolerance:
+            break
+    return click_depths, inlinks, outlinks, rank, iterations
+
+
+def _compute_numpy(node_count, sources, targets, start, damping, tolerance, max_iterations):
+    """Métricas del grafo con NumPy (ver `LinkGraph.compute`)."""
+    source_ids = np.frombuffer(sources, dtype=np.uint32).astype(np.int64) if len(sources) else np.zeros(0, np.int64)
+    target_ids = np.frombuffer(targets, dtype=np.uint32).astype(np.int64) if len(targets) else np.zeros(0, np.int64)
+    outlinks = np.bincount(source_ids, minlength=node_count)
+    inlinks = np.bincount(target_ids, minlength=node_count)
+
+    # Adyacencia en formato CSR: los vecinos de i son neighbors[offsets[i]:offsets[i + 1]]
+    neighbors = target_ids[np.argsort(source_ids, kind="stable")]
+    offsets = np.zeros(node_count + 1, dtype=np.int64)
+    np.cumsum(outlinks, out=offsets[1:])
+
+    click_depths = np.full(node_count, -1, dtype=np.int64)
+    click_depths[start] = 0
+    frontier = np.array([start], dtype=np.int64)
+    depth = 0
+    while frontier.size:
+        starts = offsets[frontier]
+        counts = offsets[frontier + 1] - starts
+        total = int(counts.sum())
+        if not total:
+            break
+        # Posiciones de todos los vecinos del nivel actual sin recorrerlos uno a uno
+        positions = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(total)
+        candidates = neighbors[positions]
+        frontier = np.unique(candidates[click_depths[candidates] < 0])
+        depth += 1
+        click_depths[frontier] = depth
+
+    rank = np.full(node_count, 1.0 / node_count)
+    dangling = outlinks == 0
+    source_outlinks = outlinks[source_ids].astype(np.float64)
+    iterations = 0
+    for iterations in range(1, max_iterations + 1):
+        new_rank = np.bincount(target_ids, weights=rank[source_ids] / source_outlinks, minlength=node_count)
+        new_rank = (1 - damping) / node_count + damping * (new_rank + rank[dangling].sum() / node_count)
+        delta = np.abs(new_rank - rank).sum()
+        rank = new_rank
+        if delta < tolerance:
+            break
+    return click_depths.tolist(), inlinks.tolist(), outlinks.tolist(), rank.tolist(), iterations
+
+
+class LinkGraphMetrics:
+    """
+    Métricas del grafo de enlaces internos de cada URL (ver `LinkGraph.compute`).
+
+    Una página es huérfana si no se llega a ella siguiendo enlaces desde la URL inicial
+    (p. ej. solo aparece en el sitemap) y es un callejón sin salida si se ha rastreado y no
+    enlaza a ninguna otra página del sitio. Si el rastreo se detuvo por el límite de páginas,
+    las páginas no rastreadas pueden tener enlaces que no se conocen y la profundidad de
+    clics es un máximo.
+    """
+    def __init__(self, ids, urls, crawled, click_depths, inlinks, outlinks, pagerank):
+        self._ids = ids
+        self.urls = urls
+        self.crawled = crawled
+        self.click_depths = click_depths
+        self.inlinks = inlinks
+        self.outlinks = outlinks
+        self.pagerank = pagerank
+
+    def page_metrics(self, url):
+        """
+        Métricas de una URL.
+
+        Returns:
+            dict or None: "click_depth" (clics desde la URL inicial, None si no se llega),
+                "inlinks" (páginas que la enlazan), "outlinks" (páginas del sitio a las que
+                enlaza), "pagerank" (PageRank interno relativo: 1.0 es el de una página media),
+                "orphan" y "dead_end"; None si la URL no está en el grafo.
+        """
+        node = self._ids.get(url)
+        if node is None:
+            return None
+        depth = self.click_depths[node]
+        return {
+            "click_depth": depth if depth >= 0 else None,
+            "inlinks": self.inlinks[node],
+            "outlinks": self.outlinks[node],
+            "pagerank": round(self.pagerank[node] * len(self.urls), 4),
+            "orphan": depth < 0,
+            "dead_end": bool(self.crawled[node]) and not self.outlinks[node],
+        }
+
+    def summary(self, top=LINK_SUMMARY_TOP):
+        """
+        Resumen del grafo para el informe.
+
+        Returns:
+            dict: "urls", "edges", "click_depth_histogram" (páginas por profundidad),
+                "top_pagerank", "orphans" y "dead_ends" ({"count", "sample"}).
+        """
+        histogram = {}
+        orphans, dead_ends = [], []
+        for node, depth in enumerate(self.click_depths):
+            if depth >= 0:
+                histogram[depth] = histogram.get(depth, 0) + 1
+            else:
+                orphans.append(self.urls[node])
+            if self.crawled[node] and not self.outlinks[node]:
+                dead_ends.append(self.urls[node])
+        ranked = sorted(range(len(self.urls)), key=self.pagerank.__getitem__, reverse=True)[:top]
+        return {
+            "urls": len(self.urls),
+            "edges": sum(self.outlinks),
+            "click_depth_histogram": dict(sorted(histogram.items())),
+            "top_pagerank": [{"url": self.urls[node], "pagerank": round(self.pagerank[node] * len(self.urls), 4),
+                              "inlinks": self.inlinks[node]} for node in ranked],
+            "orphans": {"count": len(orphans), "sample": orphans[:top]},
+            "dead_ends": {"count": len(dead_ends), "sample": dead_ends[:top]},
+        }
+
+
+def attach_link_metrics(analysis_results, link_metrics):
+    """Añade a una página sus métricas del grafo de enlaces ("link_metrics")."""
+    analysis_results["link_metrics"] = link_metrics.page_metrics(analysis_results.get("url"))
+    return analysis_results
+
+
+def print_link_summary(summary):
+    """Muestra por consola el resumen del grafo de enlaces."""
+    print(f"\n--- Grafo de enlaces internos ({summary['urls']} URLs, {summary['edges']} enlaces) ---")
+    print("   Páginas por profundidad de clics: "
+          + ", ".join(f"{depth}: {count}" for depth, count in summary["click_depth_histogram"].items()))
+    print(f"   Huérfanas (sin enlaces desde la URL inicial): {summary['orphans']['count']}")
+    for url in summary["orphans"]["sample"]:
+        print(f"      {url}")
+    print(f"   Sin enlaces internos salientes: {summary['dead_ends']['count']}")
+    print("   Mayor PageRank interno:")
+    for entry in summary["top_pagerank"]:
+        print(f"      {entry['pagerank']:>8.2f}  {entry['url']} ({entry['inlinks']} enlaces entrantes)")
+
+
+if __name__ == "__main__":
+    from audit_history import AuditHistory, AUDIT_HISTORY_FILE_NAME
+    from crawler import RESULTS_DIR
+
+    parser = argparse.ArgumentParser(description="Calcula el grafo de enlaces internos de un rastreo guardado en el histórico de auditorías.")
+    parser.add_argument("--site", help="Dominio o URL del sitio (por defecto, el del último rastreo)")
+    parser.add_argument("--run", type=int, help="run_id del rastreo (por defecto, el último terminado del sitio)")
+    parser.add_argument("--db", default=os.path.join(RESULTS_DIR, AUDIT_HISTORY_FILE_NAME), help="Archivo SQLite del histórico")
+    parser.add_argument("--top", type=int, default=LINK_SUMMARY_TOP, help="Páginas de ejemplo de cada lista")
+    args = parser.parse_args()
+
+    history = AuditHistory(args.db)
+    try:
+        runs = history.runs(args.site)
+        run = next((run for run in runs if run["run_id"] == args.run), None) if args.run else \
+            next((run for run in runs if run["status"] == "finished"), None)
+        if run is None:
+            raise SystemExit("No hay ningún rastreo que coincida en el histórico.")
+        graph = LinkGraph()
+        for url in history.iter_page_urls(run["run_id"]):
+            graph.add_page(url, [])
+        for source_url, target_urls in history.iter_links(run["run_id"]):
+            graph.add_page(source_url, target_urls)
+        print(f"Rastreo #{run['run_id']} de {run['site']}:")
+        print_link_summary(graph.compute(run["start_url"]).summary(args.top))
+    finally:
+        history.close()
@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from agents import Runner
+from openai.types.responses import ResponseTextDeltaEvent
+
+# --- Configuración de la caché de respuestas del modelo ---
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados")
+LLM_CACHE_FILE_NAME = "llm_cache.sqlite"
+DEFAULT_LLM_CACHE_TTL = 7 * 24 * 3600          # Segundos que una respuesta sigue siendo válida
+DEFAULT_LLM_CACHE_MAX_BYTES = 50 * 1024 * 1024  # Tamaño máximo de las respuestas guardadas
+
+
+def model_name(model):
+    """Nombre del modelo de un agente, sea una cadena o una instancia de `agents.Model`."""
+    if model is None or isinstance(model, str):
+        return model or ""
+    return getattr(model, "model", None) or type(model).__name__
+
+
+class LLMCache:
+    """
+    Caché persistente de respuestas de los agentes en un archivo SQLite local.
+
+    La clave combina el nombre del modelo, las instrucciones del agente y el SHA-256 del
+    prompt, así que volver a ejecutar el analizador o el estratega sobre los mismos resultados
+    del rastreo no vuelve a llamar al modelo. Las entradas caducan a los `ttl` segundos y, si
+    el total supera `max_bytes`, se eliminan primero las usadas hace más tiempo.
+    """
+    def __init__(self, path, ttl=DEFAULT_LLM_CACHE_TTL, max_bytes=DEFAULT_LLM_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT, response TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_used_at REAL NOT NULL)"
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def make_key(model, instructions, prompt):
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        key_material = json.dumps([model, instructions or "", prompt_hash], ensure_ascii=False)
+        return hashlib.sha256(key_material.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Devuelve la respuesta guardada o None si no existe o ha caducado."""
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl is not None and now - row[1] > self.ttl:
+                with self._connection:
+                    self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            with self._connection:
+                self._connection.execute("UPDATE responses SET last_used_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key, response, model=None):
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, len(response.encode("utf-8")), now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        if self.ttl is not None:
+            self._connection.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        if self.max_bytes is None:
+            return
+        total_size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total_size <= self.max_bytes:
+            return
+        expired_keys = []
+        for key, size in self._connection.execute("SELECT key, size FROM responses ORDER BY last_used_at"):
+            if total_size <= self.max_bytes:
+                break
+            expired_keys.append((key,))
+            total_size -= size
+        self._connection.executemany("DELETE FROM responses WHERE key = ?", expired_keys)
+
+    def clear(self):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM responses")
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def get_default_llm_cache(results_dir=RESULTS_DIR):
+    """Caché de respuestas dentro de 'resultados'."""
+    return LLMCache(os.path.join(results_dir, LLM_CACHE_FILE_NAME))
+
+
+def agent_cache_key(agent, prompt):
+    return LLMCache.make_key(model_name(agent.model), agent.instructions, prompt)
+
+
+def run_agent_streamed_sync(agent, prompt, on_text):
+    """
+    Ejecuta un agente con `Runner.run_streamed` y pasa a `on_text` cada fragmento de texto de
+    la respuesta en cuanto llega.
+
+    Returns:
+        str: La respuesta final del agente.
+    """
+    async def stream():
+        result = Runner.run_streamed(agent, prompt)
+        async for event in result.stream_events():
+            if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
+                on_text(event.data.delta)
+        return result.final_output
+
+    return asyncio.run(stream())
+
+
+def run_agent_sync(agent, prompt, cache=None, on_text=None):
+    """
+    Ejecuta un agente con `Runner.run_sync`, reutilizando la respuesta de la caché si la hay.
+
+    Con `on_text`, la respuesta se pide en streaming (ver `run_agent_streamed_sync`); una
+    respuesta de la caché llega entera en un único fragmento.
+
+    Returns:
+        str: La respuesta final del agente.
+    """
+    def run():
+        if on_text is None:
+            return Runner.run_sync(agent, prompt).final_output
+        return run_agent_streamed_sync(agent, prompt, on_text)
+
+    if cache is None:
+        return run()
+
+    key = agent_cache_key(agent, prompt)
+    cached_output = cache.get(key)
+    if cached_output is not None:
+        print(f"♻️ Respuesta de '{agent.name}' recuperada de la caché local (sin llamar al modelo).")
+        if on_text is not None:
+            on_text(cached_output)
+        return cached_output
+    output = run()
+    cache.set(key, output, model_name(agent.model))
+    return output
@@ -1,79 +1,236 @@
-import subprocess
+import argparse
+import queue
 import sys
 import os
-
-# --- Configuración ---
-# Define la ruta al script 'crawler.py'.
-# Ajusta esta ruta si 'crawler.py' no está en el mismo directorio que 'master.py'.
-CRAWLER_SCRIPT_PATH = os.path.join(os.path.dirname(__file__), 'crawler.py') # Asume que crawler.py está en el mismo directorio
+import threading
 
 # Añade el directorio actual al sys.path para permitir importaciones locales
 # Esto es útil si 'strategist.py' y 'seo_utils.py' están en el mismo directorio que 'master.py'
-sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 try:
+    from crawler import crawl_site, RESULTS_DIR
+    from analyzer import generate_technical_seo_report
     from strategist import SEOStrategist
+    from link_graph import attach_link_metrics
+    from link_checker import attach_link_status
+    from near_duplicates import attach_duplicate_cluster
 except ImportError as e:
-    print(f"Error al importar la clase SEOStrategist de strategist.py: {e}")
-    print("Asegúrate de que 'strategist.py' esté en el mismo directorio o en el PYTHONPATH.")
+    print(f"Error al importar los módulos del pipeline SEO (crawler, analyzer, strategist): {e}")
+    print("Asegúrate de que 'crawler.py', 'analyzer.py' y 'strategist.py' estén en el mismo directorio o en el PYTHONPATH.")
     sys.exit(1)
 
-def run_full_seo_process():
+_CRAWL_DONE = object() # Marca el final del rastreo en la cola de resultados
+
+
+class SEOPipeline:
+    """
+    Ejecuta el proceso SEO completo (rastreo -> informe técnico -> plan estratégico) en el
+    mismo proceso, sin lanzar 'crawler.py' como subproceso.
+
+    Los resultados de cada etapa se pasan en memoria a la siguiente y el progreso se notifica
+    con eventos (diccionarios) a `on_event`, p. ej.:
+        {"stage": "crawl", "type": "page", "url": ..., "count": 3}
+        {"stage": "report", "type": "finished", "length": 5120}
+    Cada etapa emite "started" y "finished" (o "error" con el mensaje si falla). Con
+    `stream_output`, el informe y el plan se emiten además por fragmentos según los genera el
+    modelo ({"stage": "plan", "type": "delta", "text": ...}).
+
+    Args:
+        results_dir (str): Directorio de resultados del rastreo y de la caché del modelo.
+        on_event (callable, optional): Recibe los eventos de progreso.
+        use_cache (bool): Reutiliza las respuestas guardadas del analizador y del estratega.
+        model (str or agents.Model, optional): Modelo del analizador y del estratega (p. ej. un
+            modelo local de pruebas); por defecto, el de cada agente.
+        stream_output (bool): Emite los fragmentos del informe y del plan según se generan.
+    """
+    def __init__(self, results_dir=RESULTS_DIR, on_event=None, use_cache=True, model=None, stream_output=False):
+        self.results_dir = results_dir
+        self.on_event = on_event
+        self.use_cache = use_cache
+        self.model = model
+        self.stream_output = stream_output
+        self.last_crawl_summary = None
+
+    def _emit(self, stage, event_type, **data):
+        if self.on_event:
+            self.on_event(dict(data, stage=stage, type=event_type))
+
+    def iter_crawl(self, url, **crawl_options):
+        """
+        Rastrea el sitio y devuelve cada `analysis_results` en cuanto su página termina.
+
+        El rastreo corre en un hilo aparte; si falla, la excepción se relanza aquí. Al terminar,
+        el resumen de `crawl_site` queda en `last_crawl_summary`. Las métricas del grafo de
+        enlaces ("link_metrics") solo se conocen al final, así que las páginas que se devuelven
+        aquí no las incluyen (`crawl` sí las añade).
+
+        Args:
+            url (str): URL principal a rastrear.
+            **crawl_options: Opciones de `crawler.crawl_site` (max_pages, concurrency, resume...).
+        Yields:
+            dict: El `analysis_results` de cada página.
+        """
+        results_queue = queue.Queue()
+        outcome = {}
+
+        def crawl():
+            try:
+                outcome["summary"] = crawl_site(url, results_dir=self.results_dir, on_result=results_queue.put,
+                                                **crawl_options)
+            except BaseException as e:
+                outcome["error"] = e
+            finally:
+                results_queue.put(_CRAWL_DONE)
+
+        self.last_crawl_summary = None
+        self._emit("crawl", "started", url=url)
+        crawl_thread = threading.Thread(target=crawl, name="seo-crawl", daemon=True)
+        crawl_thread.start()
+        count = 0
+        while True:
+            analysis_results = results_queue.get()
+            if analysis_results is _CRAWL_DONE:
+                break
+            count += 1
+            self._emit("crawl", "page", url=analysis_results.get("url"), count=count)
+            yield analysis_results
+        crawl_thread.join()
+
+        if "error" in outcome:
+            self._emit("crawl", "error", error=str(outcome["error"]))
+            raise outcome["error"]
+        self.last_crawl_summary = outcome["summary"]
+        self._emit("crawl", "finished", analyzed_count=self.last_crawl_summary["analyzed_count"],
+                   interrupted=self.last_crawl_summary["interrupted"])
+
+    def crawl(self, url, **crawl_options):
+        """
+        Rastrea el sitio completo.
+
+        Returns:
+            list: Los `analysis_results` de las páginas rastreadas, con sus métricas del grafo de
+                enlaces, su grupo de casi duplicados (y sus enlaces rotos y con redirección si se rastrea con check_links=True).
+        """
+        analysis_results = list(self.iter_crawl(url, **crawl_options))
+        link_metrics = self.last_crawl_summary["link_metrics"]
+        link_statuses = self.last_crawl_summary["link_statuses"]
+        url_normalizer = self.last_crawl_summary["url_normalizer"]
+        duplicate_clusters = self.last_crawl_summary["duplicate_clusters"]
+        for page in analysis_results:
+            attach_link_metrics(page, link_metrics)
+            attach_duplicate_cluster(page, duplicate_clusters)
+            if link_statuses is not None:
+                attach_link_status(page, link_statuses, url_normalizer)
+        return analysis_results
+
+    def report(self, analysis_results=None, robots_entries=None, reused_urls=None, **report_options):
+        """
+        Genera el informe SEO técnico a partir de los resultados en memoria (o, si no se
+        indican, de los guardados en `results_dir`).
+
+        Args:
+            **report_options: Opciones de `analyzer.generate_technical_seo_report`
+                (only_changed, token_budget, map_reduce, batch_size...).
+        Returns:
+            str: El informe en Markdown.
+        """
+        report_options.setdefault("use_cache", self.use_cache)
+        report_options.setdefault("stream_output", self.stream_output)
+        if self.model is not None:
+            report_options.setdefault("model", self.model)
+        try:
+            return generate_technical_seo_report(results_dir=self.results_dir, analysis_results=analysis_results,
+                                                 robots_entries=robots_entries, reused_urls=reused_urls,
+                                                 on_event=self.on_event, **report_options)
+        except Exception as e:
+            self._emit("report", "error", error=str(e))
+            raise
+
+    def plan(self, report):
+        """
+        Genera el plan de acción estratégico a partir del informe técnico.
+
+        Returns:
+            str: El plan en Markdown.
+        """
+        plan_options = {"model": self.model} if self.model is not None else {}
+        try:
+            return SEOStrategist().generate_strategic_plan(analyzer_report=report, use_cache=self.use_cache,
+                                                           results_dir=self.results_dir, on_event=self.on_event,
+                                                           stream_output=self.stream_output, **plan_options)
+        except Exception as e:
+            self._emit("plan", "error", error=str(e))
+            raise
+
+    def run(self, url, crawl_options=None, report_options=None):
+        """
+        Ejecuta las tres etapas seguidas.
+
+        Returns:
+            dict: {"results": list de analysis_results, "report": str, "plan": str}.
+        """
+        analysis_results = self.crawl(url, **(crawl_options or {}))
+        summary = self.last_crawl_summary
+        report = self.report(analysis_results, robots_entries=summary["robots_entries"],
+                             reused_urls=summary["reused_urls"], **(report_options or {}))
+        plan = self.plan(report)
+        return {"results": analysis_results, "report": report, "plan": plan}
+
+
+def print_progress_event(event):
+    """Muestra por consola los eventos de progreso del pipeline."""
+    if event["type"] == "delta":
+        sys.stdout.write(event["text"])
+        sys.stdout.flush()
+    elif event["type"] == "page":
+        print(f"   [{event['stage']}] página {event['count']}: {event['url']}")
+    elif event["type"] == "error":
+        print(f"❌ [{event['stage']}] {event['error']}")
+    else:
+        details = ", ".join(f"{key}={value}" for key, value in event.items() if key not in ("stage", "type"))
+        print(f"--- [{event['stage']}] {event['type']}{' (' + details + ')' if details else ''} ---")
+
+
+def run_full_seo_process(target_url=None, max_pages=None, use_cache=True):
     """
     Orquesta el proceso completo de SEO: rastreo y generación de plan estratégico.
     """
-    # 1. Solicitar la URL al usuario
-    target_url = input("Por favor, introduce la URL principal que deseas rastrear (ej: https://www.python.org): ")
+    # 1. Solicitar la URL al usuario si no se ha indicado
+    if not target_url:
+        target_url = input("Por favor, introduce la URL principal que deseas rastrear (ej: https://www.python.org): ")
 
     if not target_url:
         print("No se proporcionó ninguna URL. Saliendo.")
         sys.exit(0) # Salida limpia si no hay URL
 
-    # 2. Ejecutar crawler.py
-    print(f"\n🚀 Iniciando la ejecución de {CRAWLER_SCRIPT_PATH} con la URL: {target_url}...")
-
-    if not os.path.exists(CRAWLER_SCRIPT_PATH):
-        print(f"Error: No se encontró el archivo '{CRAWLER_SCRIPT_PATH}'.")
-        print("Asegúrate de que la ruta al script 'crawler.py' sea correcta.")
-        sys.exit(1)
-
+    # 2. Rastreo, informe y plan en el mismo proceso
+    print(f"\n🚀 Iniciando el proceso SEO completo con la URL: {target_url}...")
+    crawl_options = {} if max_pages is None else {"max_pages": max_pages}
+    pipeline = SEOPipeline(on_event=print_progress_event, use_cache=use_cache)
     try:
-        # Ejecutar crawler.py pasando la URL como un argumento de línea de comandos
-        crawler_result = subprocess.run(
-            [sys.executable, CRAWLER_SCRIPT_PATH, target_url], # Pasa target_url como argumento
-            capture_output=True,  # Captura stdout y stderr
-            text=True,            # Decodifica la salida como texto
-            check=True            # Lanza una CalledProcessError si el comando devuelve un código de salida distinto de cero
-        )
-        print("\n--- Salida de crawler.py (stdout) ---")
-        print(crawler_result.stdout)
-        if crawler_result.stderr:
-            print("\n--- Errores de crawler.py (stderr) ---")
-            print(crawler_result.stderr)
-        print("✅ Ejecución de crawler.py finalizada exitosamente.")
-
-        # 3. Una vez que crawler.py ha terminado exitosamente, instanciar y ejecutar el estratega
-        print("\n--- Iniciando la generación del plan estratégico SEO ---")
-        strategist_instance = SEOStrategist()
-        strategic_plan = strategist_instance.generate_strategic_plan()
-        
-        if strategic_plan:
-            print("\n--- Plan Estratégico SEO Final ---")
-            print(strategic_plan)
-            print("\n--- Fin del Plan Estratégico SEO ---")
-        else:
-            print("❌ No se pudo generar el plan estratégico SEO.")
-
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Error al ejecutar crawler.py: El script terminó con un error (código de salida {e.returncode}).")
-        print(f"Salida estándar:\n{e.stdout}")
-        print(f"Salida de error:\n{e.stderr}")
-    except FileNotFoundError:
-        print(f"❌ Error: El comando '{sys.executable}' (intérprete de Python) no se encontró.")
-        print("Asegúrate de que Python esté correctamente instalado y accesible en tu PATH.")
+        outcome = pipeline.run(target_url, crawl_options=crawl_options)
     except Exception as e:
         print(f"❌ Ocurrió un error inesperado durante el proceso: {e}")
+        return None
+
+    strategic_plan = outcome["plan"]
+    if strategic_plan:
+        print("\n--- Plan Estratégico SEO Final ---")
+        print(strategic_plan)
+        print("\n--- Fin del Plan Estratégico SEO ---")
+    else:
+        print("❌ No se pudo generar el plan estratégico SEO.")
+    return outcome
+
 
 if __name__ == "__main__":
-    run_full_seo_process()
+    parser = argparse.ArgumentParser(description="Rastrea un sitio y genera su informe técnico y su plan de acción SEO.")
+    parser.add_argument("url", nargs="?", help="URL principal a rastrear (si no se indica, se pide por consola)")
+    parser.add_argument("--max-pages", type=int, default=None, help="Número máximo de páginas a rastrear")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Llama siempre al modelo, sin reutilizar respuestas de la caché local")
+    args = parser.parse_args()
+
+    run_full_seo_process(args.url, max_pages=args.max_pages, use_cache=not args.no_cache)
     print("\nProceso de master.py finalizado.")
@@ -0,0 +1,193 @@
+import argparse
+import hashlib
+import os
+import re
+import time
+
+# --- Configuración de la detección de contenido casi duplicado ---
+SIMHASH_BITS = 64
+SHINGLE_SIZE = 3                 # Palabras por fragmento (shingle) del texto
+DUPLICATE_MAX_DISTANCE = 3       # Bits distintos como máximo entre dos huellas casi duplicadas (≈95 % de similitud)
+LSH_BANDS = DUPLICATE_MAX_DISTANCE + 1  # Con d bits distintos, al menos una de d + 1 bandas coincide entera
+LSH_BAND_BITS = SIMHASH_BITS // LSH_BANDS
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def content_words(text):
+    """Palabras del texto en minúsculas, sin signos de puntuación."""
+    return _WORD_PATTERN.findall(text.lower())
+
+
+def simhash(words, shingle_size=SHINGLE_SIZE):
+    """
+    Huella SimHash de 64 bits de una lista de palabras.
+
+    Cada fragmento de `shingle_size` palabras consecutivas aporta su hash (BLAKE2b de 64 bits)
+    y cada bit de la huella es el valor mayoritario de ese bit entre todos los fragmentos, así
+    que dos textos que comparten la mayoría de sus fragmentos tienen huellas que difieren en
+    muy pocos bits.
+
+    Returns:
+        int or None: La huella, o None si no hay palabras.
+    """
+    if not words:
+        return None
+    shingles = {" ".join(words[index:index + shingle_size]) for index in range(max(1, len(words) - shingle_size + 1))}
+    # Cada hash como cadena de 64 bits: las columnas de zip() son los valores de un mismo bit
+    bit_strings = [f"{int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big'):064b}"
+                   for shingle in shingles]
+    majority = len(bit_strings) / 2
+    return int("".join("1" if column.count("1") > majority else "0" for column in zip(*bit_strings)), 2)
+
+
+def content_fingerprint(text):
+    """
+    Huella y número de palabras del texto principal de una página.
+
+    Returns:
+        tuple: (huella SimHash en hexadecimal o None si no hay texto, número de palabras).
+    """
+    words = content_words(text)
+    fingerprint = simhash(words)
+    return (f"{fingerprint:016x}" if fingerprint is not None else None), len(words)
+
+
+def hamming_distance(first, second):
+    return (first ^ second).bit_count()
+
+
+class DuplicateIndex:
+    """
+    Agrupa páginas casi duplicadas a partir de sus huellas SimHash sin compararlas todas
+    entre sí.
+
+    Las páginas con la misma huella se agrupan directamente. Para las huellas distintas se usa
+    un índice LSH: la huella se parte en `LSH_BANDS` bandas y solo se comparan las huellas que
+    coinciden en alguna banda entera; por el principio del palomar, dos huellas a
+    `DUPLICATE_MAX_DISTANCE` bits o menos siempre coinciden en al menos una. Dentro de cada
+    cubeta cada huella se compara con el representante de cada grupo ya formado (no con todas
+    las demás), así que el coste es casi lineal también cuando una plantilla genera miles de
+    páginas parecidas.
+    """
+    def __init__(self, max_distance=DUPLICATE_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self._urls_by_fingerprint = {}   # huella -> URLs con esa huella
+
+    def add(self, url, fingerprint):
+        """Añade una página con su huella (entera o en hexadecimal); se ignoran las que no tienen."""
+        if fingerprint is None:
+            return
+        if isinstance(fingerprint, str):
+            fingerprint = int(fingerprint, 16)
+        self._urls_by_fingerprint.setdefault(fingerprint, []).append(url)
+
+    def clusters(self):
+        """
+        Grupos de páginas casi duplicadas.
+
+        Returns:
+            dict: URL -> {"id" (del grupo, empezando en 1 por el más grande), "size" (páginas
+                del grupo), "similarity" (1 - bits distintos / 64 respecto al representante)
+                y "representative" (URL representativa del grupo)}, solo de las páginas que
+                tienen algún casi duplicado.
+        """
+        fingerprints = list(self._urls_by_fingerprint)
+        parents = list(range(len(fingerprints)))
+
+        def find(index):
+            while parents[index] != index:
+                parents[index] = parents[parents[index]]
+                index = parents[index]
+            return index
+
+        band_mask = (1 << LSH_BAND_BITS) - 1
+        for band in range(LSH_BANDS):
+            buckets = {}
+            for index, fingerprint in enumerate(fingerprints):
+                buckets.setdefault((fingerprint >> (band * LSH_BAND_BITS)) & band_mask, []).append(index)
+            for members in buckets.values():
+                if len(members) < 2:
+                    continue
+                leaders = []
+                for index in members:
+                    for leader in leaders:
+                        if hamming_distance(fingerprints[index], fingerprints[leader]) <= self.max_distance:
+                            parents[find(index)] = find(leader)
+                            break
+                    else:
+                        leaders.append(index)
+
+        groups = {}
+        for index in range(len(fingerprints)):
+            groups.setdefault(find(index), []).append(index)
+        groups = [members for members in groups.values()
+                  if sum(len(self._urls_by_fingerprint[fingerprints[index]]) for index in members) > 1]
+        groups.sort(key=lambda members: -sum(len(self._urls_by_fingerprint[fingerprints[index]]) for index in members))
+
+        result = {}
+        for cluster_id, members in enumerate(groups, start=1):
+            # Representante: la huella que comparten más páginas
+            leader = max(members, key=lambda index: len(self._urls_by_fingerprint[fingerprints[index]]))
+            representative = self._urls_by_fingerprint[fingerprints[leader]][0]
+            size = sum(len(self._urls_by_fingerprint[fingerprints[index]]) for index in members)
+            for index in members:
+                similarity = 1 - hamming_distance(fingerprints[index], fingerprints[leader]) / SIMHASH_BITS
+                for url in self._urls_by_fingerprint[fingerprints[index]]:
+                    result[url] = {"id": cluster_id, "size": size, "similarity": round(similarity, 3),
+                                   "representative": representative}
+        return result
+
+
+def find_duplicate_clusters(pages):
+    """
+    Grupos de casi duplicados de un conjunto de páginas (ver `DuplicateIndex.clusters`).
+
+    Args:
+        pages (iterable): Los `analysis_results` de las páginas, con su "content_fingerprint".
+    """
+    index = DuplicateIndex()
+    for page in pages:
+        index.add(page.get("url"), page.get("content_fingerprint"))
+    return index.clusters()
+
+
+def attach_duplicate_cluster(analysis_results, clusters):
+    """Añade a una página su grupo de casi duplicados ("duplicate_cluster"; None si no tiene)."""
+    analysis_results["duplicate_cluster"] = clusters.get(analysis_results.get("url"))
+    return analysis_results
+
+
+def summarize_clusters(clusters, max_clusters=10):
+    """
+    Resumen de los grupos de casi duplicados.
+
+    Returns:
+        dict: "pages" (páginas con algún casi duplicado), "clusters" (número de grupos) y
+            "largest" (los `max_clusters` grupos más grandes con su representante y tamaño).
+    """
+    largest = {}
+    for cluster in clusters.values():
+        largest.setdefault(cluster["id"], {"id": cluster["id"], "size": cluster["size"],
+                                           "representative": cluster["representative"]})
+    ordered = sorted(largest.values(), key=lambda cluster: cluster["id"])
+    return {"pages": len(clusters), "clusters": len(ordered), "largest": ordered[:max_clusters]}
+
+
+if __name__ == "__main__":
+    from crawler import RESULTS_DIR
+    from results_io import iter_analysis_results, NDJSON_FILE_NAME
+
+    parser = argparse.ArgumentParser(description="Agrupa las páginas rastreadas con contenido casi duplicado.")
+    parser.add_argument("source", nargs="?", default=os.path.join(RESULTS_DIR, NDJSON_FILE_NAME), help="Archivo NDJSON de entrada")
+    parser.add_argument("--max-clusters", type=int, default=20, help="Grupos que se muestran")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    clusters = find_duplicate_clusters(iter_analysis_results(args.source))
+    elapsed = time.perf_counter() - start_time
+    summary = summarize_clusters(clusters, args.max_clusters)
+    print(f"{summary['pages']} páginas en {summary['clusters']} grupos de contenido casi duplicado "
+          f"(calculado en {elapsed:.2f} s):")
+    for cluster in summary["largest"]:
+        print(f"   #{cluster['id']:<4} {cluster['size']:>5} páginas, como {cluster['representative']}")
@@ -0,0 +1,228 @@
+import argparse
+import gzip
+import hashlib
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from fetcher import decode_body
+
+try:
+    import zstandard # Opcional: compresión más rápida y compacta que gzip
+except ImportError:
+    zstandard = None
+
+# --- Configuración del archivo de páginas ---
+INDEX_FILE_NAME = "index.sqlite"
+OBJECTS_DIR_NAME = "objects"
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def hash_content(content):
+    """Identificador del contenido: SHA-256 de los bytes tal y como llegaron del servidor."""
+    return hashlib.sha256(content).hexdigest()
+
+
+class PageArchive:
+    """
+    Archivo de páginas direccionado por contenido.
+
+    Cada cuerpo HTML se guarda una sola vez, comprimido (zstd si está instalado `zstandard`,
+    gzip si no), con su hash SHA-256 como nombre. Un índice SQLite registra qué hash tenía
+    cada URL en cada rastreo, así que las páginas que no cambian entre ejecuciones no ocupan
+    más espacio y las URLs largas nunca se pisan entre sí.
+
+    La conexión al índice se abre bajo demanda y no se serializa, de modo que la instancia
+    puede enviarse a los procesos del pool de parseo.
+    """
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+        self.objects_dir = os.path.join(root_dir, OBJECTS_DIR_NAME)
+        self.index_path = os.path.join(root_dir, INDEX_FILE_NAME)
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {"root_dir": self.root_dir}
+
+    def __setstate__(self, state):
+        self.__init__(state["root_dir"])
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(self.root_dir, exist_ok=True)
+            self._connection = sqlite3.connect(self.index_path, timeout=30, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "url TEXT NOT NULL, sha256 TEXT NOT NULL, encoding TEXT, crawled_at REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS idx_pages_url ON pages (url, crawled_at)")
+            self._connection.commit()
+        return self._connection
+
+    # --- Objetos ---
+
+    def object_path(self, sha256):
+        """Ruta del objeto comprimido para un hash (la existente o la que tendría con la compresión disponible)."""
+        existing_path = self._existing_object_path(sha256)
+        if existing_path:
+            return existing_path
+        extension = ".html.zst" if zstandard else ".html.gz"
+        return os.path.join(self.objects_dir, sha256[:2], sha256 + extension)
+
+    def _existing_object_path(self, sha256):
+        for extension in (".html.zst", ".html.gz"):
+            path = os.path.join(self.objects_dir, sha256[:2], sha256 + extension)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def store(self, content):
+        """
+        Guarda un cuerpo HTML si aún no está en el archivo.
+
+        Returns:
+            str: El SHA-256 del contenido.
+        """
+        sha256 = hash_content(content)
+        if self._existing_object_path(sha256):
+            return sha256
+
+        path = self.object_path(sha256)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if zstandard:
+            compressed = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(content)
+        else:
+            compressed = gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0)
+
+        # Escritura atómica: varios procesos pueden intentar guardar la misma página a la vez
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, 'wb') as f:
+            f.write(compressed)
+        os.replace(tmp_path, path)
+        return sha256
+
+    def load(self, sha256):
+        """Devuelve los bytes originales de un objeto del archivo."""
+        path = self._existing_object_path(sha256)
+        if path is None:
+            raise FileNotFoundError(f"No existe el objeto '{sha256}' en '{self.objects_dir}'")
+        with open(path, 'rb') as f:
+            compressed = f.read()
+        if path.endswith(".zst"):
+            if zstandard is None:
+                raise RuntimeError("El objeto está comprimido con zstd; instala 'zstandard' para leerlo.")
+            return zstandard.ZstdDecompressor().decompress(compressed)
+        return gzip.decompress(compressed)
+
+    # --- Índice ---
+
+    def record(self, url, sha256, encoding=None, crawled_at=None):
+        """Anota en el índice que `url` tenía el contenido `sha256` en este rastreo."""
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT INTO pages (url, sha256, encoding, crawled_at) VALUES (?, ?, ?, ?)",
+                (url, sha256, encoding, crawled_at if crawled_at is not None else time.time()),
+            )
+            connection.commit()
+
+    def store_page(self, url, content, encoding=None):
+        """Guarda el cuerpo de una página y lo registra en el índice. Devuelve su SHA-256."""
+        sha256 = self.store(content)
+        self.record(url, sha256, encoding)
+        return sha256
+
+    def latest(self, url):
+        """
+        Última versión archivada de una URL.
+
+        Returns:
+            dict or None: {"url", "sha256", "encoding", "crawled_at"} o None si no está archivada.
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT url, sha256, encoding, crawled_at FROM pages WHERE url = ? ORDER BY crawled_at DESC LIMIT 1",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"url": row[0], "sha256": row[1], "encoding": row[2], "crawled_at": row[3]}
+
+    def entries(self, url_contains=None):
+        """Itera las entradas del índice, de la más reciente a la más antigua."""
+        query = "SELECT url, sha256, encoding, crawled_at FROM pages"
+        params = ()
+        if url_contains:
+            query += " WHERE url LIKE ?"
+            params = (f"%{url_contains}%",)
+        with self._lock:
+            rows = self._connect().execute(query + " ORDER BY crawled_at DESC", params).fetchall()
+        for row in rows:
+            yield {"url": row[0], "sha256": row[1], "encoding": row[2], "crawled_at": row[3]}
+
+    def load_html(self, url_or_sha256):
+        """Devuelve el HTML (decodificado) de una URL archivada o de un hash concreto."""
+        entry = self.latest(url_or_sha256)
+        if entry is None:
+            return decode_body(self.load(url_or_sha256))
+        return decode_body(self.load(entry["sha256"]), entry["encoding"])
+
+    def prettify(self, url_or_sha256):
+        """Genera bajo demanda la versión prettificada de una página archivada."""
+        from bs4 import BeautifulSoup
+        return BeautifulSoup(self.load_html(url_or_sha256), 'html.parser').prettify()
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def main(argv=None):
+    from crawler import RESULTS_DIR, ARCHIVE_DIR_NAME
+
+    parser = argparse.ArgumentParser(description="Consulta el archivo de páginas HTML rastreadas.")
+    parser.add_argument("--archive-dir", default=os.path.join(RESULTS_DIR, ARCHIVE_DIR_NAME),
+                        help="Directorio del archivo de páginas")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    list_parser = subparsers.add_parser("list", help="Lista las páginas archivadas")
+    list_parser.add_argument("--url-contains", help="Filtra por un fragmento de la URL")
+    show_parser = subparsers.add_parser("show", help="Muestra el HTML original de una URL o hash")
+    show_parser.add_argument("target", help="URL o SHA-256")
+    prettify_parser = subparsers.add_parser("prettify", help="Genera el HTML prettificado de una URL o hash")
+    prettify_parser.add_argument("target", help="URL o SHA-256")
+    prettify_parser.add_argument("-o", "--output", help="Archivo de salida (por defecto, la salida estándar)")
+    args = parser.parse_args(argv)
+
+    archive = PageArchive(args.archive_dir)
+    try:
+        if args.command == "list":
+            for entry in archive.entries(args.url_contains):
+                crawled_at = datetime.fromtimestamp(entry["crawled_at"]).isoformat(timespec="seconds")
+                print(f"{crawled_at}  {entry['sha256'][:12]}  {entry['url']}")
+        elif args.command == "show":
+            print(archive.load_html(args.target))
+        elif args.command == "prettify":
+            prettified = archive.prettify(args.target)
+            if args.output:
+                with open(args.output, 'w', encoding='utf-8') as f:
+                    f.write(prettified)
+                print(f"HTML parseado y prettificado guardado en: {args.output}")
+            else:
+                print(prettified)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        archive.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+import json
+from urllib.parse import urljoin
+
+from url_normalizer import URLNormalizer
+
+try:
+    import tiktoken # Opcional: recuento exacto de tokens del modelo
+except ImportError:
+    tiktoken = None
+
+# --- Configuración de la compactación del prompt ---
+DEFAULT_TOKEN_BUDGET = 30000     # Tokens máximos de los datos que se envían al agente
+DEFAULT_TOKEN_MODEL = "gpt-4o-mini"
+CHARS_PER_TOKEN = 4              # Estimación cuando no está instalado tiktoken
+MAX_ROBOTS_CHARS = 2000          # El robots.txt se incluye una vez por origen, recortado
+
+# Campos que no aportan nada al análisis SEO del agente (los tiempos internos del rastreo y la
+# lista completa de enlaces tampoco: los rotos y con redirección van aparte; ni la huella del
+# contenido, que se resume en "duplicate_cluster")
+EXCLUDED_FIELDS = frozenset(["html_sha256", "html_saved_original", "timings_ms", "outgoing_links",
+                             "content_fingerprint"])
+
+# Niveles de compactación, del más fiel al más agresivo:
+# (longitud máxima de textos, elementos máximos de listas, detalle por página, URLs por grupo)
+COMPACTION_LEVELS = (
+    (200, 20, True, None),
+    (120, 10, True, None),
+    (80, 5, True, None),
+    (60, 3, False, None),
+    (60, 3, False, 25),
+    (40, 2, False, 5),
+)
+
+TITLE_MAX_LENGTH = 60
+META_DESCRIPTION_MAX_LENGTH = 160
+SLOW_TTFB_MS = 800               # Tiempo hasta el primer byte a partir del cual la respuesta es lenta
+MIN_COMPRESSIBLE_BYTES = 1400    # HTML más pequeño que esto no gana nada comprimido
+MAX_CLICK_DEPTH = 3              # Clics desde la URL inicial a partir de los que una página queda demasiado profunda
+THIN_CONTENT_WORDS = 200         # Palabras de texto principal por debajo de las que el contenido es escaso
+
+_encoding_cache = {}
+_default_url_normalizer = URLNormalizer() # La normalización por defecto del crawler
+
+
+def count_tokens(text, model=DEFAULT_TOKEN_MODEL):
+    """
+    Cuenta los tokens de un texto con tiktoken o, si no está instalado, los estima (≈4 caracteres por token).
+    """
+    if tiktoken is not None:
+        encoding = _encoding_cache.get(model)
+        if encoding is None:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoding = tiktoken.get_encoding("o200k_base")
+            _encoding_cache[model] = encoding
+        return len(encoding.encode(text))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def points_to_itself(page, url_normalizer=None):
+    """
+    Indica si el canonical de una página apunta a la propia página.
+
+    El href se guarda tal como aparece en el HTML: se resuelve contra la URL de la página y
+    ambos lados pasan por el normalizador del rastreo (como en `CrawlEngine._canonical_target`),
+    así que "/ruta", mayúsculas en el host, el puerto por defecto o "?utm_source=..." no cuentan
+    como otra URL.
+    """
+    url_normalizer = url_normalizer or _default_url_normalizer
+    url = page.get("url") or ""
+    return url_normalizer(urljoin(url, page.get("canonical_url"))) == url_normalizer(url)
+
+
+def page_issue_signature(page, url_normalizer=None):
+    """
+    Problemas SEO detectables directamente en los datos de una página.
+
+    Args:
+        page (dict): Los `analysis_results` de la página.
+        url_normalizer (URLNormalizer, optional): El normalizador del rastreo, para comparar
+            el canonical con la URL; por defecto, el del crawler con sus opciones por defecto.
+    Returns:
+        tuple: Códigos de los problemas encontrados, en un orden estable.
+    """
+    issues = []
+    status = page.get("http_status")
+    if status is not None and status != 200:
+        issues.append(f"estado_http_{status}")
+    if page.get("redirect_chain"):
+        issues.append("redirecciones")
+    performance = page.get("performance") or {}
+    if (performance.get("ttfb_ms") or 0) > SLOW_TTFB_MS:
+        issues.append("ttfb_lento")
+    if (performance.get("content_bytes") or 0) > MIN_COMPRESSIBLE_BYTES and performance.get("compressed") is False:
+        issues.append("sin_compresion")
+    if performance.get("truncated"):
+        issues.append("html_demasiado_grande")
+
+    title = page.get("title")
+    if not title:
+        issues.append("sin_title")
+    elif len(title) > TITLE_MAX_LENGTH:
+        issues.append("title_largo")
+    meta_description = page.get("meta_description")
+    if not meta_description:
+        issues.append("sin_meta_description")
+    elif len(meta_description) > META_DESCRIPTION_MAX_LENGTH:
+        issues.append("meta_description_larga")
+    if "noindex" in (page.get("meta_robots") or "").lower():
+        issues.append("noindex")
+
+    h1_tags = page.get("h1_tags") or []
+    if not h1_tags:
+        issues.append("sin_h1")
+    elif len(h1_tags) > 1:
+        issues.append("varios_h1")
+
+    canonical_url = page.get("canonical_url")
+    if not canonical_url:
+        issues.append("sin_canonical")
+    elif not points_to_itself(page, url_normalizer):
+        issues.append("canonical_a_otra_url")
+
+    if not page.get("viewport"):
+        issues.append("sin_viewport")
+    elif not page.get("mobile_friendly_meta_tags"):
+        issues.append("viewport_no_movil")
+    if page.get("images_without_alt"):
+        issues.append("imagenes_sin_alt")
+    if page.get("duplicate_cluster"):
+        issues.append("contenido_duplicado")
+    word_count = page.get("word_count")
+    if word_count is not None and word_count < THIN_CONTENT_WORDS:
+        issues.append("contenido_escaso")
+
+    link_metrics = page.get("link_metrics") or {}
+    if link_metrics.get("orphan"):
+        issues.append("pagina_huerfana")
+    elif (link_metrics.get("click_depth") or 0) > MAX_CLICK_DEPTH:
+        issues.append("pagina_profunda")
+    if link_metrics.get("dead_end"):
+        issues.append("sin_enlaces_internos")
+    if page.get("broken_links"):
+        issues.append("enlaces_rotos")
+    if page.get("redirecting_links"):
+        issues.append("enlaces_con_redireccion")
+
+    structured_data = page.get("structured_data_scripts") or []
+    if not structured_data:
+        issues.append("sin_datos_estructurados")
+    elif any("error" in script for script in structured_data):
+        issues.append("json_ld_invalido")
+    return tuple(issues)
+
+
+def _truncate(value, max_text, max_items):
+    """Recorta textos largos y listas largas indicando cuánto se ha omitido."""
+    if isinstance(value, str):
+        return value if len(value) <= max_text else value[:max_text] + "…"
+    if isinstance(value, list):
+        items = [_truncate(item, max_text, max_items) for item in value[:max_items]]
+        if len(value) > max_items:
+            items.append(f"(+{len(value) - max_items} más)")
+        return items
+    if isinstance(value, dict):
+        return {key: _truncate(item, max_text, max_items) for key, item in value.items()}
+    return value
+
+
+def _site_wide_fields(pages):
+    """Campos con el mismo valor en todas las páginas (se indican una sola vez)."""
+    if len(pages) < 2:
+        return {}
+    candidates = {key: json.dumps(value, sort_keys=True) for key, value in pages[0].items()
+                  if key != "url" and key not in EXCLUDED_FIELDS}
+    for page in pages[1:]:
+        for key in list(candidates):
+            if json.dumps(page.get(key), sort_keys=True) != candidates[key]:
+                del candidates[key]
+    return {key: pages[0][key] for key in candidates}
+
+
+def _compact_page(page, site_fields, max_text, max_items):
+    compact = {}
+    for key, value in page.items():
+        if key in site_fields or key in EXCLUDED_FIELDS:
+            continue
+        if key == "final_url_after_redirects" and value == page.get("url"):
+            continue
+        if value in (None, [], {}, "") and key != "url":
+            continue
+        compact[key] = _truncate(value, max_text, max_items)
+    return compact
+
+
+def build_compact_payload(loaded_results, robots_entries=None, level=0):
+    """
+    Construye los datos compactos para el prompt con un nivel de compactación concreto.
+
+    Args:
+        loaded_results (list): Los `analysis_results` de las páginas.
+        robots_entries (dict, optional): origen -> {"status", "content"} del robots.txt.
+        level (int): Índice en `COMPACTION_LEVELS`.
+    Returns:
+        dict: {"total_pages", "site", "robots_txt", "groups"}.
+    """
+    max_text, max_items, page_details, max_pages_per_group = COMPACTION_LEVELS[level]
+    site_fields = _site_wide_fields(loaded_results)
+
+    groups = {}
+    for page in loaded_results:
+        groups.setdefault(page_issue_signature(page), []).append(page)
+
+    compact_groups = []
+    for issues, pages in sorted(groups.items(), key=lambda item: (-len(item[1]), item[0])):
+        shown_pages = pages if max_pages_per_group is None else pages[:max_pages_per_group]
+        if page_details:
+            page_entries = [_compact_page(page, site_fields, max_text, max_items) for page in shown_pages]
+        else:
+            page_entries = [page.get("url") for page in shown_pages]
+        group = {"issues": list(issues), "page_count": len(pages), "pages": page_entries}
+        if len(shown_pages) < len(pages):
+            group["omitted_pages"] = len(pages) - len(shown_pages)
+        compact_groups.append(group)
+
+    robots_txt = {origin: {"status": entry.get("status"),
+                           "content": _truncate(entry.get("content") or "", MAX_ROBOTS_CHARS, max_items)}
+                  for origin, entry in (robots_entries or {}).items()}
+    return {
+        "total_pages": len(loaded_results),
+        "site": _truncate(site_fields, max_text, max_items),
+        "robots_txt": robots_txt,
+        "groups": compact_groups,
+    }
+
+
+def compact_for_prompt(loaded_results, robots_entries=None, token_budget=DEFAULT_TOKEN_BUDGET, model=DEFAULT_TOKEN_MODEL):
+    """
+    Compacta los resultados del rastreo para que quepan en un presupuesto de tokens.
+
+    Prueba los niveles de `COMPACTION_LEVELS` de menos a más agresivo y se queda con el
+    primero que cabe (o con el último si ninguno cabe).
+
+    Returns:
+        tuple: (str con el JSON compacto, dict de estadísticas con "tokens_before",
+            "tokens_after", "level" y "within_budget").
+    """
+    original_text = (json.dumps(robots_entries or {}, indent=2, ensure_ascii=False)
+                     + json.dumps(loaded_results, indent=2, ensure_ascii=False))
+    tokens_before = count_tokens(original_text, model)
+
+    for level in range(len(COMPACTION_LEVELS)):
+        payload = build_compact_payload(loaded_results, robots_entries, level)
+        compact_text = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        tokens_after = count_tokens(compact_text, model)
+        if tokens_after <= token_budget:
+            break
+
+    return compact_text, {
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "level": level,
+        "within_budget": tokens_after <= token_budget,
+    }
@@ -0,0 +1,100 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from page_archive import hash_content
+
+
+class RecrawlState:
+    """
+    Estado por URL del último rastreo, para no volver a analizar páginas que no han cambiado.
+
+    Por cada URL guarda los validadores HTTP (ETag y Last-Modified), el SHA-256 del cuerpo, el
+    `analysis_results` y los enlaces internos encontrados. En el siguiente rastreo la descarga
+    se hace condicional y, si el servidor responde 304 o el cuerpo tiene el mismo hash, se
+    reutiliza el resultado anterior sin parsear la página.
+    """
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body_sha256 TEXT, "
+            "analysis_results TEXT NOT NULL, links TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._connection.commit()
+
+    def get(self, url):
+        """
+        Último estado guardado de una URL.
+
+        Returns:
+            dict or None: {"etag", "last_modified", "body_sha256", "analysis_results", "links"}.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT etag, last_modified, body_sha256, analysis_results, links FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"etag": row[0], "last_modified": row[1], "body_sha256": row[2],
+                "analysis_results": json.loads(row[3]), "links": json.loads(row[4])}
+
+    def conditional_headers(self, url):
+        """Cabeceras If-None-Match / If-Modified-Since para la descarga de una URL ya rastreada."""
+        with self._lock:
+            row = self._connection.execute("SELECT etag, last_modified FROM pages WHERE url = ?", (url,)).fetchone()
+        headers = {}
+        if row is not None:
+            if row[0]:
+                headers["If-None-Match"] = row[0]
+            if row[1]:
+                headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def reusable(self, url, fetch_result):
+        """
+        Comprueba si la página no ha cambiado desde el último rastreo.
+
+        Args:
+            url (str): La URL rastreada.
+            fetch_result (FetchResult): La descarga (condicional) de este rastreo.
+        Returns:
+            tuple or None: (analysis_results, found_internal_links) del rastreo anterior,
+                o None si la página es nueva o ha cambiado.
+        """
+        previous = self.get(url)
+        if previous is None:
+            return None
+        if fetch_result.status_code == 304:
+            return previous["analysis_results"], previous["links"]
+        if fetch_result.status_code == 200 and hash_content(fetch_result.content) == previous["body_sha256"]:
+            # Mismo contenido: se actualizan los validadores por si el servidor los ha cambiado
+            with self._lock, self._connection:
+                self._connection.execute(
+                    "UPDATE pages SET etag = ?, last_modified = ?, updated_at = ? WHERE url = ?",
+                    (fetch_result.headers.get("ETag"), fetch_result.headers.get("Last-Modified"), time.time(), url),
+                )
+            return previous["analysis_results"], previous["links"]
+        return None
+
+    def update(self, url, fetch_result, analysis_results, links):
+        """Guarda el resultado de una página recién analizada para el próximo rastreo."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, body_sha256, analysis_results, links, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, fetch_result.headers.get("ETag"), fetch_result.headers.get("Last-Modified"),
+                 hash_content(fetch_result.content), json.dumps(analysis_results, ensure_ascii=False),
+                 json.dumps(links), time.time()),
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
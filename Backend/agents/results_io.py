@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import threading
+
+# --- Nombres de los archivos de resultados ---
+NDJSON_FILE_NAME = "all_analysis_results.ndjson"   # Una línea JSON por página, escrita al terminar cada página
+JSON_FILE_NAME = "all_analysis_results.json"       # Array JSON clásico, generado a partir del NDJSON
+
+
+class NDJSONResultsWriter:
+    """
+    Escribe los resultados de análisis como NDJSON (un objeto JSON por línea).
+
+    Cada página se añade y se vuelca a disco en cuanto termina, de modo que la memoria no
+    crece con el tamaño del sitio y un fallo a mitad de rastreo conserva todo lo anterior.
+    Es seguro llamar a `write` desde varios hilos.
+    """
+    def __init__(self, path, append=False, fsync=False):
+        self.path = path
+        self.fsync = fsync
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = open(path, 'a' if append else 'w', encoding='utf-8')
+
+    def write(self, analysis_results):
+        line = json.dumps(analysis_results, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def iter_analysis_results(path):
+    """
+    Itera de forma perezosa los resultados de un archivo NDJSON.
+
+    Una última línea incompleta (p. ej. si el proceso murió mientras la escribía) se descarta
+    con un aviso en lugar de invalidar el archivo entero.
+
+    Yields:
+        dict: Los resultados de análisis de cada página.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Aviso: se ignora la línea {line_number} de '{path}' porque no es JSON válido.")
+
+
+def rewrite_ndjson(path, transform):
+    """
+    Reescribe un NDJSON aplicando `transform` a cada registro, en streaming.
+
+    Se escribe en un archivo temporal que sustituye al original al terminar, de modo que un
+    fallo a mitad no deja el NDJSON a medias.
+
+    Returns:
+        int: Número de páginas reescritas.
+    """
+    temporary_path = path + ".tmp"
+    count = 0
+    with NDJSONResultsWriter(temporary_path) as writer:
+        for analysis_results in iter_analysis_results(path):
+            writer.write(transform(analysis_results))
+            count += 1
+    os.replace(temporary_path, path)
+    return count
+
+
+def convert_ndjson_to_json(ndjson_path, json_path):
+    """
+    Genera el array JSON clásico (`json.dump(..., indent=4)`) a partir de un NDJSON.
+    Se escribe registro a registro, sin cargar todos los resultados en memoria.
+
+    Returns:
+        int: Número de páginas escritas.
+    """
+    count = 0
+    with open(json_path, 'w', encoding='utf-8') as f:
+        f.write("[")
+        for analysis_results in iter_analysis_results(ndjson_path):
+            f.write(",\n    " if count else "\n    ")
+            f.write(json.dumps(analysis_results, indent=4, ensure_ascii=False).replace("\n", "\n    "))
+            count += 1
+        f.write("\n]" if count else "]")
+    return count
+
+
+if __name__ == "__main__":
+    from crawler import RESULTS_DIR
+
+    parser = argparse.ArgumentParser(description="Convierte los resultados NDJSON del crawler al array JSON clásico.")
+    parser.add_argument("source", nargs="?", default=os.path.join(RESULTS_DIR, NDJSON_FILE_NAME), help="Archivo NDJSON de entrada")
+    parser.add_argument("target", nargs="?", default=os.path.join(RESULTS_DIR, JSON_FILE_NAME), help="Archivo JSON de salida")
+    args = parser.parse_args()
+
+    written = convert_ndjson_to_json(args.source, args.target)
+    print(f"Resultados de análisis de {written} páginas guardados en '{args.target}'.")
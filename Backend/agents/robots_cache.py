@@ -0,0 +1,306 @@
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import urlparse, urljoin
+
+import requests
+
+# --- Configuración de la caché de robots.txt ---
+ROBOTS_USER_AGENT = "*"            # Grupo de robots.txt que se aplica a nuestro crawler
+DEFAULT_ROBOTS_TTL = 24 * 60 * 60  # Segundos durante los que una entrada se considera fresca
+ROBOTS_ERROR_TTL = 5 * 60          # Segundos hasta reintentar un robots.txt que dio 5xx o error de red
+ROBOTS_TIMEOUT = 5
+
+
+def _compile_pattern(pattern):
+    """Convierte un patrón de robots.txt (con `*` y `$`) en una expresión regular anclada al inicio."""
+    anchored = pattern.endswith('$')
+    if anchored:
+        pattern = pattern[:-1]
+    regex = '.*'.join(re.escape(part) for part in pattern.split('*'))
+    return re.compile(regex + ('$' if anchored else ''))
+
+
+class RobotsRules:
+    """
+    Reglas de un robots.txt evaluadas según RFC 9309.
+
+    Se elige el grupo cuyo user-agent coincide con el nuestro (o `*` si no hay ninguno) y,
+    dentro del grupo, gana la regla Allow/Disallow más larga que coincida con la ruta;
+    en caso de empate gana Allow.
+    """
+    def __init__(self, content=""):
+        self.groups = []    # Lista de (set de user-agents, lista de reglas, crawl-delay)
+        self.sitemaps = []
+        self._parse(content or "")
+
+    def _parse(self, content):
+        agents, rules, crawl_delay = set(), [], None
+        collecting_agents = False
+        for raw_line in content.splitlines():
+            line = raw_line.split('#', 1)[0].strip()
+            if ':' not in line:
+                continue
+            key, value = line.split(':', 1)
+            key, value = key.strip().lower(), value.strip()
+
+            if key == 'sitemap':
+                if value:
+                    self.sitemaps.append(value)
+            elif key == 'user-agent':
+                if not collecting_agents and agents:
+                    self.groups.append((agents, rules, crawl_delay))
+                    agents, rules, crawl_delay = set(), [], None
+                agents.add(value.lower())
+                collecting_agents = True
+            elif key in ('allow', 'disallow'):
+                collecting_agents = False
+                if agents and value:
+                    rules.append((key == 'allow', value, _compile_pattern(value)))
+            elif key == 'crawl-delay':
+                collecting_agents = False
+                try:
+                    crawl_delay = float(value)
+                except ValueError:
+                    pass
+        if agents:
+            self.groups.append((agents, rules, crawl_delay))
+
+    def _matching_groups(self, user_agent):
+        token = (user_agent or '*').split('/')[0].lower()
+        specific = [group for group in self.groups if token != '*' and token in group[0]]
+        return specific or [group for group in self.groups if '*' in group[0]]
+
+    def can_fetch(self, url, user_agent=ROBOTS_USER_AGENT):
+        parsed = urlparse(url)
+        path = parsed.path or '/'
+        if parsed.query:
+            path += '?' + parsed.query
+
+        best_length, allowed = -1, True
+        for _, rules, _ in self._matching_groups(user_agent):
+            for is_allow, pattern, regex in rules:
+                if regex.match(path):
+                    length = len(pattern)
+                    if length > best_length or (length == best_length and is_allow):
+                        best_length, allowed = length, is_allow
+        return allowed
+
+    def crawl_delay(self, user_agent=ROBOTS_USER_AGENT):
+        delays = [delay for _, _, delay in self._matching_groups(user_agent) if delay is not None]
+        return max(delays) if delays else None
+
+
+class RobotsEntry:
+    """Un robots.txt descargado para un origen (esquema + host), con sus metadatos de caché."""
+    def __init__(self, origin, status=None, content=None, etag=None, last_modified=None, fetched_at=0.0):
+        self.origin = origin
+        self.status = status
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+        self.rules = self._build_rules()
+
+    def _build_rules(self):
+        if self.status == 200:
+            return RobotsRules(self.content)
+        if isinstance(self.status, int) and 400 <= self.status < 500:
+            return RobotsRules("")  # Sin robots.txt: todo permitido
+        # RFC 9309: un robots.txt inaccesible (5xx o error de red) implica no rastrear nada
+        return RobotsRules("User-agent: *\nDisallow: /")
+
+    @property
+    def failed(self):
+        """True si el robots.txt no se pudo obtener (5xx o error de red): es un fallo temporal."""
+        return not isinstance(self.status, int) or self.status >= 500
+
+    @property
+    def url(self):
+        return urljoin(self.origin, '/robots.txt')
+
+    @property
+    def sitemaps(self):
+        return self.rules.sitemaps
+
+    def can_fetch(self, url, user_agent=ROBOTS_USER_AGENT):
+        return self.rules.can_fetch(url, user_agent)
+
+    def crawl_delay(self, user_agent=ROBOTS_USER_AGENT):
+        return self.rules.crawl_delay(user_agent)
+
+    def to_dict(self):
+        return {
+            "origin": self.origin,
+            "url": self.url,
+            "status": self.status,
+            "content": self.content,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "fetched_at": self.fetched_at,
+            "sitemaps": self.sitemaps,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["origin"], data.get("status"), data.get("content"), data.get("etag"),
+                   data.get("last_modified"), data.get("fetched_at", 0.0))
+
+
+def get_origin(url):
+    """Devuelve el origen (`esquema://host`) de una URL."""
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+class RobotsCache:
+    """
+    Caché de robots.txt por origen.
+
+    Cada origen se descarga una sola vez por rastreo aunque lo pidan varios hilos a la vez.
+    Si se indica `cache_path`, las entradas se guardan en disco y en el siguiente rastreo se
+    reutilizan mientras no superen `ttl`; pasado ese tiempo se revalidan con
+    If-None-Match/If-Modified-Since, de modo que un 304 evita volver a descargar el archivo.
+
+    Un fallo al descargarlo (5xx o error de red) bloquea el origen, como pide RFC 9309, pero
+    solo durante `error_ttl` segundos: pasado ese tiempo se vuelve a pedir, también dentro del
+    mismo rastreo, y nunca se guarda en disco. Si había una copia válida en caché, se sigue
+    usando esa mientras tanto.
+    """
+    def __init__(self, cache_path=None, ttl=DEFAULT_ROBOTS_TTL, session=None, user_agent=ROBOTS_USER_AGENT,
+                 error_ttl=ROBOTS_ERROR_TTL):
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.session = session or requests.Session()
+        self.user_agent = user_agent
+        self._entries = {}
+        self._fresh_origins = set()   # Orígenes ya comprobados en este rastreo
+        self._retry_at = {}           # Origen cuya descarga falló -> instante a partir del que se reintenta
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                for data in json.load(f).values():
+                    entry = RobotsEntry.from_dict(data)
+                    self._entries[entry.origin] = entry
+        except (OSError, ValueError, KeyError) as e:
+            print(f"No se pudo leer la caché de robots.txt '{self.cache_path}': {e}")
+
+    def save(self):
+        """Persiste las entradas en `cache_path` (si se configuró)."""
+        if not self.cache_path:
+            return
+        with self._lock:
+            data = {origin: entry.to_dict() for origin, entry in self._entries.items() if not entry.failed}
+        with open(self.cache_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+
+    def entries(self):
+        """
+        Contenido de robots.txt de cada origen conocido (el mismo formato que lee el analizador).
+
+        Returns:
+            dict: origen -> {"status": ..., "content": ...}
+        """
+        with self._lock:
+            return {origin: {"status": entry.status, "content": entry.content} for origin, entry in self._entries.items()}
+
+    def _origin_lock(self, origin):
+        with self._lock:
+            return self._locks.setdefault(origin, threading.Lock())
+
+    def get(self, url_or_origin):
+        """
+        Devuelve la entrada de robots.txt del origen de la URL, descargándola si hace falta.
+
+        Returns:
+            RobotsEntry: La entrada compartida para ese origen.
+        """
+        origin = get_origin(url_or_origin)
+        if not self._needs_check(origin):
+            return self._entries[origin]
+
+        with self._origin_lock(origin):
+            if self._needs_check(origin):
+                cached = self._entries.get(origin)
+                ttl = self.error_ttl if cached is not None and cached.failed else self.ttl
+                if cached is None or time.time() - cached.fetched_at > ttl:
+                    self._entries[origin] = self._fetch(origin, cached)
+                if origin not in self._retry_at:
+                    self._fresh_origins.add(origin) # Los fallos no: se reintentan pasado `error_ttl`
+        return self._entries[origin]
+
+    def _needs_check(self, origin):
+        if origin in self._fresh_origins:
+            return False
+        return time.time() >= self._retry_at.get(origin, 0)
+
+    def _fetch(self, origin, cached=None):
+        robots_txt_url = urljoin(origin, '/robots.txt')
+        headers = {}
+        if cached is not None and cached.status == 200:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        try:
+            response = self.session.get(robots_txt_url, timeout=ROBOTS_TIMEOUT, headers=headers)
+        except requests.exceptions.RequestException as e:
+            print(f"Error al obtener robots.txt: {e}")
+            return self._failed_fetch(origin, f"Error: {e}", cached)
+
+        self._retry_at.pop(origin, None)
+        if response.status_code == 304 and cached is not None:
+            print(f"robots.txt de {origin} sin cambios (304), se reutiliza la copia en caché.")
+            cached.fetched_at = time.time()
+            return cached
+        if response.status_code >= 500:
+            print(f"robots.txt no disponible: {response.status_code}")
+            return self._failed_fetch(origin, response.status_code, cached)
+
+        if response.status_code != 200:
+            print(f"robots.txt no encontrado o error: {response.status_code}")
+        return RobotsEntry(
+            origin,
+            status=response.status_code,
+            content=response.text if response.status_code == 200 else None,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            fetched_at=time.time(),
+        )
+
+    def _failed_fetch(self, origin, status, cached=None):
+        """Entrada de un robots.txt que no se ha podido obtener; con una copia válida en caché se sigue usando esa."""
+        self._retry_at[origin] = time.time() + self.error_ttl
+        if cached is not None and not cached.failed:
+            print(f"Se reutiliza la copia en caché del robots.txt de {origin} hasta poder descargarlo.")
+            return cached
+        return RobotsEntry(origin, status=status, fetched_at=time.time())
+
+    def can_fetch(self, url):
+        return self.get(url).can_fetch(url, self.user_agent)
+
+    def crawl_delay(self, url_or_origin):
+        return self.get(url_or_origin).crawl_delay(self.user_agent)
+
+
+_default_robots_cache = None
+_default_robots_cache_lock = threading.Lock()
+
+
+def get_default_robots_cache():
+    """Devuelve una caché en memoria compartida para los llamadores que no inyectan la suya."""
+    global _default_robots_cache
+    with _default_robots_cache_lock:
+        if _default_robots_cache is None:
+            _default_robots_cache = RobotsCache()
+        return _default_robots_cache
@@ -0,0 +1,330 @@
+import argparse
+import itertools
+import json
+import os
+import time
+import xml.etree.ElementTree as ET
+import zlib
+from datetime import datetime, timezone
+from urllib.parse import urljoin
+
+import requests
+
+from fetcher import DEFAULT_TIMEOUT
+from robots_cache import get_origin
+
+# --- Configuración de la lectura de sitemaps ---
+DEFAULT_SITEMAP_MAX_URLS = 100000   # URLs como máximo que se leen de los sitemaps de un sitio
+SITEMAP_MAX_DEPTH = 3               # Niveles de sitemaps índice anidados que se siguen
+SITEMAP_READ_CHUNK = 64 * 1024      # Bytes que se pasan al parser XML en cada lectura
+LASTMOD_HALF_LIFE_DAYS = 30         # Días tras los que la prioridad por frescura se reduce a la mitad
+SITEMAP_REPORT_FILE_NAME = "sitemap_report.json"
+SITEMAP_REPORT_SAMPLE_SIZE = 50     # URLs de ejemplo de las categorías que solo se cuentan
+GZIP_MAGIC = b"\x1f\x8b"
+GZIP_WBITS = zlib.MAX_WBITS | 16  # Formato gzip (cabecera y CRC) para zlib
+
+
+def _local_name(tag):
+    """Nombre de una etiqueta sin su espacio de nombres ('{http://...}url' -> 'url')."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def parse_lastmod(value):
+    """
+    Interpreta un <lastmod> en formato W3C Datetime (2024, 2024-05, 2024-05-01,
+    2024-05-01T10:00:00Z, 2024-05-01T10:00:00+02:00...).
+
+    Returns:
+        float or None: Timestamp UTC, o None si el valor no es una fecha válida.
+    """
+    value = (value or "").strip()
+    if len(value) == 4:
+        value += "-01-01"
+    elif len(value) == 7:
+        value += "-01"
+    if value.endswith(("Z", "z")):
+        value = value[:-1] + "+00:00"
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def lastmod_priority(lastmod, now=None):
+    """
+    Prioridad en la cola de rastreo de una URL del sitemap según su <lastmod>.
+
+    Las URLs se encolan a profundidad 1, cuya prioridad por defecto es -1. Con <lastmod> la
+    prioridad sube hacia 0 cuanto más reciente es la página (se reduce a la mitad cada
+    `LASTMOD_HALF_LIFE_DAYS` días), así que las páginas modificadas hace poco se rastrean
+    antes que el resto del sitemap y que los enlaces del primer nivel.
+
+    Returns:
+        float: Prioridad en (-1, 0]; -1 si no hay <lastmod>.
+    """
+    if lastmod is None:
+        return -1.0
+    age_days = max(0.0, ((now or time.time()) - lastmod) / 86400)
+    return -1.0 + 0.5 ** (age_days / LASTMOD_HALF_LIFE_DAYS)
+
+
+class SitemapReader:
+    """
+    Lee sitemaps y sitemaps índice en streaming.
+
+    Cada sitemap se descarga con `stream=True` y se pasa por trozos a un parser XML
+    incremental (`XMLPullParser`); cada <url> se entrega en cuanto se cierra y después se
+    descarta del árbol, así que un sitemap de 50.000 URLs nunca está entero en memoria. Los
+    `.xml.gz` se descomprimen al vuelo tanto si el servidor los envía con
+    Content-Encoding: gzip como si los sirve tal cual (se detecta por la cabecera gzip).
+
+    Los sitemaps índice se siguen hasta `max_depth` niveles, cada sitemap se lee una sola vez
+    y la lectura se detiene al llegar a `max_urls` URLs. Los sitemaps que no se pueden leer
+    quedan en `errors` y no detienen la lectura de los demás.
+
+    Args:
+        session (requests.Session, optional): Sesión HTTP (p. ej. la del `Fetcher` del rastreo).
+        timeout (float): Segundos de espera de cada petición.
+        max_urls (int): URLs como máximo que se entregan.
+        max_depth (int): Niveles de sitemaps índice anidados que se siguen.
+    """
+    def __init__(self, session=None, timeout=DEFAULT_TIMEOUT, max_urls=DEFAULT_SITEMAP_MAX_URLS,
+                 max_depth=SITEMAP_MAX_DEPTH):
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.max_urls = max_urls
+        self.max_depth = max_depth
+        self.url_count = 0
+        self.sitemaps_read = []
+        self.errors = {}      # URL del sitemap -> error
+        self._visited = set()
+
+    def iter_urls(self, sitemap_urls):
+        """
+        Recorre las URLs de uno o varios sitemaps (o sitemaps índice).
+
+        Args:
+            sitemap_urls (str or list): URL o URLs de los sitemaps.
+        Yields:
+            tuple: (loc, lastmod) de cada <url>; lastmod es un timestamp UTC o None.
+        """
+        if isinstance(sitemap_urls, str):
+            sitemap_urls = [sitemap_urls]
+        for sitemap_url in sitemap_urls:
+            yield from self._iter_sitemap(sitemap_url, depth=0)
+
+    def _iter_sitemap(self, sitemap_url, depth):
+        if sitemap_url in self._visited or self.url_count >= self.max_urls:
+            return
+        self._visited.add(sitemap_url)
+        child_sitemaps = []
+        try:
+            with self.session.get(sitemap_url, timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+                for kind, loc, lastmod in self._parse(response):
+                    if kind == "sitemap":
+                        child_sitemaps.append(urljoin(sitemap_url, loc))
+                        continue
+                    self.url_count += 1
+                    yield urljoin(sitemap_url, loc), lastmod
+                    if self.url_count >= self.max_urls:
+                        print(f"Alcanzado el límite de {self.max_urls} URLs de los sitemaps.")
+                        break
+            self.sitemaps_read.append(sitemap_url)
+        except (requests.exceptions.RequestException, ET.ParseError, zlib.error) as e:
+            print(f"No se pudo leer el sitemap {sitemap_url}: {e}")
+            self.errors[sitemap_url] = str(e)
+
+        if child_sitemaps and depth >= self.max_depth:
+            print(f"Se ignoran {len(child_sitemaps)} sitemaps anidados en {sitemap_url}: demasiados niveles de índice.")
+            return
+        for child_url in child_sitemaps:
+            yield from self._iter_sitemap(child_url, depth + 1)
+
+    def _iter_body(self, response):
+        """
+        Cuerpo de la respuesta en trozos de como mucho `SITEMAP_READ_CHUNK` bytes de XML.
+
+        `iter_content` deshace el Content-Encoding (gzip, deflate); si además el propio
+        archivo es un .xml.gz, se descomprime aquí por trozos acotados, para que un trozo
+        muy comprimible no se convierta en megabytes de XML de golpe.
+        """
+        decompressor = None
+        for index, chunk in enumerate(response.iter_content(SITEMAP_READ_CHUNK)):
+            if index == 0 and chunk[:2] == GZIP_MAGIC:
+                decompressor = zlib.decompressobj(GZIP_WBITS)
+            if decompressor is None:
+                yield chunk
+                continue
+            while chunk:
+                yield decompressor.decompress(chunk, SITEMAP_READ_CHUNK)
+                chunk = decompressor.unconsumed_tail
+        if decompressor is not None:
+            yield decompressor.flush()
+
+    def _parse(self, response):
+        """
+        Parsea el cuerpo de un sitemap por trozos.
+
+        Yields:
+            tuple: ("url", loc, lastmod) por cada <url> y ("sitemap", loc, lastmod) por cada
+                <sitemap> de un índice.
+        """
+        parser = ET.XMLPullParser(events=("start", "end"))
+        root = None
+        for chunk in itertools.chain(self._iter_body(response), [None]):
+            if chunk is None:
+                parser.close()
+            else:
+                parser.feed(chunk)
+            for event, element in parser.read_events():
+                if event == "start":
+                    if root is None:
+                        root = element
+                    continue
+                kind = _local_name(element.tag)
+                if kind not in ("url", "sitemap") or element is root:
+                    continue
+                loc, lastmod = None, None
+                for child in element:
+                    name = _local_name(child.tag)
+                    if name == "loc":
+                        loc = (child.text or "").strip()
+                    elif name == "lastmod":
+                        lastmod = parse_lastmod(child.text)
+                root.clear() # Solo se conserva el elemento que se está leyendo
+                if loc:
+                    yield kind, loc, lastmod
+
+
+def discover_sitemaps(robots_cache, start_url):
+    """
+    Sitemaps declarados en el robots.txt del sitio o, si no declara ninguno, /sitemap.xml.
+
+    Returns:
+        list: URLs de los sitemaps.
+    """
+    origin = get_origin(start_url)
+    sitemaps = list(robots_cache.get(origin).sitemaps)
+    return sitemaps or [urljoin(origin + "/", "sitemap.xml")]
+
+
+def _is_noindex(analysis_results):
+    return "noindex" in (analysis_results.get("meta_robots") or "").lower()
+
+
+def build_sitemap_report(sitemap_urls, pages, failed_urls=None, disallowed_urls=(), canonicalized_urls=None,
+                         sample_size=SITEMAP_REPORT_SAMPLE_SIZE, url_normalizer=None):
+    """
+    Compara las URLs del sitemap con lo que el rastreo ha encontrado.
+
+    Args:
+        sitemap_urls (set): URLs (normalizadas) leídas de los sitemaps.
+        pages (iterable): Los `analysis_results` de las páginas rastreadas (se recorren una vez).
+        failed_urls (dict, optional): URL -> error de las descargas fallidas.
+        disallowed_urls (iterable): URLs que robots.txt no permite rastrear.
+        canonicalized_urls (dict, optional): URL -> URL canónica que declara la página.
+        sample_size (int): URLs de ejemplo de "not_crawled".
+        url_normalizer (callable, optional): El normalizador del rastreo; la URL final de cada
+            página se normaliza igual que las del sitemap antes de compararlas, para que una
+            diferencia de forma (puerto por defecto, parámetros de seguimiento...) no cuente
+            como redirección.
+    Returns:
+        dict: "sitemap_urls" (número), "unreachable" (URLs del sitemap que fallan, no
+            responden 200 o están bloqueadas por robots.txt, con su motivo), "redirected"
+            (URLs del sitemap que redirigen, con su destino), "not_crawled" ({"count",
+            "sample"}: URLs del sitemap que el rastreo no llegó a pedir) y
+            "missing_from_sitemap" (páginas rastreadas que responden 200, son indexables y
+            canónicas, pero no están en el sitemap).
+    """
+    failed_urls = failed_urls or {}
+    canonicalized_urls = canonicalized_urls or {}
+    disallowed_urls = set(disallowed_urls)
+    unreachable, redirected, missing_from_sitemap = [], [], []
+    crawled_sitemap_urls = set()
+
+    for page in pages:
+        url = page.get("url")
+        status = page.get("http_status")
+        final_url = page.get("final_url_after_redirects") or url
+        if url_normalizer is not None:
+            final_url = url_normalizer(final_url)
+        if url in sitemap_urls:
+            crawled_sitemap_urls.add(url)
+            if status != 200:
+                unreachable.append({"url": url, "reason": f"HTTP {status}"})
+            elif final_url != url:
+                redirected.append({"url": url, "final_url": final_url})
+        elif (status == 200 and final_url == url and url not in canonicalized_urls
+              and not _is_noindex(page)):
+            missing_from_sitemap.append(url)
+
+    not_crawled = []
+    for url in sitemap_urls:
+        if url in crawled_sitemap_urls:
+            continue
+        if url in failed_urls:
+            unreachable.append({"url": url, "reason": failed_urls[url]})
+        elif url in disallowed_urls:
+            unreachable.append({"url": url, "reason": "Bloqueada por robots.txt"})
+        else:
+            not_crawled.append(url)
+
+    unreachable.sort(key=lambda entry: entry["url"])
+    not_crawled.sort()
+    return {
+        "sitemap_urls": len(sitemap_urls),
+        "unreachable": unreachable,
+        "redirected": sorted(redirected, key=lambda entry: entry["url"]),
+        "not_crawled": {"count": len(not_crawled), "sample": not_crawled[:sample_size]},
+        "missing_from_sitemap": sorted(missing_from_sitemap),
+    }
+
+
+def save_sitemap_report(report, results_dir):
+    """
+    Guarda el informe de cobertura del sitemap como artefacto JSON en `results_dir`.
+
+    Returns:
+        str: Ruta del archivo guardado.
+    """
+    os.makedirs(results_dir, exist_ok=True)
+    filepath = os.path.join(results_dir, SITEMAP_REPORT_FILE_NAME)
+    with open(filepath, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return filepath
+
+
+def print_sitemap_report(report):
+    """Muestra por consola un resumen del informe de cobertura del sitemap."""
+    print(f"\n--- Cobertura del sitemap ({report['sitemap_urls']} URLs) ---")
+    print(f"   En el sitemap pero inaccesibles: {len(report['unreachable'])}")
+    for entry in report["unreachable"][:10]:
+        print(f"      {entry['url']} ({entry['reason']})")
+    print(f"   En el sitemap pero con redirección: {len(report['redirected'])}")
+    print(f"   En el sitemap sin rastrear (límite de páginas): {report['not_crawled']['count']}")
+    print(f"   Rastreadas e indexables pero fuera del sitemap: {len(report['missing_from_sitemap'])}")
+    for url in report["missing_from_sitemap"][:10]:
+        print(f"      {url}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lee un sitemap (o sitemap índice, también .xml.gz) en streaming y cuenta sus URLs.")
+    parser.add_argument("sitemap", nargs="+", help="URL del sitemap")
+    parser.add_argument("--max-urls", type=int, default=DEFAULT_SITEMAP_MAX_URLS, help="URLs como máximo que se leen")
+    parser.add_argument("--print-urls", action="store_true", help="Muestra cada URL con su <lastmod>")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    reader = SitemapReader(max_urls=args.max_urls)
+    with_lastmod = 0
+    for loc, lastmod in reader.iter_urls(args.sitemap):
+        with_lastmod += lastmod is not None
+        if args.print_urls:
+            print(loc, datetime.fromtimestamp(lastmod, timezone.utc).isoformat() if lastmod is not None else "-")
+    elapsed = time.perf_counter() - start_time
+    print(f"{reader.url_count} URLs ({with_lastmod} con <lastmod>) de {len(reader.sitemaps_read)} sitemaps "
+          f"leídas en {elapsed:.2f} s; {len(reader.errors)} sitemaps con errores.")
@@ -1,5 +1,6 @@
 import os
-from agents import Agent, Runner
+import argparse
+from agents import Agent
 from dotenv import load_dotenv
 import sys
 
@@ -14,6 +15,7 @@ import sys
 try:
     # Se corrige la importación a 'seo_utils' según la conversación anterior
     from analyzer import generate_technical_seo_report
+    from llm_cache import get_default_llm_cache, run_agent_sync, RESULTS_DIR
 except ImportError as e:
     print(f"Error al importar la función generate_technical_seo_report de seo_utils: {e}")
     print("Asegúrate de que 'seo_utils.py' esté en el mismo directorio o en el PYTHONPATH.")
@@ -21,7 +23,9 @@ except ImportError as e:
 
 
 # Carga las variables de entorno para la clave de API de OpenAI
-load_dotenv(dotenv_path="../.env") 
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".env")) # Backend/.env
+
+STRATEGIST_MODEL = "gpt-4o-mini" # Puedes ajustar el modelo si es necesario
 
 class SEOStrategist:
     """
@@ -32,10 +36,22 @@ class SEOStrategist:
         # El constructor puede inicializar cualquier configuración necesaria
         pass
 
-    def generate_strategic_plan(self):
+    def generate_strategic_plan(self, analyzer_report=None, use_cache=True, results_dir=RESULTS_DIR, on_event=None,
+                                model=STRATEGIST_MODEL, stream_output=False):
         """
         Orquesta la ejecución del Agente Estratega para generar un plan de acción SEO.
 
+        Args:
+            analyzer_report (str, optional): Informe de auditoría ya generado. Si se indica, no se
+                vuelve a ejecutar el Agente Analizador.
+            use_cache (bool): Reutiliza las respuestas guardadas en la caché local del modelo
+                (analizador y estratega) si el prompt es idéntico.
+            results_dir (str): Directorio de los resultados del crawler y de la caché del modelo.
+            on_event (callable, optional): Recibe eventos de progreso ({"stage": "plan", "type": ...}).
+            model (str or agents.Model): Modelo del agente estratega (p. ej. un modelo local de pruebas).
+            stream_output (bool): Pide el plan en streaming y emite cada fragmento en cuanto llega
+                ({"stage": "plan", "type": "delta", "text": ...}).
+
         Returns:
             str: El contenido del plan estratégico SEO generado.
         """
@@ -58,13 +74,18 @@ class SEOStrategist:
         strategist_agent = Agent(
             name="SEO Strategist Agent",
             instructions=instructions_strategist,
-            model="gpt-4o-mini" # Puedes ajustar el modelo si es necesario
+            model=model
         )
 
         # --- Obtener el informe directamente de la función del analizador ---
         print("\n--- Paso 1: Obteniendo el informe del Agente Analizador directamente ---")
         try:
-            analyzer_report_content = generate_technical_seo_report()
+            if analyzer_report is not None:
+                analyzer_report_content = analyzer_report
+                print("Se usa el informe del analizador proporcionado; no se vuelve a ejecutar el Agente Analizador.")
+            else:
+                analyzer_report_content = generate_technical_seo_report(use_cache=use_cache, results_dir=results_dir,
+                                                                        on_event=on_event)
             print("Informe del analizador obtenido exitosamente.")
         except FileNotFoundError as e:
             print(f"Error: {e}")
@@ -117,9 +138,19 @@ class SEOStrategist:
         """
 
         print("🚀 Ejecutando Agente Estratega para generar el plan de acción estratégico...")
-        strategist_result = Runner.run_sync(strategist_agent, prompt_strategist)
-
-        strategic_plan_content = strategist_result.final_output
+        if on_event:
+            on_event({"stage": "plan", "type": "started"})
+        llm_cache = get_default_llm_cache(results_dir) if use_cache else None
+        try:
+            on_text = None
+            if stream_output and on_event:
+                on_text = lambda text: on_event({"stage": "plan", "type": "delta", "text": text})
+            strategic_plan_content = run_agent_sync(strategist_agent, prompt_strategist, llm_cache, on_text)
+        finally:
+            if llm_cache is not None:
+                llm_cache.close()
+        if on_event:
+            on_event({"stage": "plan", "type": "finished", "length": len(strategic_plan_content)})
         
         # Eliminado: os.makedirs(REPORTS_DIR, exist_ok=True)
         # Eliminado: with open(strategic_plan_file_path, 'w', encoding='utf-8') as f: f.write(strategic_plan_content)
@@ -132,8 +163,19 @@ class SEOStrategist:
 
 # Ejecutar directamente cuando el script se ejecuta
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera el plan de acción SEO a partir del informe de auditoría técnica.")
+    parser.add_argument("--report", help="Archivo con un informe de auditoría ya generado (no se ejecuta el analizador)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Llama siempre al modelo, sin reutilizar respuestas de la caché local")
+    args = parser.parse_args()
+
+    analyzer_report = None
+    if args.report:
+        with open(args.report, 'r', encoding='utf-8') as f:
+            analyzer_report = f.read()
+
     strategist = SEOStrategist()
-    strategic_plan = strategist.generate_strategic_plan()
+    strategic_plan = strategist.generate_strategic_plan(analyzer_report=analyzer_report, use_cache=not args.no_cache)
     
     if strategic_plan:
         print("\n--- Contenido del plan estratégico (primeras 500 caracteres) ---")
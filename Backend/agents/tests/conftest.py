@@ -0,0 +1,80 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Los módulos del backend se importan por su nombre (import analyzer), igual que desde Backend/agents
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_AGENTS_DISABLE_TRACING", "1")   # Sin clave de API no hay a dónde exportar trazas
+
+from agents.items import ModelResponse
+from agents.models.interface import Model
+from agents.usage import Usage
+from openai.types.responses import (Response, ResponseCompletedEvent, ResponseOutputMessage, ResponseOutputText,
+                                    ResponseTextDeltaEvent)
+
+
+def _message(text):
+    return ResponseOutputMessage(id="msg", type="message", role="assistant", status="completed",
+                                 content=[ResponseOutputText(type="output_text", text=text, annotations=[])])
+
+
+class StubModel(Model):
+    """
+    Modelo local de pruebas: responde sin red y registra las peticiones.
+
+    Args:
+        respond (callable, optional): prompt -> texto de la respuesta; por defecto, un eco corto.
+        failures (dict, optional): Fragmento del prompt -> lista de excepciones que se lanzan,
+            una por llamada, antes de responder con normalidad a ese prompt.
+        latency (float): Segundos que tarda cada respuesta (o cada fragmento en streaming).
+    """
+    def __init__(self, respond=None, failures=None, latency=0.0):
+        self.respond = respond or (lambda prompt: f"- hallazgo ({len(prompt)} caracteres)")
+        self.failures = {marker: list(errors) for marker, errors in (failures or {}).items()}
+        self.latency = latency
+        self.prompts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @property
+    def calls(self):
+        return len(self.prompts)
+
+    async def _answer(self, input):
+        prompt = input if isinstance(input, str) else str(input)
+        self.prompts.append(prompt)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            for marker, errors in self.failures.items():
+                if marker in prompt and errors:
+                    raise errors.pop(0)
+            return self.respond(prompt)
+        finally:
+            self.in_flight -= 1
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs,
+                           tracing, *, previous_response_id=None, prompt=None):
+        text = await self._answer(input)
+        return ModelResponse(output=[_message(text)], usage=Usage(), response_id=None)
+
+    async def stream_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs,
+                              tracing, *, previous_response_id=None, prompt=None):
+        text = await self._answer(input)
+        words = text.split(" ")
+        for index, word in enumerate(words):
+            await asyncio.sleep(self.latency)
+            yield ResponseTextDeltaEvent(type="response.output_text.delta", item_id="msg", output_index=0,
+                                         content_index=0, sequence_number=index, logprobs=[],
+                                         delta=word if index == len(words) - 1 else word + " ")
+        response = Response(id="resp", created_at=0, model="stub", object="response", output=[_message(text)],
+                            parallel_tool_calls=False, tool_choice="auto", tools=[])
+        yield ResponseCompletedEvent(type="response.completed", response=response, sequence_number=len(words))
+
+
+@pytest.fixture
+def stub_model():
+    return StubModel
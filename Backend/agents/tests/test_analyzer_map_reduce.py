@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from analyzer import generate_report_map_reduce
+from llm_cache import LLMCache
+
+BATCH_MARKER = "Estás analizando el lote"
+COMBINE_MARKER = "Une en una sola lista"
+REDUCE_MARKER = "combinarlos en un informe técnico global"
+
+
+def make_pages(count):
+    return [{"url": f"https://example.com/p/{index}", "http_status": 200, "title": f"Página {index}",
+             "h1_tags": [], "robots_txt_ref": "https://example.com"} for index in range(count)]
+
+
+def respond(prompt):
+    if REDUCE_MARKER in prompt:
+        return "# Informe final"
+    if COMBINE_MARKER in prompt:
+        return "- hallazgos unidos"
+    return "- hallazgo del lote " + prompt.split(BATCH_MARKER, 1)[1].split()[0]
+
+
+def run(pages, model, **options):
+    options.setdefault("retry_delay", 0)
+    return asyncio.run(generate_report_map_reduce(pages, {}, model=model, **options))
+
+
+def prompts_with(model, marker):
+    return [prompt for prompt in model.prompts if marker in prompt]
+
+
+def test_batches_pages_and_reduces_into_one_report(stub_model):
+    model = stub_model(respond)
+    report = run(make_pages(5), model, batch_size=2, max_concurrency=2)
+
+    assert report == "# Informe final"
+    assert len(prompts_with(model, BATCH_MARKER)) == 3
+    reduce_prompts = prompts_with(model, REDUCE_MARKER)
+    assert len(reduce_prompts) == 1
+    for batch_number in (1, 2, 3):
+        assert f"- hallazgo del lote {batch_number}" in reduce_prompts[0]
+    assert "5 páginas" in reduce_prompts[0]
+
+
+def test_respects_max_concurrency(stub_model):
+    model = stub_model(respond, latency=0.02)
+    run(make_pages(8), model, batch_size=1, max_concurrency=3)
+    assert model.max_in_flight == 3
+
+
+def test_merges_partials_that_do_not_fit_the_token_budget(stub_model):
+    long_findings = "- " + "hallazgo " * 150   # Unos 400 tokens por lote
+    model = stub_model(lambda prompt: respond(prompt) if BATCH_MARKER not in prompt else long_findings)
+    report = run(make_pages(4), model, batch_size=1, token_budget=1000)
+
+    assert report == "# Informe final"
+    assert len(prompts_with(model, COMBINE_MARKER)) == 2
+    assert "hallazgos unidos" in prompts_with(model, REDUCE_MARKER)[0]
+
+
+def test_retries_transient_errors(stub_model):
+    model = stub_model(respond, failures={"lote 1 de": [ConnectionError("conexión perdida"), TimeoutError()]})
+    report = run(make_pages(2), model, batch_size=1, max_retries=2)
+
+    assert report == "# Informe final"
+    assert len(prompts_with(model, "lote 1 de")) == 3
+    assert "- hallazgo del lote 1" in prompts_with(model, REDUCE_MARKER)[0]
+
+
+def test_does_not_retry_other_errors(stub_model):
+    model = stub_model(respond, failures={"lote 1 de": [ValueError("petición inválida")]})
+    report = run(make_pages(2), model, batch_size=1, max_retries=3)
+
+    assert len(prompts_with(model, "lote 1 de")) == 1
+    reduce_prompt = prompts_with(model, REDUCE_MARKER)[0]
+    assert "- hallazgo del lote 2" in reduce_prompt
+    assert "- hallazgo del lote 1" not in reduce_prompt
+    assert report == "# Informe final"
+
+
+def test_fails_when_no_batch_can_be_analyzed(stub_model):
+    model = stub_model(respond, failures={BATCH_MARKER: [ConnectionError()] * 4})
+    with pytest.raises(RuntimeError):
+        run(make_pages(2), model, batch_size=2, max_retries=3)
+    assert model.calls == 4
+
+
+def test_cache_hits_skip_the_model(stub_model, tmp_path):
+    cache = LLMCache(str(tmp_path / "llm_cache.sqlite"))
+    try:
+        first_model = stub_model(respond)
+        first_report = run(make_pages(4), first_model, batch_size=2, cache=cache)
+        second_model = stub_model(respond)
+        second_report = run(make_pages(4), second_model, batch_size=2, cache=cache)
+    finally:
+        cache.close()
+
+    assert first_model.calls == 3
+    assert second_model.calls == 0
+    assert second_report == first_report
+
+
+@pytest.mark.parametrize("batch_size", [0, -1, 2.5, None])
+def test_rejects_invalid_batch_size(stub_model, batch_size):
+    model = stub_model(respond)
+    with pytest.raises(ValueError, match="batch_size"):
+        run(make_pages(2), model, batch_size=batch_size)
+    assert model.calls == 0
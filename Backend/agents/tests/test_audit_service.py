@@ -0,0 +1,218 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import audit_service
+from audit_service import AuditService, create_server
+
+PAGES = {
+    "/": '<a href="/a">A</a> <a href="/b">B</a>',
+    "/a": '<a href="/">Inicio</a> <a href="/b">B</a>',
+    "/b": '<a href="/">Inicio</a>',
+}
+
+
+class LocalSite:
+    """Sitio de pruebas en un puerto local; con `gate`, la portada no responde hasta que se abre."""
+    def __init__(self, gated=False):
+        self.gate = threading.Event()
+        if not gated:
+            self.gate.set()
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path not in PAGES:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if self.path == "/":
+                    site.gate.wait(10)
+                body = (f"<html><head><title>Página {self.path}</title></head>"
+                        f"<body><h1>Página</h1>{PAGES[self.path]}</body></html>").encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.gate.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def sites():
+    created = []
+
+    def make_site(gated=False):
+        site = LocalSite(gated)
+        created.append(site)
+        return site
+
+    yield make_site
+    for site in created:
+        site.close()
+
+
+@pytest.fixture
+def make_service(tmp_path, stub_model):
+    running = []
+
+    def make(max_concurrent_jobs=2, model=None):
+        service = AuditService(results_dir=str(tmp_path), max_concurrent_jobs=max_concurrent_jobs, parse_workers=0,
+                               model=model or stub_model(lambda prompt: "- hallazgo uno\n- hallazgo dos"),
+                               crawl_defaults={"max_pages": 3, "delay": 0, "no_history": True})
+        server = create_server(service, "127.0.0.1", 0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        running.append((service, server))
+        return service, f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield make
+    for service, server in running:
+        server.shutdown()
+        server.server_close()
+        service.close()
+
+
+def read_events(api, job_id, last_event_id=None):
+    headers = {} if last_event_id is None else {"Last-Event-ID": str(last_event_id)}
+    events = []
+    with requests.get(f"{api}/jobs/{job_id}/events", headers=headers, stream=True, timeout=30) as response:
+        assert response.headers["Content-Type"].startswith("text/event-stream")
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("data: "):
+                events.append(json.loads(line[len("data: "):]))
+    return events
+
+
+def wait_for(condition, timeout=20):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "tiempo de espera agotado"
+        time.sleep(0.02)
+
+
+def test_streams_progress_and_output_until_the_job_finishes(sites, make_service):
+    site = sites()
+    _, api = make_service()
+    response = requests.post(f"{api}/jobs", json={"url": site.url})
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+
+    events = read_events(api, job_id)
+    kinds = [(event["stage"], event["type"]) for event in events]
+    assert kinds[:3] == [("job", "queued"), ("job", "running"), ("crawl", "started")]
+    assert kinds[-1] == ("job", "finished")
+    assert kinds.count(("crawl", "page")) == 3
+    assert kinds.index(("crawl", "finished")) < kinds.index(("report", "delta")) < kinds.index(("plan", "delta"))
+    assert [event["id"] for event in events] == list(range(len(events)))
+
+    job = requests.get(f"{api}/jobs/{job_id}").json()
+    assert job["status"] == "finished"
+    assert job["analyzed_count"] == 3
+    assert job["report"] == "".join(event["text"] for event in events if kinds[event["id"]] == ("report", "delta"))
+    assert job["plan"] == "- hallazgo uno\n- hallazgo dos"
+
+    resumed = read_events(api, job_id, last_event_id=4)
+    assert resumed == events[5:]
+
+
+def test_rejects_invalid_submissions(make_service):
+    _, api = make_service()
+    invalid_requests = [
+        {"url": "ftp://example.com/"},
+        {"url": "http://example.com/", "crawl_options": {"no_such_option": 1}},
+        {"url": "http://example.com/", "crawl_options": {"parse_workers": 8}},
+        {"url": "http://example.com/", "report_options": {"results_dir": "/"}},
+        {"url": "http://example.com/", "report_options": {"map_reduce": True, "batch_size": 0}},
+    ]
+    for request in invalid_requests:
+        response = requests.post(f"{api}/jobs", json=request)
+        assert response.status_code == 400, request
+        assert response.json()["error"]
+    assert requests.get(f"{api}/jobs").json() == []
+    assert requests.get(f"{api}/jobs/desconocida").status_code == 404
+
+
+def test_runs_one_job_per_site_at_a_time(sites, make_service):
+    slow_site, other_site = sites(gated=True), sites()
+    service, _ = make_service(max_concurrent_jobs=2)
+    first = service.submit(slow_site.url)
+    second = service.submit(slow_site.url)
+    other = service.submit(other_site.url)
+
+    # Con un trabajador libre, la segunda auditoría del mismo sitio sigue esperando a la primera
+    wait_for(lambda: other.finished)
+    assert first.status == "running"
+    assert second.status == "queued"
+
+    slow_site.gate.set()
+    wait_for(lambda: second.finished)
+    assert [first.status, second.status, other.status] == ["finished"] * 3
+    assert second.started_at >= first.finished_at
+
+
+def test_shares_workers_fairly_between_sites(sites, make_service):
+    busy_site, site_a, site_b = sites(gated=True), sites(), sites()
+    service, _ = make_service(max_concurrent_jobs=1)
+    blocker = service.submit(busy_site.url)
+    wait_for(lambda: blocker.status == "running")
+    jobs_a = [service.submit(site_a.url) for _ in range(3)]
+    job_b = service.submit(site_b.url)
+
+    busy_site.gate.set()
+    wait_for(lambda: all(job.finished for job in jobs_a + [job_b]))
+    order = sorted(jobs_a + [job_b], key=lambda job: job.started_at)
+    assert order == [jobs_a[0], job_b, jobs_a[1], jobs_a[2]]
+
+
+def test_cancels_only_queued_jobs(sites, make_service):
+    busy_site, site = sites(gated=True), sites()
+    service, api = make_service(max_concurrent_jobs=1)
+    blocker = service.submit(busy_site.url)
+    wait_for(lambda: blocker.status == "running")
+    queued = service.submit(site.url)
+
+    assert requests.delete(f"{api}/jobs/{queued.id}").status_code == 200
+    assert requests.delete(f"{api}/jobs/{queued.id}").status_code == 409
+    assert requests.delete(f"{api}/jobs/{blocker.id}").status_code == 409
+    assert [(event["stage"], event["type"]) for event in read_events(api, queued.id)] == [
+        ("job", "queued"), ("job", "cancelled")]
+
+    busy_site.gate.set()
+    wait_for(lambda: blocker.finished)
+    assert blocker.status == "finished"
+    assert queued.status == "cancelled" and queued.started_at is None
+
+
+def test_failure_while_starting_a_job_marks_it_failed(sites, make_service, monkeypatch):
+    site = sites()
+
+    def broken_pipeline(**options):
+        raise RuntimeError("no se pudo preparar el pipeline")
+
+    monkeypatch.setattr(audit_service, "SEOPipeline", broken_pipeline)
+    service, api = make_service(max_concurrent_jobs=1)
+    first = service.submit(site.url)
+    second = service.submit(site.url)
+
+    events = read_events(api, first.id)
+    assert events[-1]["type"] == "failed"
+    assert events[-1]["error"] == "no se pudo preparar el pipeline"
+    wait_for(lambda: second.finished) # El trabajador sigue vivo y atiende la siguiente
+    assert second.status == "failed"
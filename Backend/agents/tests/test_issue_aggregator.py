@@ -0,0 +1,30 @@
+from issue_aggregator import aggregate_issues
+from url_normalizer import URLNormalizer
+
+
+def make_page(path, canonical_url):
+    return {"url": f"https://example.com{path}", "http_status": 200, "title": f"Página {path}",
+            "canonical_url": canonical_url}
+
+
+def issue_urls(issue_table, code):
+    return next((entry["urls"] for entry in issue_table["issues"] if entry["issue"] == code), [])
+
+
+def test_self_canonical_pages_are_not_counted():
+    pages = [
+        make_page("/", "/"),
+        make_page("/about", "/about"),
+        make_page("/blog", "https://EXAMPLE.com:443/blog?utm_source=newsletter"),
+        make_page("/blog?page=2", "/blog"),
+    ]
+    issue_table = aggregate_issues(pages)
+
+    assert issue_table["total_pages"] == 4
+    assert issue_urls(issue_table, "canonical_a_otra_url") == ["https://example.com/blog?page=2"]
+
+
+def test_uses_the_crawl_normalizer():
+    pages = [make_page("/about/", "/about"), make_page("/blog/", "/blog/")]
+    assert issue_urls(aggregate_issues(pages), "canonical_a_otra_url") == ["https://example.com/about/"]
+    assert issue_urls(aggregate_issues(pages, URLNormalizer(strip_trailing_slash=True)), "canonical_a_otra_url") == []
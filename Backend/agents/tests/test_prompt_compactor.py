@@ -0,0 +1,38 @@
+import pytest
+
+from prompt_compactor import page_issue_signature
+from url_normalizer import IdentityNormalizer
+
+
+def make_page(url, canonical_url):
+    return {"url": url, "http_status": 200, "canonical_url": canonical_url}
+
+
+@pytest.mark.parametrize("canonical_url", [
+    "/about",
+    "about",
+    "https://example.com/about",
+    "https://EXAMPLE.com:443/about",
+    "https://example.com/about?utm_source=newsletter",
+    "/about#equipo",
+])
+def test_self_canonical_variants_point_to_the_page(canonical_url):
+    page = make_page("https://example.com/about", canonical_url)
+    assert "canonical_a_otra_url" not in page_issue_signature(page)
+
+
+@pytest.mark.parametrize("canonical_url", ["/contact", "https://example.com/about?page=2", "https://other.com/about"])
+def test_canonical_to_another_url(canonical_url):
+    page = make_page("https://example.com/about", canonical_url)
+    assert "canonical_a_otra_url" in page_issue_signature(page)
+
+
+def test_uses_the_crawl_normalizer():
+    page = make_page("https://example.com/about", "/about?utm_source=newsletter")
+    assert "canonical_a_otra_url" in page_issue_signature(page, IdentityNormalizer())
+    assert "canonical_a_otra_url" not in page_issue_signature(make_page("https://example.com/about", "/about"),
+                                                               IdentityNormalizer())
+
+
+def test_missing_canonical():
+    assert "sin_canonical" in page_issue_signature(make_page("https://example.com/about", None))
@@ -0,0 +1,101 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import robots_cache
+from robots_cache import RobotsCache
+
+ROBOTS_TXT = b"User-agent: *\nDisallow: /privado/\n"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = time.time()
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake_clock = FakeClock()
+    monkeypatch.setattr(robots_cache, "time", fake_clock)
+    return fake_clock
+
+
+@pytest.fixture
+def robots_server():
+    """Sirve /robots.txt respondiendo con los estados de `statuses`, uno por petición (después, 200)."""
+    state = {"statuses": [], "requests": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            state["requests"] += 1
+            status = state["statuses"].pop(0) if state["statuses"] else 200
+            body = ROBOTS_TXT if status == 200 else b""
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state["url"] = f"http://127.0.0.1:{server.server_address[1]}"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+def test_failed_fetch_is_retried_after_error_ttl(robots_server, clock):
+    robots_server["statuses"] = [503]
+    cache = RobotsCache(error_ttl=60)
+    page_url = robots_server["url"] + "/pagina"
+
+    assert cache.get(page_url).failed
+    assert not cache.can_fetch(page_url)
+    clock.now += 30
+    assert not cache.can_fetch(page_url)
+    assert robots_server["requests"] == 1
+
+    clock.now += 31
+    assert cache.get(page_url).status == 200
+    assert cache.can_fetch(page_url)
+    assert not cache.can_fetch(robots_server["url"] + "/privado/x")
+    assert robots_server["requests"] == 2
+
+    clock.now += 3600
+    cache.get(page_url)
+    assert robots_server["requests"] == 2 # Ya descargado: fresco durante el resto del rastreo
+
+
+def test_failed_fetch_keeps_the_valid_cached_copy(robots_server, clock, tmp_path):
+    cache_path = str(tmp_path / "robots_cache.json")
+    first = RobotsCache(cache_path, ttl=3600)
+    first.get(robots_server["url"])
+    first.save()
+
+    clock.now += 7200
+    robots_server["statuses"] = [503]
+    cache = RobotsCache(cache_path, ttl=3600, error_ttl=60)
+    assert cache.get(robots_server["url"]).status == 200
+    assert robots_server["requests"] == 2
+
+    clock.now += 61
+    cache.get(robots_server["url"])
+    assert robots_server["requests"] == 3
+
+
+def test_failed_fetch_is_not_saved(robots_server, clock, tmp_path):
+    cache_path = str(tmp_path / "robots_cache.json")
+    robots_server["statuses"] = [503]
+    cache = RobotsCache(cache_path)
+    assert cache.get(robots_server["url"]).failed
+    cache.save()
+
+    assert RobotsCache(cache_path).get(robots_server["url"]).status == 200
+    assert robots_server["requests"] == 2
@@ -0,0 +1,22 @@
+import pytest
+
+from tracing import percentile
+
+
+@pytest.mark.parametrize("values, fraction, expected", [
+    (list(range(1, 7)), 0.5, 3),
+    (list(range(1, 21)), 0.95, 19),
+    (list(range(1, 21)), 0.5, 10),
+    (list(range(1, 11)), 0.7, 7),
+    (list(range(1, 6)), 0.5, 3),
+    ([4, 1, 3, 2], 0.5, 2),
+    ([5], 0.95, 5),
+    ([1, 2, 3], 0.0, 1),
+    ([1, 2, 3], 1.0, 3),
+])
+def test_nearest_rank(values, fraction, expected):
+    assert percentile(values, fraction) == expected
+
+
+def test_no_values():
+    assert percentile([], 0.5) is None
@@ -0,0 +1,212 @@
+import cProfile
+import io
+import json
+import math
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import pyinstrument # Opcional: perfil por muestreo del hilo principal
+except ImportError:
+    pyinstrument = None
+
+# --- Configuración de la instrumentación ---
+PROFILERS = ("cprofile", "pyinstrument")
+TRACE_SUMMARY_FILE_NAME = "trace_summary.json"
+PROFILE_TOP_FUNCTIONS = 25   # Funciones que se muestran del perfil de cProfile
+
+
+def percentile(values, fraction):
+    """Percentil por rango más cercano (0.5 -> mediana); None si no hay valores."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    # Rango ceil(p·n); el redondeo previo evita que 0.7 * 10 = 7.000000000000001 salte un puesto
+    index = min(len(ordered) - 1, max(0, math.ceil(round(fraction * len(ordered), 9)) - 1))
+    return ordered[index]
+
+
+def fetch_timings_ms(fetch_result):
+    """
+    Tiempos de red de una descarga en milisegundos: "dns" (solo en la primera petición a
+    cada host), "ttfb" (hasta las cabeceras de la respuesta final) y "download" (el resto).
+    """
+    timings = {}
+    if fetch_result.dns_time is not None:
+        timings["dns"] = round(fetch_result.dns_time * 1000, 3)
+    if fetch_result.ttfb is not None:
+        timings["ttfb"] = round(fetch_result.ttfb * 1000, 3)
+        if fetch_result.total_time is not None:
+            timings["download"] = round(max(0.0, fetch_result.total_time - fetch_result.ttfb) * 1000, 3)
+    return timings
+
+
+def page_performance(fetch_result):
+    """
+    Señales de velocidad de la propia página para los datos SEO.
+
+    Returns:
+        dict: "ttfb_ms", "download_ms", "transfer_bytes" (bytes recibidos, comprimidos),
+            "content_bytes" (cuerpo descomprimido), "content_encoding", "compressed",
+            "redirect_hops" y "truncated" (el cuerpo superaba el máximo y se ha cortado).
+    """
+    content_encoding = (fetch_result.headers.get("Content-Encoding") or "").lower() or None
+    timings = fetch_timings_ms(fetch_result)
+    return {
+        "ttfb_ms": timings.get("ttfb"),
+        "download_ms": timings.get("download"),
+        "transfer_bytes": fetch_result.transfer_size,
+        "content_bytes": len(fetch_result.content),
+        "content_encoding": content_encoding,
+        "compressed": content_encoding not in (None, "identity"),
+        "redirect_hops": len(fetch_result.redirect_chain),
+        "truncated": fetch_result.truncated,
+    }
+
+
+class Tracer:
+    """
+    Tiempos por etapa y contadores de un rastreo, seguro entre hilos.
+
+    Cada página aporta sus tiempos (`timings_ms` de su `analysis_results`: dns, ttfb,
+    download, archive, parse, analysis) y el motor de rastreo y el crawler añaden los suyos
+    (espera por el límite de ritmo, escritura de resultados...). `summary` indica cuánto
+    tiempo se fue en cada etapa.
+
+    Con `profiler="cprofile"` se perfilan el hilo principal y los hilos de descarga (cada
+    hilo llama a `thread_started` al arrancar) y los perfiles se combinan al final; con
+    "pyinstrument" (si está instalado) solo el hilo principal. El parseo en procesos aparte
+    (`parse_workers > 0`) no entra en el perfil: para perfilarlo, rastrea con
+    `--parse-workers 0`.
+    """
+    def __init__(self, profiler=None):
+        if profiler is not None and profiler not in PROFILERS:
+            raise ValueError(f"Perfilador desconocido '{profiler}'. Opciones: {', '.join(PROFILERS)}")
+        if profiler == "pyinstrument" and pyinstrument is None:
+            raise ValueError("pyinstrument no está instalado (pip install pyinstrument).")
+        self.profiler = profiler
+        self._lock = threading.Lock()
+        self._timings = {}    # etapa -> lista de segundos
+        self._counters = {}
+        self._profiles = []
+        self._main_profiler = None
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self._timings.setdefault(stage, []).append(seconds)
+
+    @contextmanager
+    def stage(self, name):
+        """Mide el bloque como una ejecución de la etapa `name`."""
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started_at)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def record_page(self, timings_ms):
+        """Añade los tiempos por etapa (en ms) de una página."""
+        for stage, milliseconds in (timings_ms or {}).items():
+            if milliseconds is not None:
+                self.record(stage, milliseconds / 1000)
+
+    # --- Perfilado opcional ---
+
+    def thread_started(self):
+        """Inicializador de los hilos de descarga: activa cProfile en el hilo."""
+        if self.profiler != "cprofile":
+            return
+        profile = cProfile.Profile()
+        profile.enable()
+        with self._lock:
+            self._profiles.append(profile)
+
+    def start_profiling(self):
+        if self.profiler == "cprofile":
+            self._main_profiler = cProfile.Profile()
+            self._main_profiler.enable()
+        elif self.profiler == "pyinstrument":
+            self._main_profiler = pyinstrument.Profiler()
+            self._main_profiler.start()
+
+    def stop_profiling(self, output_dir):
+        """
+        Detiene el perfil, lo guarda en `output_dir` y muestra las funciones más costosas.
+
+        Returns:
+            str or None: Ruta del perfil guardado (.prof de cProfile o .html de pyinstrument).
+        """
+        if self._main_profiler is None:
+            return None
+        os.makedirs(output_dir, exist_ok=True)
+        if self.profiler == "pyinstrument":
+            self._main_profiler.stop()
+            print(self._main_profiler.output_text(unicode=True, color=False))
+            output_path = os.path.join(output_dir, "profile.html")
+            with open(output_path, "w", encoding="utf-8") as f:
+                f.write(self._main_profiler.output_html())
+            return output_path
+
+        self._main_profiler.disable()
+        stats = pstats.Stats(self._main_profiler)
+        for profile in self._profiles: # Los hilos de descarga ya han terminado
+            profile.disable()
+            stats.add(profile)
+        output_path = os.path.join(output_dir, "profile.prof")
+        stats.dump_stats(output_path)
+        report = io.StringIO()
+        stats.stream = report
+        stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+        print(report.getvalue())
+        return output_path
+
+    # --- Resumen ---
+
+    def summary(self, wall_time=None):
+        """
+        Resumen del rastreo: por etapa, número de mediciones, total, media, p95 y máximo, y
+        el porcentaje del tiempo total de todas las etapas.
+
+        Returns:
+            dict: {"wall_time_s", "stages": {etapa: {...}}, "counters": {...}}.
+        """
+        with self._lock:
+            timings = {stage: list(values) for stage, values in self._timings.items()}
+            counters = dict(self._counters)
+        stage_total = sum(sum(values) for values in timings.values()) or 1
+        stages = {}
+        for stage, values in sorted(timings.items(), key=lambda item: -sum(item[1])):
+            total = sum(values)
+            stages[stage] = {
+                "count": len(values),
+                "total_s": round(total, 3),
+                "mean_ms": round(total / len(values) * 1000, 3),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+                "max_ms": round(max(values) * 1000, 3),
+                "share": round(total / stage_total, 3),
+            }
+        return {"wall_time_s": round(wall_time, 3) if wall_time is not None else None,
+                "stages": stages, "counters": counters}
+
+    def print_summary(self, wall_time=None):
+        summary = self.summary(wall_time)
+        print("\n--- ¿Dónde se ha ido el tiempo? (suma de todos los hilos y procesos) ---")
+        for stage, values in summary["stages"].items():
+            print(f"   {stage:<16} {values['total_s']:>9.2f} s  {values['share']:>6.1%}  "
+                  f"media {values['mean_ms']:.1f} ms  p95 {values['p95_ms']:.1f} ms  ({values['count']})")
+        if summary["counters"]:
+            print("   " + ", ".join(f"{name}={value}" for name, value in sorted(summary["counters"].items())))
+        return summary
+
+    def save_summary(self, output_dir, wall_time=None):
+        filepath = os.path.join(output_dir, TRACE_SUMMARY_FILE_NAME)
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump(self.summary(wall_time), f, indent=2)
+        return filepath
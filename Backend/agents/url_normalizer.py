@@ -0,0 +1,128 @@
+import re
+from urllib.parse import urlsplit, urlunsplit, unquote
+
+# --- Configuración por defecto de la normalización de URLs ---
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+# Parámetros de seguimiento que no cambian el contenido de la página
+TRACKING_PARAMS = frozenset(["gclid", "dclid", "gbraid", "wbraid", "fbclid", "msclkid", "yclid", "igshid",
+                             "mc_cid", "mc_eid", "_ga", "_gl", "_hsenc", "_hsmi", "mkt_tok", "vero_id", "ref_src"])
+TRACKING_PARAM_PREFIXES = ("utm_", "pk_", "mtm_")
+
+# Caracteres no reservados (RFC 3986): su forma codificada con % es equivalente a la literal
+_UNRESERVED = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+_PERCENT_ESCAPE = re.compile(r"%[0-9A-Fa-f]{2}")
+
+
+def _normalize_percent_encoding(component):
+    """Decodifica los %XX de caracteres no reservados y pone el resto en mayúsculas (%2f -> %2F)."""
+    def replace(match):
+        character = chr(int(match.group(0)[1:], 16))
+        return character if character in _UNRESERVED else match.group(0).upper()
+    return _PERCENT_ESCAPE.sub(replace, component)
+
+
+def _remove_dot_segments(path):
+    """Resuelve los segmentos '.' y '..' de una ruta (RFC 3986, sección 5.2.4)."""
+    if "." not in path:
+        return path
+    output = []
+    for segment in path.split("/"):
+        if segment == "..":
+            if len(output) > 1:
+                output.pop()
+        elif segment != ".":
+            output.append(segment)
+    if path.endswith(("/.", "/..")):
+        output.append("")
+    return "/".join(output)
+
+
+class URLNormalizer:
+    """
+    Convierte las variantes de una misma URL en una única forma canónica.
+
+    Así el crawler no rastrea dos veces la misma página por diferencias de mayúsculas en el
+    esquema o el host, puertos por defecto, parámetros de seguimiento o el orden de la query
+    string. Cada regla se puede desactivar; la ruta nunca se pasa a minúsculas porque en la
+    mayoría de servidores distingue mayúsculas. La barra final se respeta por defecto: quitarla
+    en un sitio que enlaza a "/ruta/" haría pedir "/ruta" y seguir una redirección 301 en cada
+    página.
+
+    Args:
+        lowercase_host (bool): Esquema y host en minúsculas (y sin punto final en el host).
+        remove_default_port (bool): Quita :80 en http y :443 en https.
+        strip_trailing_slash (bool): "/ruta/" y "/ruta" son la misma página (la raíz siempre es "/");
+            solo conviene en sitios que sirven ambas formas sin redirigir.
+        remove_tracking_params (bool): Quita utm_*, gclid, fbclid y similares.
+        sort_query (bool): Ordena los parámetros de la query string.
+        drop_params (iterable, optional): Parámetros extra que se eliminan siempre
+            (p. ej. filtros u ordenaciones de un e-commerce: "sort", "color"...).
+        respect_canonical (bool): Indica al motor de rastreo que siga el rel=canonical de las páginas.
+    """
+    def __init__(self, lowercase_host=True, remove_default_port=True, strip_trailing_slash=False,
+                 remove_tracking_params=True, sort_query=True, drop_params=None, respect_canonical=True):
+        self.lowercase_host = lowercase_host
+        self.remove_default_port = remove_default_port
+        self.strip_trailing_slash = strip_trailing_slash
+        self.remove_tracking_params = remove_tracking_params
+        self.sort_query = sort_query
+        self.drop_params = frozenset(param.lower() for param in (drop_params or ()))
+        self.respect_canonical = respect_canonical
+
+    def _is_dropped_param(self, name):
+        name = unquote(name).lower()
+        if name in self.drop_params:
+            return True
+        return self.remove_tracking_params and (name in TRACKING_PARAMS or name.startswith(TRACKING_PARAM_PREFIXES))
+
+    def _normalize_netloc(self, scheme, netloc):
+        userinfo, at, host_port = netloc.rpartition("@")
+        if host_port.startswith("["): # IPv6: [::1]:8080
+            host, _, port = host_port.partition("]")
+            host += "]"
+            port = port[1:]
+        else:
+            host, _, port = host_port.partition(":")
+        if self.lowercase_host:
+            host = host.lower().rstrip(".")
+        if self.remove_default_port and port == DEFAULT_PORTS.get(scheme):
+            port = ""
+        return userinfo + at + host + (":" + port if port else "")
+
+    def normalize(self, url):
+        """
+        Devuelve la forma canónica de una URL absoluta (sin fragmento).
+
+        Args:
+            url (str): URL absoluta.
+        Returns:
+            str: La URL normalizada.
+        """
+        parts = urlsplit(url.strip())
+        scheme = parts.scheme.lower() if self.lowercase_host else parts.scheme
+        netloc = self._normalize_netloc(scheme, parts.netloc)
+
+        path = _remove_dot_segments(_normalize_percent_encoding(parts.path)) or "/"
+        if self.strip_trailing_slash and len(path) > 1:
+            path = path.rstrip("/") or "/"
+
+        params = [param for param in parts.query.split("&") if param]
+        params = [_normalize_percent_encoding(param) for param in params
+                  if not self._is_dropped_param(param.partition("=")[0])]
+        if self.sort_query:
+            params.sort()
+
+        return urlunsplit((scheme, netloc, path, "&".join(params), ""))
+
+    __call__ = normalize
+
+
+class IdentityNormalizer(URLNormalizer):
+    """Normalizador que deja las URLs tal cual (equivale a desactivar la normalización)."""
+    def __init__(self, respect_canonical=False):
+        super().__init__(respect_canonical=respect_canonical)
+
+    def normalize(self, url):
+        return url
+
+    __call__ = normalize